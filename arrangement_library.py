@@ -0,0 +1,201 @@
+import json
+import os
+import re
+import tempfile
+import threading
+
+# --- GENRE ARRANGEMENT LIBRARY ---
+# The arrangement guide for a song barely depends on its topic, so instead of asking the
+# Music Arranger agent every time we keep precomputed guides keyed by (genre, topic category).
+# Genres that are not in the library fall back to the LLM once and are cached afterwards.
+
+LIBRARY_FILE = 'arrangement_library.json'
+
+# Canonical genre keys, matched against the selectbox labels (longest names first so that
+# "African Gospel Praise" is not mistaken for "Praise").
+GENRE_ALIASES = [
+    ('african gospel', 'African Gospel'),
+    ('german schlager', 'German Schlager'),
+    ('schlager', 'German Schlager'),
+    ('hip-hop', 'Hip-Hop'),
+    ('hip hop', 'Hip-Hop'),
+    ('worship', 'Worship'),
+    ('praise', 'Praise'),
+    ('blues', 'Blues'),
+    ('country', 'Country'),
+    ('pop', 'Pop'),
+]
+
+# Keywords that map a free-text topic to one of a handful of categories.
+TOPIC_CATEGORIES = {
+    'celebration': ['praise', 'joy', 'victory', 'celebrat', 'dance', 'party', 'freedom', 'glory', 'thank', 'happy'],
+    'lament': ['grief', 'loss', 'heartbreak', 'sorrow', 'pain', 'lament', 'broken', 'tears', 'lonely', 'adversity'],
+    'devotion': ['grace', 'faith', 'love', 'mercy', 'prayer', 'salvation', 'hope', 'peace', 'holy', 'cross'],
+    'journey': ['road', 'journey', 'trip', 'home', 'highway', 'story', 'life', 'travel'],
+}
+DEFAULT_CATEGORY = 'general'
+
+# Base guides for the genres the arrangement task already spells out.
+BASE_GUIDES = {
+    'Worship': {
+        'tempo': 'Slow and contemplative, around 68 BPM in 4/4',
+        'mood': 'Starts sparse and intimate, builds to an anthemic, powerful chorus, drops to a reflective bridge',
+        'instrumentation': ['atmospheric pads', 'delayed electric guitars', 'grand piano', 'solid bass', 'powerful drums'],
+    },
+    'Praise': {
+        'tempo': 'Uptempo and driving, around 125 BPM in 4/4',
+        'mood': 'Bright and celebratory from the first bar, lifting into a shout-along chorus',
+        'instrumentation': ['rhythmic acoustic guitar', 'punchy synths', 'clean electric guitars', 'driving bass', 'driving drums'],
+    },
+    'African Gospel': {
+        'tempo': 'Joyful mid-tempo groove, around 110 BPM with a polyrhythmic feel',
+        'mood': 'Call-and-response energy that grows with every chorus into a full choir celebration',
+        'instrumentation': ['prominent bassline', 'djembe', 'congas', 'choir vocals', 'bright keys and organ', 'clean electric guitar lines'],
+    },
+    'Blues': {
+        'tempo': 'Slow, soulful 12/8 shuffle, around 60 BPM, following a 12-bar blues structure',
+        'mood': 'Gritty and honest, with call-and-response between voice and guitar and a raw, emotional peak',
+        'instrumentation': ['slightly overdriven electric guitar (Gibson ES-335)', 'harmonica', 'upright bass', 'simple shuffling drum beat'],
+    },
+    'Hip-Hop': {
+        'tempo': 'Classic boom-bap groove, around 90 BPM',
+        'mood': 'Head-nodding and confident, with the beat and rhythm carrying the song',
+        'instrumentation': ['TR-808 drum machine', 'prominent sub bassline', 'sampled melody loop', 'vinyl texture'],
+    },
+    'German Schlager': {
+        'tempo': "Driving 4/4 'Discofox' rhythm, around 128 BPM",
+        'mood': 'Upbeat, positive and danceable, with a big sing-along chorus',
+        'instrumentation': ['synthesizer brass', 'accordion', 'clean electric guitars', 'memorable melodic synth line', 'four-on-the-floor drums'],
+    },
+}
+
+# How each topic category colours the base guide.
+CATEGORY_MOODS = {
+    'celebration': 'Lean into the celebration: keep the energy high and let the final chorus explode.',
+    'lament': 'Hold back: a more intimate, aching delivery that only opens up in the bridge.',
+    'devotion': 'Keep it reverent and warm, leaving space for reflection between the sections.',
+    'journey': 'Let the arrangement travel: add one new layer per section so the song keeps moving.',
+    'general': '',
+}
+
+
+def normalize_genre(genre):
+    """
+    Maps a selectbox label such as "Worship (Hillsong/Bethel style)" to its canonical genre key.
+    Unknown genres are returned stripped of any "(... style)" suffix.
+    """
+    lowered = genre.lower()
+    for alias, canonical in GENRE_ALIASES:
+        if re.search(rf'\b{re.escape(alias)}\b', lowered):
+            return canonical
+    return re.sub(r'\s*\(.*\)\s*$', '', genre).strip()
+
+
+def topic_category(topic):
+    """
+    Maps a free-text topic to one of the TOPIC_CATEGORIES keys (or DEFAULT_CATEGORY).
+    """
+    lowered = (topic or '').lower()
+    scores = {
+        category: sum(lowered.count(keyword) for keyword in keywords)
+        for category, keywords in TOPIC_CATEGORIES.items()
+    }
+    best = max(scores, key=scores.get)
+    return best if scores[best] else DEFAULT_CATEGORY
+
+
+def build_guide(genre, category):
+    """
+    Derives the guide for (genre, category) from the base guide of a library genre.
+    """
+    base = BASE_GUIDES[genre]
+    mood = f"{base['mood']}. {CATEGORY_MOODS[category]}".strip()
+    return {'genre': genre, 'tempo': base['tempo'], 'mood': mood, 'instrumentation': list(base['instrumentation'])}
+
+
+def format_guide(guide):
+    """
+    Renders a guide as the Markdown Musical Arrangement Guide the arranger agent would produce.
+    Guides learned from the LLM fallback are stored verbatim under 'text'.
+    """
+    if 'text' in guide:
+        return guide['text']
+    instruments = '\n'.join(f'- {instrument}' for instrument in guide['instrumentation'])
+    return (
+        f"## Musical Arrangement Guide ({guide['genre']})\n\n"
+        f"**Tempo & Rhythm:** {guide['tempo']}\n\n"
+        f"**Mood & Dynamics:** {guide['mood']}\n\n"
+        f"**Instrumentation:**\n{instruments}\n"
+    )
+
+
+class ArrangementLibrary:
+    """
+    A persisted cache of arrangement guides keyed by (genre, topic category).
+    """
+    def __init__(self, path=LIBRARY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._guides = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self._guides = json.load(file)
+
+    @staticmethod
+    def key(genre, topic):
+        return f'{normalize_genre(genre)}|{topic_category(topic)}'
+
+    def get(self, genre, topic):
+        """
+        Returns the cached guide for this genre and topic, or None for an unseen genre.
+        """
+        return self._guides.get(self.key(genre, topic))
+
+    def put(self, genre, topic, guide):
+        """
+        Stores a guide (a structured dict, or {'text': ...} from the LLM) and persists the library.
+        """
+        with self._lock:
+            self._guides[self.key(genre, topic)] = guide
+            self._save()
+
+    def warm(self):
+        """
+        Precomputes every (library genre, topic category) combination and persists them.
+        """
+        categories = list(TOPIC_CATEGORIES) + [DEFAULT_CATEGORY]
+        with self._lock:
+            for genre in BASE_GUIDES:
+                for category in categories:
+                    self._guides.setdefault(f'{genre}|{category}', build_guide(genre, category))
+            self._save()
+        return len(self._guides)
+
+    def _save(self):
+        # Write to a temp file first so a crash never leaves a half-written library behind
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(self._guides, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+_default_library = None
+_default_lock = threading.Lock()
+
+
+def default_library():
+    """
+    Returns the process-wide library, loading and warming it on first use.
+    """
+    global _default_library
+    with _default_lock:
+        if _default_library is None:
+            _default_library = ArrangementLibrary()
+            _default_library.warm()
+        return _default_library
+
+
+if __name__ == '__main__':
+    # Warm the library ahead of deployment: python arrangement_library.py
+    print(f"{default_library().warm()} arrangement guides stored in {LIBRARY_FILE}")
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- ARTIFACT STORE ---
+# Every crew output in one embedded database instead of loose .md/.txt files that the next run
+# overwrites:
+#
+#   runs        one row per crew run: crew, title, inputs, models, timings, status, final output
+#   run_inputs  the inputs as (key, value) rows, indexed, for exact lookups before a run
+#               ("the English guide for Romans", "the latest Berlin edition")
+#   tasks       each task's intermediate output, with its agent
+#   blobs       images and other binary outputs, content-addressed (sha256) so a re-used image
+#               is stored once; run_blobs links them to runs
+#   search      an FTS5 index over the title, final output and task outputs
+#
+# The file is runs/artifacts.sqlite (WAL), safe to share between the app threads and processes.
+
+ARTIFACT_STORE_FILE = os.path.join('runs', 'artifacts.sqlite')
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY, crew TEXT, title TEXT, inputs TEXT, models TEXT,
+    started REAL, finished REAL, status TEXT, output TEXT);
+CREATE INDEX IF NOT EXISTS runs_crew ON runs (crew, finished);
+CREATE TABLE IF NOT EXISTS run_inputs (run_id INTEGER, key TEXT, value TEXT);
+CREATE INDEX IF NOT EXISTS run_inputs_lookup ON run_inputs (key, value, run_id);
+CREATE TABLE IF NOT EXISTS tasks (run_id INTEGER, position INTEGER, agent TEXT, description TEXT, output TEXT);
+CREATE INDEX IF NOT EXISTS tasks_run ON tasks (run_id, position);
+CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, mime TEXT, size INTEGER, data BLOB);
+CREATE TABLE IF NOT EXISTS run_blobs (run_id INTEGER, name TEXT, sha256 TEXT);
+CREATE INDEX IF NOT EXISTS run_blobs_run ON run_blobs (run_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5 (crew UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+
+def input_value(value):
+    """
+    Inputs are matched as text; lists (e.g. newspaper sections) are matched as a sorted set.
+    """
+    if isinstance(value, (list, tuple, set)):
+        return json.dumps(sorted(str(item) for item in value), ensure_ascii=False)
+    return str(value)
+
+
+class ArtifactStore:
+    """
+    SQLite store of crew runs with a full-text index and a blob table.
+    """
+    def __init__(self, path=ARTIFACT_STORE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+
+    def record(self, crew, inputs, output, title=None, models=(), started=None, finished=None,
+               status='done', tasks=(), blobs=()):
+        """
+        Stores one run. `tasks` are (agent, description, output) tuples, `blobs` (name, bytes, mime)
+        tuples; a file path in place of the bytes is read when its row is written, so large files
+        are held in memory one at a time. Returns the run id.
+        """
+        finished = finished or time.time()
+        title = title or ' · '.join(str(value) for value in inputs.values() if isinstance(value, str) and value)[:200]
+        body = '\n\n'.join([output or ''] + [task_output or '' for _, _, task_output in tasks])
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                run_id = self._db.execute(
+                    'INSERT INTO runs (crew, title, inputs, models, started, finished, status, output) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (crew, title, json.dumps(inputs, ensure_ascii=False), json.dumps(sorted(set(models))),
+                     started, finished, status, output)
+                ).lastrowid
+                self._db.executemany('INSERT INTO run_inputs VALUES (?, ?, ?)',
+                                     [(run_id, key, input_value(value)) for key, value in inputs.items()])
+                self._db.executemany('INSERT INTO tasks VALUES (?, ?, ?, ?, ?)',
+                                     [(run_id, position, agent, description, task_output)
+                                      for position, (agent, description, task_output) in enumerate(tasks)])
+                for name, data, mime in blobs:
+                    if isinstance(data, str):
+                        try:
+                            with open(data, 'rb') as file:
+                                data = file.read()
+                        except FileNotFoundError:
+                            continue
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    self._db.execute('INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)', (sha256, mime, len(data), data))
+                    self._db.execute('INSERT INTO run_blobs VALUES (?, ?, ?)', (run_id, name, sha256))
+                self._db.execute('INSERT INTO search (rowid, crew, title, body) VALUES (?, ?, ?, ?)', (run_id, crew, title, body))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return run_id
+
+    def _run(self, row):
+        run = dict(row)
+        run['inputs'] = json.loads(run['inputs'])
+        run['models'] = json.loads(run['models'])
+        return run
+
+    def find(self, crew, max_age=None, statuses=('done',), limit=1, **inputs):
+        """
+        The most recent runs of `crew` whose inputs include all of `inputs` (exact match), newest
+        first: a list when limit > 1, else one run or None.
+        """
+        query = f"SELECT * FROM runs WHERE crew = ? AND status IN ({','.join('?' * len(statuses))})"
+        args = [crew, *statuses]
+        for key, value in inputs.items():
+            query += ' AND id IN (SELECT run_id FROM run_inputs WHERE key = ? AND value = ?)'
+            args += [key, input_value(value)]
+        if max_age is not None:
+            query += ' AND finished >= ?'
+            args.append(time.time() - max_age)
+        query += ' ORDER BY finished DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            runs = [self._run(row) for row in self._db.execute(query, args)]
+        return runs if limit > 1 else (runs[0] if runs else None)
+
+    def search(self, text, crew=None, limit=20):
+        """
+        Full-text search over titles and outputs, best matches first. `text` is an FTS5 query;
+        plain words match runs containing all of them.
+        """
+        query = ('SELECT runs.id, runs.crew, runs.title, runs.finished, runs.status, '
+                 "snippet(search, 2, '**', '**', ' … ', 16) AS snippet "
+                 'FROM search JOIN runs ON runs.id = search.rowid WHERE search MATCH ?')
+        args = [text]
+        if crew:
+            query += ' AND search.crew = ?'
+            args.append(crew)
+        query += ' ORDER BY rank LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            try:
+                return [dict(row) for row in self._db.execute(query, args)]
+            except sqlite3.OperationalError:
+                # Not valid FTS5 syntax (a stray quote or operator): search the words as phrases
+                args[0] = ' '.join('"' + word.replace('"', '') + '"' for word in text.split())
+                return [dict(row) for row in self._db.execute(query, args)]
+
+    def get(self, run_id):
+        """
+        A run with its task outputs and blob names, or None.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT * FROM runs WHERE id = ?', (run_id,)).fetchone()
+            if row is None:
+                return None
+            run = self._run(row)
+            run['tasks'] = [dict(task) for task in self._db.execute(
+                'SELECT agent, description, output FROM tasks WHERE run_id = ? ORDER BY position', (run_id,))]
+            run['blobs'] = [dict(blob) for blob in self._db.execute(
+                'SELECT run_blobs.name, run_blobs.sha256, blobs.mime, blobs.size FROM run_blobs '
+                'JOIN blobs ON blobs.sha256 = run_blobs.sha256 WHERE run_id = ?', (run_id,))]
+        return run
+
+    def blob(self, sha256):
+        """
+        Returns (bytes, mime) or None.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT data, mime FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+        return (row['data'], row['mime']) if row else None
+
+    def delete(self, run_id):
+        with self._lock:
+            self._db.execute('BEGIN')
+            for table, column in (('runs', 'id'), ('run_inputs', 'run_id'), ('tasks', 'run_id'), ('run_blobs', 'run_id'), ('search', 'rowid')):
+                self._db.execute(f'DELETE FROM {table} WHERE {column} = ?', (run_id,))
+            self._db.execute('DELETE FROM blobs WHERE sha256 NOT IN (SELECT sha256 FROM run_blobs)')
+            self._db.execute('COMMIT')
+
+
+def task_records(crew):
+    """
+    (agent, description, output) for every task of a crew that produced output.
+    """
+    return [(getattr(task.agent, 'role', None), task.description.strip()[:500], task.output.raw)
+            for task in crew.tasks if getattr(task, 'output', None) is not None]
+
+
+def crew_models(crew):
+    return [getattr(agent.llm, 'model', str(agent.llm)) for agent in crew.agents if getattr(agent, 'llm', None) is not None]
+
+
+def record_crew_run(crew_name, crew, inputs, outcome, started, title=None, blobs=(), store=None):
+    """
+    Records a finished run_with_budget() outcome of `crew`. Returns the run id.
+    """
+    store = store or default_artifact_store()
+    return store.record(crew_name, inputs, outcome['output'], title=title, models=crew_models(crew), started=started,
+                        status='done' if outcome['complete'] else 'partial', tasks=task_records(crew), blobs=blobs)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_artifact_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ArtifactStore()
+        return _default_store
@@ -3,16 +3,23 @@ from crewai import Agent, Task, Crew, Process,LLM
 from crewai_tools import SerperDevTool
 from langchain_google_genai import ChatGoogleGenerativeAI
 from win32comext.adsi.demos.scp import verbose
+from bible_verse_index import verse_tool_for
+from crew_templates import crew_template
+from llm_layer import build_llm
+from output_validators import GUARDRAIL_RETRIES, guardrail, in_language, min_headings, min_words
 
 
 class BibleStudyAgents:
     """Initializes agents with the user-selected Gemini model and API key."""
 
-    def __init__(self, model_name, api_key):
-        self.llm = LLM(
-            model=model_name,
-            api_key=api_key,
+    def __init__(self, model_name, api_key, hedge=None, hedge_fallbacks=None):
+        self.llm = build_llm(
+            model_name,
             temperature=0.5,
+            crew='bible_study',
+            hedge=hedge,
+            hedge_fallbacks=hedge_fallbacks,
+            api_key=api_key,
             verbose=True
         )
 
@@ -60,25 +67,39 @@ class BibleStudyAgents:
 class BibleStudyTasks:
     """Defines the tasks for creating the Bible study guide."""
 
+    # A section in the wrong language, without a heading or far too short is redone on its own
+    def section_guardrail(self, language, headings=1, words=150):
+        return guardrail(in_language(language), min_headings(headings), min_words(words))
+
     def historical_context_task(self, agent, bible_book, language):
         return Task(
             description=f"Create the 'Historical Background' section for a study guide on **{bible_book}**. Your output MUST be in {language}.",
             expected_output=f"A Markdown section on the historical background of {bible_book}, written entirely in {language}.",
-            agent=agent
+            agent=agent,
+            guardrail=self.section_guardrail(language),
+            max_retries=GUARDRAIL_RETRIES
         )
 
-    def theological_analysis_task(self, agent, bible_book, language):
+    def theological_analysis_task(self, agent, bible_book, language, offline_bible=False):
+        quoting = (
+            "Quote every key verse exactly as returned by the Bible Verse Lookup tool; never quote from memory."
+            if offline_bible else f"Use a well-known {language} Bible translation for quotes."
+        )
         return Task(
-            description=f"Create the 'Theological Themes & Key Verses' section for **{bible_book}**. Your output MUST be in {language}. Use a well-known {language} Bible translation for quotes.",
+            description=f"Create the 'Theological Themes & Key Verses' section for **{bible_book}**. Your output MUST be in {language}. {quoting}",
             expected_output=f"A detailed Markdown section on theological themes of {bible_book}, written entirely in {language}.",
-            agent=agent
+            agent=agent,
+            guardrail=self.section_guardrail(language),
+            max_retries=GUARDRAIL_RETRIES
         )
 
     def application_task(self, agent, bible_book, language):
         return Task(
             description=f"Create the 'Practical Application & Reflection' section for **{bible_book}**. Your output MUST be in {language}.",
             expected_output=f"An encouraging Markdown section with discussion questions and prayer points for {bible_book}, written entirely in {language}.",
-            agent=agent
+            agent=agent,
+            guardrail=self.section_guardrail(language),
+            max_retries=GUARDRAIL_RETRIES
         )
 
     def editing_task(self, agent, bible_book, language, context):
@@ -87,15 +108,19 @@ class BibleStudyTasks:
             expected_output=f"A complete, well-formatted Markdown document in {language}.",
             agent=agent,
             context=context,
+            guardrail=self.section_guardrail(language, headings=3, words=400),
+            max_retries=GUARDRAIL_RETRIES,
             output_file=f'final_study_guide_{language.lower()}.md'
         )
 
 
-def create_bible_study_crew(bible_book, language, selected_model, gemini_api_key, serper_api_key):
+def create_bible_study_crew(bible_book, language, selected_model, gemini_api_key, serper_api_key, hedge=None, hedge_fallbacks=None):
     """
     This function initializes the AI crew with user-provided credentials and model selection.
+    With hedge=True, slow calls are retried in parallel on the same model or the hedge_fallbacks;
+    hedge=None leaves it to LLM_HEDGE.
     """
-    agents = BibleStudyAgents(model_name=selected_model, api_key=gemini_api_key)
+    agents = BibleStudyAgents(model_name=selected_model, api_key=gemini_api_key, hedge=hedge, hedge_fallbacks=hedge_fallbacks)
     tasks = BibleStudyTasks()
     # Correctly initialize the search tool with the user's key
     search_tool = SerperDevTool(api_key=serper_api_key)
@@ -110,9 +135,14 @@ def create_bible_study_crew(bible_book, language, selected_model, gemini_api_key
     #historian.tools = [search_tool]
    # theologian.tools = [search_tool]
 
+    # Quotes come from the offline verse index when one has been built for this language
+    verse_tool = verse_tool_for(language)
+    if verse_tool:
+        theologian.tools = [verse_tool]
+
     # Define Tasks
     task1 = tasks.historical_context_task(historian, bible_book, language)
-    task2 = tasks.theological_analysis_task(theologian, bible_book, language)
+    task2 = tasks.theological_analysis_task(theologian, bible_book, language, offline_bible=verse_tool is not None)
     task3 = tasks.application_task(pastor, bible_book, language)
     task4 = tasks.editing_task(editor, bible_book, language, [task1, task2, task3])
 
@@ -121,4 +151,14 @@ def create_bible_study_crew(bible_book, language, selected_model, gemini_api_key
         tasks=[task1, task2, task3, task4],
         process=Process.sequential,
         verbose=True
-    )
\ No newline at end of file
+    )
+
+def bind_bible_study_crew(bible_book, language, selected_model, gemini_api_key, serper_api_key, hedge=None, hedge_fallbacks=None):
+    """
+    Like create_bible_study_crew, but copies a crew built once per language, model and keys.
+    Returns (crew, inputs); run it with run_with_budget(crew, budget, inputs=inputs).
+    """
+    template = crew_template(create_bible_study_crew, ('bible_book',), language=language, selected_model=selected_model,
+                             gemini_api_key=gemini_api_key, serper_api_key=serper_api_key,
+                             hedge=hedge, hedge_fallbacks=hedge_fallbacks)
+    return template.bind(bible_book=bible_book)
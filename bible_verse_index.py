@@ -0,0 +1,275 @@
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import unicodedata
+from crewai.tools import BaseTool
+from bible_books import ENGLISH_BOOKS, BIBLE_BOOKS_TRANSLATIONS
+
+# --- OFFLINE BIBLE VERSE INDEX ---
+# One compact binary file per language, memory-mapped at runtime:
+#
+#   header   : magic b'BVI1', verse count n                       ('<4sI')
+#   keys     : n sorted uint64 keys  book << 32 | chapter << 16 | verse
+#   spans    : n (offset, length) uint32 pairs into the text blob
+#   blob     : UTF-8 verse texts, back to back
+#
+# Lookups binary-search the key array straight out of the mapping, so resolving a
+# reference never touches the network and never copies the index into memory.
+
+INDEX_DIR = 'bible_index'
+MAGIC = b'BVI1'
+HEADER = struct.Struct('<4sI')
+
+
+def verse_key(book, chapter, verse):
+    return (book << 32) | (chapter << 16) | verse
+
+
+def index_path(language):
+    return os.path.join(INDEX_DIR, f'{language.lower()}.bvi')
+
+
+def build_index(verses, path):
+    """
+    Writes an index file from an iterable of (book_number, chapter, verse, text) tuples,
+    where book_number follows the canonical order of ENGLISH_BOOKS (Genesis = 1).
+    """
+    entries = sorted((verse_key(book, chapter, verse), text.strip().encode('utf-8')) for book, chapter, verse, text in verses)
+    keys, spans, blob, offset = [], [], [], 0
+    for key, text in entries:
+        keys.append(key)
+        spans.extend((offset, len(text)))
+        blob.append(text)
+        offset += len(text)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(keys)))
+        file.write(struct.pack(f'<{len(keys)}Q', *keys))
+        file.write(struct.pack(f'<{len(spans)}I', *spans))
+        file.write(b''.join(blob))
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+def read_verses_tsv(path):
+    """
+    Reads a tab-separated verse dump with the columns: book, chapter, verse, text.
+    The book column may be the canonical number (1-66) or an English book name.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.strip() or line.startswith('#'):
+                continue
+            book, chapter, verse, text = line.rstrip('\n').split('\t', 3)
+            book_number = int(book) if book.isdigit() else ENGLISH_BOOKS.index(book) + 1
+            yield book_number, int(chapter), int(verse), text
+
+
+class VerseIndex:
+    """
+    A read-only, memory-mapped verse store for one language.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Bible verse index")
+        view = memoryview(self._map)
+        keys_end = HEADER.size + 8 * count
+        spans_end = keys_end + 8 * count
+        self._keys = view[HEADER.size:keys_end].cast('Q')
+        self._spans = view[keys_end:spans_end].cast('I')
+        self._blob_start = spans_end
+        if sys.byteorder != 'little':
+            # The file is little-endian; fall back to decoded copies on big-endian hosts
+            self._keys = struct.unpack_from(f'<{count}Q', self._map, HEADER.size)
+            self._spans = struct.unpack_from(f'<{2 * count}I', self._map, keys_end)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _text(self, position):
+        offset, length = self._spans[2 * position], self._spans[2 * position + 1]
+        start = self._blob_start + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def verse(self, book, chapter, verse):
+        """
+        Returns the text of a single verse, or None if it is not in the index.
+        """
+        key = verse_key(book, chapter, verse)
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return self._text(position)
+        return None
+
+    def passage(self, book, chapter, first_verse=None, last_verse=None):
+        """
+        Returns [(verse_number, text), ...] for a verse range, or the whole chapter
+        when no verses are given.
+        """
+        low = verse_key(book, chapter, first_verse or 0)
+        high = verse_key(book, chapter, last_verse or first_verse or 0xFFFF)
+        start = bisect.bisect_left(self._keys, low)
+        end = bisect.bisect_right(self._keys, high)
+        return [(self._keys[i] & 0xFFFF, self._text(i)) for i in range(start, end)]
+
+
+# --- REFERENCE PARSER ---
+
+def normalize_book_name(name):
+    """
+    Case-, accent- and punctuation-insensitive form of a book name: "1. Könige" -> "1konige".
+    """
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    return re.sub(r'[^a-z0-9]', '', ''.join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+# Common singular forms and short names not covered by the translated lists
+EXTRA_BOOK_NAMES = (('Psalm', 19), ('Psalmen', 19), ('Psaume', 19), ('Song of Songs', 22), ('Revelations', 66))
+
+
+def _book_names():
+    names = [(name, number) for books in BIBLE_BOOKS_TRANSLATIONS.values() for number, name in enumerate(books, start=1)]
+    return names + list(EXTRA_BOOK_NAMES)
+
+
+def _book_aliases():
+    aliases = {}
+    for name, number in _book_names():
+        aliases.setdefault(normalize_book_name(name), number)
+    return aliases
+
+
+def _book_pattern(name):
+    # "1. Korinther" also matches "1 Korinther" and "1Korinther"; any run of spaces is allowed
+    match = re.match(r'([1-3])\.?\s*(.*)', name)
+    prefix, rest = (rf'{match.group(1)}\.?\s*', match.group(2)) if match else ('', name)
+    return prefix + r'\s+'.join(re.escape(word) for word in rest.split())
+
+
+BOOK_ALIASES = _book_aliases()
+SORTED_ALIASES = sorted(BOOK_ALIASES)
+BOOK_NAMES = '|'.join(sorted({_book_pattern(name) for name, _ in _book_names()}, key=len, reverse=True))
+
+# "John 3:16", "1. Korinther 13,4-7", "Psalm 23", "Jean 3.16", "Mwanzo 1:1-3", "Joh 3:16".
+# The book starts at a word boundary and is a known name or a single (abbreviated) word, so the
+# words before it ("See John 3:16") are never taken for part of it.
+REFERENCE = re.compile(
+    rf'(?<!\w)(?P<book>{BOOK_NAMES}|(?:[1-3]\.?\s*)?[^\W\d_]+\.?)\s*'
+    r'(?P<chapter>\d{1,3})'
+    r'(?:\s*[:.,](?P<first>\d{1,3})(?:\s*[-–](?P<last>\d{1,3}))?)?'
+    r'(?!\d)',
+    re.IGNORECASE
+)
+
+
+def resolve_book(name):
+    """
+    Returns the canonical book number for a localized name or unique prefix ("Joh", "Gen"), or None.
+    """
+    normalized = normalize_book_name(name)
+    if not normalized:
+        return None
+    if normalized in BOOK_ALIASES:
+        return BOOK_ALIASES[normalized]
+    position = bisect.bisect_left(SORTED_ALIASES, normalized)
+    candidates = set()
+    while position < len(SORTED_ALIASES) and SORTED_ALIASES[position].startswith(normalized):
+        candidates.add(BOOK_ALIASES[SORTED_ALIASES[position]])
+        position += 1
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+def parse_references(text):
+    """
+    Parses free text such as "John 3:16, Psalm 23" into a list of
+    (book_number, chapter, first_verse, last_verse) tuples; verses are None for whole chapters.
+    """
+    references = []
+    for match in REFERENCE.finditer(text):
+        book = resolve_book(match.group('book'))
+        if book is None:
+            continue
+        first = int(match.group('first')) if match.group('first') else None
+        last = int(match.group('last')) if match.group('last') else first
+        references.append((book, int(match.group('chapter')), first, last))
+    return references
+
+
+# --- INDEX REGISTRY & AGENT TOOL ---
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(language):
+    """
+    Returns the memory-mapped index for a language (opened once per process), or None if
+    no index has been built for it. Misses are not remembered, so an index built later is
+    picked up by the next call.
+    """
+    with _indexes_lock:
+        if language not in _indexes:
+            path = index_path(language)
+            if not os.path.exists(path):
+                return None
+            _indexes[language] = VerseIndex(path)
+        return _indexes[language]
+
+
+def lookup_references(text, language):
+    """
+    Resolves every reference in `text` to its exact verse text in the given language.
+    Returns a Markdown block, one quoted passage per reference.
+    """
+    index = get_index(language)
+    if index is None:
+        return f"No offline Bible index is available for {language}."
+
+    books = BIBLE_BOOKS_TRANSLATIONS[language]
+    blocks = []
+    for book, chapter, first, last in parse_references(text):
+        verses = index.passage(book, chapter, first, last)
+        label = f"{books[book - 1]} {chapter}" + (f":{first}" if first else "") + (f"-{last}" if last and last != first else "")
+        if not verses:
+            blocks.append(f"**{label}**: not found in the {language} index.")
+            continue
+        quoted = ' '.join(f"[{number}] {verse_text}" for number, verse_text in verses)
+        blocks.append(f"**{label}**\n> {quoted}")
+    return '\n\n'.join(blocks) if blocks else "No Bible references were recognised in the input."
+
+
+class BibleVerseLookupTool(BaseTool):
+    name: str = "Bible Verse Lookup"
+    description: str = (
+        "Returns the exact text of Bible passages from an offline Bible. "
+        "Input: one or more references, e.g. 'John 3:16, Psalm 23' (localized book names work too)."
+    )
+    language: str = "English"
+
+    def _run(self, references: str) -> str:
+        return lookup_references(references, self.language)
+
+
+def verse_tool_for(language):
+    """
+    Returns a lookup tool for this language, or None if its index has not been built yet.
+    """
+    return BibleVerseLookupTool(language=language) if get_index(language) is not None else None
+
+
+if __name__ == '__main__':
+    # Build an index from a verse dump: python bible_verse_index.py build English kjv.tsv
+    if len(sys.argv) == 4 and sys.argv[1] == 'build':
+        count = build_index(read_verses_tsv(sys.argv[3]), index_path(sys.argv[2]))
+        print(f"Indexed {count} verses into {index_path(sys.argv[2])}")
+    else:
+        print("Usage: python bible_verse_index.py build <language> <verses.tsv>")
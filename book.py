@@ -1,7 +1,9 @@
 import os
 from crewai import Agent, Task, Crew, Process
 from crewai_tools import SerperDevTool, ScrapeWebsiteTool, FileReadTool
-from langchain_openai import ChatOpenAI
+from crew_templates import crew_template
+from llm_layer import build_llm
+from output_validators import GUARDRAIL_RETRIES, guardrail, in_language, min_words
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -14,7 +16,7 @@ class BookWritingAgents:
     A class to encapsulate the definitions of all agents involved in the book writing process.
     """
     def __init__(self):
-        self.llm = ChatOpenAI(model_name="gpt-4o", temperature=0.7)
+        self.llm = build_llm("gpt-4o", temperature=0.7, crew='book')
         self.search_tool = SerperDevTool()
         self.scrape_tool = ScrapeWebsiteTool()
         self.file_tool = FileReadTool()
@@ -87,6 +89,8 @@ class BookWritingTasks:
             """,
             expected_output=f"A detailed, multi-level book outline with all content written strictly in {language}.",
             agent=agent,
+            guardrail=guardrail(in_language(language), min_words(200)),
+            max_retries=GUARDRAIL_RETRIES,
         )
         
     def research_task(self, agent, context, language):
@@ -105,7 +109,10 @@ class BookWritingTasks:
             """,
             expected_output=f"A well-organized research document, tailored for a writer working in {language}.",
             agent=agent,
-            context=context
+            context=context,
+            # Research notes may quote sources in other languages, so only their length is checked
+            guardrail=guardrail(min_words(300)),
+            max_retries=GUARDRAIL_RETRIES
         )
 
     def writing_task(self, agent, context, language):
@@ -124,7 +131,9 @@ class BookWritingTasks:
             """,
             expected_output=f"The complete, well-written text for the first three chapters of the book, written entirely in {language}.",
             agent=agent,
-            context=context
+            context=context,
+            guardrail=guardrail(in_language(language), min_words(900)),
+            max_retries=GUARDRAIL_RETRIES
         )
         
     def editing_task(self, agent, context, language):
@@ -145,6 +154,8 @@ class BookWritingTasks:
             expected_output=f"The final, edited, and polished text for the written chapters, ready for publication in {language}.",
             agent=agent,
             context=context,
+            guardrail=guardrail(in_language(language), min_words(900)),
+            max_retries=GUARDRAIL_RETRIES,
             output_file=f'book_final_output_{language.lower()}.md' # Dynamic filename
         )
 
@@ -179,8 +190,19 @@ def create_book_crew(topic, user_prompt, language):
     )
 
     return book_crew
+
+
+def bind_book_crew(topic, user_prompt, language):
+    """
+    Like create_book_crew, but copies a crew built once per language. Returns (crew, inputs);
+    run it with run_with_budget(crew, budget, inputs=inputs).
+    """
+    return crew_template(create_book_crew, ('topic', 'user_prompt'), language=language).bind(topic=topic, user_prompt=user_prompt)
 import streamlit as st
-from book_crew import create_book_crew
+from book_crew import bind_book_crew
+from crew_budgets import crew_budget, run_with_budget
+from artifact_store import default_artifact_store, record_crew_run
+import time
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -241,28 +263,50 @@ if st.button(f"Start Writing My Book in {language}"):
     else:
         with st.spinner(f"Your AI crew is assembling to write in {language}... This may take several minutes."):
             try:
-                # Create and run the crew with language parameter
-                book_writing_crew = create_book_crew(topic, user_prompt, language)
-                result = book_writing_crew.kickoff()
-
-                st.success("Your AI crew has completed its task!")
-                st.balloons()
-                
-                st.subheader("Final Book Output")
-                
-                # UPDATED: Read from the dynamic output file
-                output_filename = f'book_final_output_{language.lower()}.md'
-                try:
-                    with open(output_filename, 'r', encoding='utf-8') as file:
-                        final_output = file.read()
-                    st.markdown(final_output)
-                except FileNotFoundError:
-                    st.error(f"The final output file ('{output_filename}') was not found. Displaying raw result instead.")
-                    st.write(result)
+                # Copy the crew prebuilt for this language and bind the topic and description
+                book_writing_crew, crew_inputs = bind_book_crew(topic, user_prompt, language)
+                # Caps delegation from the narrative crafter, steps, tokens and total run time
+                started = time.time()
+                outcome = run_with_budget(book_writing_crew, crew_budget('book'), inputs=crew_inputs)
+                result = outcome['output']
+                # Outline, research and chapters are kept with the final text
+                record_crew_run('book', book_writing_crew, {'topic': topic, 'description': user_prompt, 'language': language},
+                                outcome, started, title=f"{topic} ({language})")
+
+                if not outcome['complete']:
+                    st.warning(f"The crew was stopped early ({outcome['reason']}). Showing the furthest finished stage.")
+                    st.markdown(result)
+                else:
+                    st.success("Your AI crew has completed its task!")
+                    st.balloons()
+
+                    st.subheader("Final Book Output")
+
+                    # UPDATED: Read from the dynamic output file
+                    output_filename = f'book_final_output_{language.lower()}.md'
+                    try:
+                        with open(output_filename, 'r', encoding='utf-8') as file:
+                            final_output = file.read()
+                        st.markdown(final_output)
+                    except FileNotFoundError:
+                        st.error(f"The final output file ('{output_filename}') was not found. Displaying raw result instead.")
+                        st.write(result)
 
             except Exception as e:
                 st.error(f"An error occurred while running the AI crew: {e}")
 
+# --- Earlier Books ---
+with st.expander("🔎 Search earlier books"):
+    query = st.text_input("Words from the title, outline or chapters:", key="book_search")
+    if query:
+        matches = default_artifact_store().search(query, crew='book')
+        if not matches:
+            st.write("No earlier book matches.")
+        for match in matches:
+            st.markdown(f"**{match['title']}** · {time.strftime('%Y-%m-%d', time.localtime(match['finished']))}  \n{match['snippet']}")
+            if st.button("Open", key=f"open_book_{match['id']}"):
+                st.markdown(default_artifact_store().get(match['id'])['output'])
+
 # --- Footer ---
 st.markdown("---")
 st.markdown("Developed by an AI Author & Python Expert.")
\ No newline at end of file
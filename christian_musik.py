@@ -1,14 +1,16 @@
 import os
 from crewai import Agent, Task, Crew, Process
 from crewai_tools import SerperDevTool
-from langchain_openai import ChatOpenAI
+from llm_layer import build_llm
 from dotenv import load_dotenv
+from bible_verse_index import verse_tool_for
 
 # Load environment variables
 load_dotenv()
 
 # Initialize tools
 search_tool = SerperDevTool()
+verse_tool = verse_tool_for("English")  # None until the English verse index has been built
 
 # --- AGENT DEFINITIONS ---
 
@@ -17,7 +19,7 @@ class MusicCreationAgents:
     A class that encapsulates the definitions of all agents in our AI worship team.
     """
     def __init__(self):
-        self.llm = ChatOpenAI(model_name="gpt-4o", temperature=0.7)
+        self.llm = build_llm("gpt-4o", temperature=0.7, crew='music')
 
     def theological_lyricist(self):
         return Agent(
@@ -25,10 +27,11 @@ class MusicCreationAgents:
             goal='Analyze user-provided Bible verses and topics to extract core theological truths, emotions, and imagery to serve as the foundation for a worship song.',
             backstory=(
                 "With a Master's in Divinity and a heart for worship, you bridge the gap between deep biblical study and heartfelt lyrical expression. "
-                "You unpack scripture to find the raw, emotional, and poetic elements that can inspire a powerful song."
+                "You unpack scripture to find the raw, emotional, and poetic elements that can inspire a powerful song. "
+                "You always quote scripture exactly, using the Bible Verse Lookup tool when it is available."
             ),
             llm=self.llm,
-            tools=[search_tool],
+            tools=[verse_tool, search_tool] if verse_tool else [search_tool],
             allow_delegation=False,
             verbose=True
         )
@@ -185,6 +188,7 @@ def create_music_crew(genre, verses, topic):
     return crew
 import streamlit as st
 from music_crew import create_music_crew
+from crew_budgets import crew_budget, run_with_budget
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -236,24 +240,29 @@ if st.button("Compose & Generate Lyria Prompt"):
     else:
         with st.spinner("Your AI Worship Team is gathering... This may take a few minutes."):
             try:
-                # Create and run the crew
+                # Create and run the crew under the music budget
                 music_creation_crew = create_music_crew(genre, verses, topic)
-                result = music_creation_crew.kickoff()
+                run = run_with_budget(music_creation_crew, crew_budget('music'))
+                result = run['output']
+
+                if run['reason']:
+                    # The prompt file was not written by this run; it may hold an earlier song's prompt
+                    st.warning(f"The songwriters were stopped early ({run['reason']}); showing the furthest step they finished.")
+                else:
+                    st.success("Song concept and prompt created successfully!")
+
+                    st.subheader("✅ Your Final Lyria Prompt")
+                    st.info("Copy this prompt and use it with a tool that connects to Google's Lyria model to generate the music.", icon="📋")
+
+                    # Read the final prompt from the output file
+                    try:
+                        with open('final_lyria_prompt.txt', 'r', encoding='utf-8') as file:
+                            final_prompt = file.read()
+                        st.code(final_prompt, language="text")
+                    except FileNotFoundError:
+                        st.error("The prompt file was not found. Displaying raw result instead.")
+                        st.write(result)
 
-                st.success("Song concept and prompt created successfully!")
-                
-                st.subheader("✅ Your Final Lyria Prompt")
-                st.info("Copy this prompt and use it with a tool that connects to Google's Lyria model to generate the music.", icon="📋")
-                
-                # Read the final prompt from the output file
-                try:
-                    with open('final_lyria_prompt.txt', 'r', encoding='utf-8') as file:
-                        final_prompt = file.read()
-                    st.code(final_prompt, language="text")
-                except FileNotFoundError:
-                    st.error("The prompt file was not found. Displaying raw result instead.")
-                    st.write(result)
-                
                 with st.expander("👀 See the AI Team's Creative Process"):
                     st.markdown(result)
 
@@ -269,10 +278,19 @@ st.markdown("Developed by an AI Musician & Python Expert.")
 
 
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from crewai import Agent, Task, Crew, Process
 from crewai_tools import SerperDevTool
-from langchain_openai import ChatOpenAI
+from llm_layer import build_llm
 from dotenv import load_dotenv
+from arrangement_library import default_library, format_guide
+from output_validators import GUARDRAIL_RETRIES, guardrail, has_song_sections, max_words
+from artifact_store import default_artifact_store
+from crew_budgets import crew_budget, run_with_budget
+from crew_templates import crew_template
+from lyria_prompt_compiler import compile_lyria_prompt, new_run_id, parse_arrangement, parse_song_sections, write_prompt_artifact
 
 # Load environment variables
 load_dotenv()
@@ -287,7 +305,7 @@ class MusicCreationAgents:
     A class that encapsulates the definitions of all agents in our AI Music Collective.
     """
     def __init__(self):
-        self.llm = ChatOpenAI(model_name="gpt-4o", temperature=0.7)
+        self.llm = build_llm("gpt-4o", temperature=0.7, crew='music')
 
     def lyrical_concept_developer(self):
         return Agent(
@@ -376,7 +394,10 @@ class MusicCreationTasks:
             """,
             expected_output="A complete song with clearly labeled sections (Verse 1, Chorus, etc.).",
             agent=agent,
-            context=context
+            context=context,
+            # The prompt compiler reads the lyrics by their section labels
+            guardrail=guardrail(has_song_sections('verse', 'chorus', 'bridge'), max_words(600)),
+            max_retries=GUARDRAIL_RETRIES
         )
     
     def arrangement_task(self, agent, genre, topic):
@@ -406,7 +427,12 @@ class MusicCreationTasks:
             agent=agent
         )
 
-    def prompt_generation_task(self, agent, context):
+    def prompt_generation_task(self, agent, context, output_file='final_lyria_prompt.txt', arrangement_guide=None):
+        # A guide from the arrangement library is handed over inline instead of as task context
+        guide_section = f"""
+                Musical Arrangement Guide:
+                {arrangement_guide}
+            """ if arrangement_guide else ""
         return Task(
             description="""
                 Combine the final lyrics and the Musical Arrangement Guide into one single, detailed prompt for Google's Lyria model.
@@ -416,45 +442,216 @@ class MusicCreationTasks:
                 Then, integrate the lyrics, suggesting the musical feel for each section (e.g., "The verse is sparse with just a shuffling drum and bassline...").
                 
                 The final prompt must be a masterpiece of instruction, ensuring the AI captures the specific genre requested.
-            """,
+            """ + guide_section,
             expected_output="A single, comprehensive text prompt, formatted and optimized for use with Google's Lyria generative music model.",
             agent=agent,
             context=context,
-            output_file='final_lyria_prompt.txt'
+            output_file=output_file
+        )
+
+    def prompt_polish_task(self, agent, compiled_prompt):
+        return Task(
+            description=f"""
+                Polish the following Lyria prompt, which was compiled from the final lyrics and the Musical Arrangement Guide.
+                Improve the wording and the musical direction for each section, but keep every lyric line, the section order, the tempo and the instrumentation unchanged.
+
+                Compiled prompt:
+                {compiled_prompt}
+            """,
+            expected_output="The polished Lyria prompt, with the same sections and lyrics as the compiled prompt.",
+            agent=agent
         )
 
 # --- CREW SETUP ---
 
-def create_music_crew(genre, text_input, topic):
+def arrangement_stage(agents, tasks, genre, topic, library):
+    """
+    Looks the arrangement guide up in the library. On a hit no arranger is needed and the guide
+    text is returned; on a miss the arranger agent and task are returned, and the task stores
+    its output in the library once it completes.
+    Returns (agents, tasks, guide_text).
+    """
+    guide = library.get(genre, topic)
+    if guide is not None:
+        return [], [], format_guide(guide)
+
+    arranger = agents.music_arranger()
+    task3 = tasks.arrangement_task(arranger, genre, topic)
+    task3.callback = lambda output: library.put(genre, topic, {'genre': genre, 'text': output.raw})
+    return [arranger], [task3], None
+
+def create_music_crew(genre, text_input, topic, library=None):
     """
     Factory function to create and configure the music creation crew.
+    The arrangement guide comes from the arrangement library when the genre is known there.
     """
     agents = MusicCreationAgents()
     tasks = MusicCreationTasks()
+    library = library or default_library()
 
     # Instantiate Agents
     concept_dev = agents.lyrical_concept_developer()
     songwriter = agents.genre_songwriter()
-    arranger = agents.music_arranger()
     prompt_technician = agents.lyria_prompt_technician()
+    arrangement_agents, arrangement_tasks, guide = arrangement_stage(agents, tasks, genre, topic, library)
     
     # Define Tasks
     task1 = tasks.lyrical_concept_task(concept_dev, text_input, topic)
-    task3 = tasks.arrangement_task(arranger, genre, topic)
     task2 = tasks.song_writing_task(songwriter, [task1])
-    task4 = tasks.prompt_generation_task(prompt_technician, [task2, task3])
+    task4 = tasks.prompt_generation_task(prompt_technician, [task2] + arrangement_tasks, arrangement_guide=guide)
 
     # Assemble the Crew
     crew = Crew(
-        agents=[concept_dev, songwriter, arranger, prompt_technician],
-        tasks=[task1, task3, task2, task4],
+        agents=[concept_dev, songwriter] + arrangement_agents + [prompt_technician],
+        tasks=[task1] + arrangement_tasks + [task2, task4],
         process=Process.sequential,
         verbose=2
     )
     return crew
-    
+
+# --- COMPILED PROMPT RUNS ---
+# The Lyria prompt is compiled locally from the lyrics and the arrangement guide;
+# the Lyria Prompt Technician is only consulted when a polish pass is requested.
+
+def genre_prompt_file(genre):
+    """
+    Returns the per-genre artifact file name for a batch run, e.g. 'lyria_prompt_hip-hop.txt'.
+    """
+    slug = re.sub(r'[^a-z0-9]+', '-', genre.lower()).strip('-')
+    return f'lyria_prompt_{slug}.txt'
+
+def create_song_crew(text_input, topic):
+    """
+    Builds the genre-independent half of the music crew: the lyrical concept and the song itself.
+    Returns the crew together with the song writing task so its output can be reused.
+    """
+    agents = MusicCreationAgents()
+    tasks = MusicCreationTasks()
+
+    concept_dev = agents.lyrical_concept_developer()
+    songwriter = agents.genre_songwriter()
+
+    task1 = tasks.lyrical_concept_task(concept_dev, text_input, topic)
+    task2 = tasks.song_writing_task(songwriter, [task1])
+
+    crew = Crew(
+        agents=[concept_dev, songwriter],
+        tasks=[task1, task2],
+        process=Process.sequential,
+        verbose=2
+    )
+    return crew, task2
+
+def _song_crew(text_input, topic):
+    return create_song_crew(text_input, topic)[0]
+
+def bind_song_crew(text_input, topic):
+    """
+    Like create_song_crew, but copies a crew built once per process. Returns (crew, inputs); the
+    song writing task is the crew's last task.
+    """
+    return crew_template(_song_crew, ('text_input', 'topic')).bind(text_input=text_input, topic=topic)
+
+def resolve_arrangement(genre, topic, library=None, budget=None):
+    """
+    Returns the arrangement guide for this genre and topic, running the Music Arranger
+    only when the arrangement library has never seen the genre. A guide cut short by the
+    budget is used once but not kept in the library.
+    """
+    library = library or default_library()
+    guide = library.get(genre, topic)
+    if guide is None:
+        agents = MusicCreationAgents()
+        tasks = MusicCreationTasks()
+        arranger = agents.music_arranger()
+        task3 = tasks.arrangement_task(arranger, genre, topic)
+        crew = Crew(agents=[arranger], tasks=[task3], process=Process.sequential, verbose=2)
+        outcome = run_with_budget(crew, (budget or crew_budget('music')).child())
+        guide = {'genre': genre, 'text': outcome['output']}
+        if outcome['complete']:
+            library.put(genre, topic, guide)
+    return guide
+
+def compose_lyria_prompt(genre, song_text, guide, run_id, filename='lyria_prompt.txt', polish=False, budget=None):
+    """
+    Compiles the Lyria prompt and writes it to the run's artifact directory.
+    With `polish=True` the Lyria Prompt Technician gets one pass over the compiled prompt; if the
+    budget runs out first, the compiled prompt is kept.
+    Returns (prompt, artifact_path).
+    """
+    prompt = compile_lyria_prompt(genre, parse_song_sections(song_text), parse_arrangement(guide))
+    if polish:
+        agents = MusicCreationAgents()
+        tasks = MusicCreationTasks()
+        prompt_technician = agents.lyria_prompt_technician()
+        task5 = tasks.prompt_polish_task(prompt_technician, prompt)
+        crew = Crew(agents=[prompt_technician], tasks=[task5], process=Process.sequential, verbose=2)
+        outcome = run_with_budget(crew, (budget or crew_budget('music')).child())
+        if outcome['complete']:
+            prompt = outcome['output']
+    return prompt, write_prompt_artifact(prompt, run_id, filename)
+
+def record_song(genre, text_input, topic, song, guide, prompt, started, artifacts=None):
+    """
+    Keeps the Lyria prompt, the lyrics and the arrangement guide in the artifact store.
+    """
+    (artifacts or default_artifact_store()).record(
+        'music', {'genre': genre, 'topic': topic, 'text': text_input}, prompt,
+        title=f"{topic or text_input[:60]} ({genre})", started=started,
+        tasks=[("Songwriter", "Lyrics", song), ("Music Arranger", "Arrangement guide", format_guide(guide))]
+    )
+
+def run_music_crew(genre, text_input, topic, polish=False, library=None, run_id=None, budget=None, artifacts=None):
+    """
+    Writes the song and resolves the arrangement in parallel, then compiles the Lyria prompt.
+    Every crew runs under a child of `budget` (default: the 'music' crew budget).
+    Returns a dict with the 'prompt', its 'artifact' path, the 'song' lyrics and, when the
+    budget cut the song short, the 'reason'.
+    """
+    started = time.time()
+    run_id = run_id or new_run_id()
+    budget = budget or crew_budget('music')
+    song_crew, inputs = bind_song_crew(text_input, topic)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        song_future = executor.submit(run_with_budget, song_crew, budget.child(), inputs)
+        guide = resolve_arrangement(genre, topic, library, budget)
+        song = song_future.result()
+
+    prompt, artifact = compose_lyria_prompt(genre, song['output'], guide, run_id, polish=polish, budget=budget)
+    record_song(genre, text_input, topic, song['output'], guide, prompt, started, artifacts)
+    return {'prompt': prompt, 'artifact': artifact, 'song': song['output'], 'reason': song['reason']}
+
+# --- BATCH MODE (one song, many genres) ---
+
+def run_music_batch(genres, text_input, topic, max_workers=4, polish=False, library=None, run_id=None, budget=None):
+    """
+    Writes one song and produces a Lyria prompt for each genre in `genres`.
+
+    The lyrical concept and the lyrics are generated once (2 LLM tasks); the genres are then
+    fanned out in parallel. A genre costs no LLM call when the arrangement library knows it,
+    one when it does not, and one more with `polish=True`. All crews share one budget
+    (default: the 'music' crew budget).
+    Returns a dict mapping each genre to its final Lyria prompt.
+    """
+    started = time.time()
+    run_id = run_id or new_run_id()
+    budget = budget or crew_budget('music')
+    song_crew, inputs = bind_song_crew(text_input, topic)
+    song = run_with_budget(song_crew, budget.child(), inputs)['output']
+
+    def run_genre(genre):
+        guide = resolve_arrangement(genre, topic, library, budget)
+        prompt, _ = compose_lyria_prompt(genre, song, guide, run_id, genre_prompt_file(genre), polish, budget)
+        record_song(genre, text_input, topic, song, guide, prompt, started)
+        return genre, prompt
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(genres)))) as executor:
+        return dict(executor.map(run_genre, genres))
+
 import streamlit as st
-from music_crew import create_music_crew
+from music_crew import run_music_crew, run_music_batch
+from lyria_render import AudioCache, FakeAudioBackend, VertexLyriaBackend, stream_audio
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -472,6 +669,11 @@ with st.sidebar:
     st.text_input("Google Cloud Project ID", key="project_id", help="Required for future Lyria integration.")
     st.text_input("Gemini/Google AI API Key", key="gemini_key", type="password", help="Required for future Lyria integration.")
     st.info("Currently, the crew's 'thinking' is powered by OpenAI. Ensure your `.env` file has an `OPENAI_API_KEY`.")
+    audio_backend_name = st.radio(
+        "Audio render backend",
+        ("Local preview (offline)", "Google Lyria (Vertex AI)"),
+        help="The local preview synthesizes a placeholder clip, so the whole pipeline can be tried without Google Cloud."
+    )
 
 # --- Header and Introduction ---
 st.title("🎤 AI Music Creation Studio")
@@ -483,21 +685,24 @@ Provide a theme, choose a genre, and our AI Music Collective will write a song a
 # --- User Input Section ---
 st.header("Step 1: Share Your Vision")
 
+GENRE_OPTIONS = (
+    "Worship (Hillsong/Bethel style)",
+    "Praise (Elevation/Upbeat style)",
+    "African Gospel Praise",
+    "Blues",
+    "Hip-Hop",
+    "German Schlager",
+    "Pop",
+    "Country"
+)
+
 col1, col2 = st.columns(2)
 with col1:
-    genre = st.selectbox(
-        "**Select the Musical Genre:**",
-        (
-            "Worship (Hillsong/Bethel style)",
-            "Praise (Elevation/Upbeat style)",
-            "African Gospel Praise",
-            "Blues",
-            "Hip-Hop",
-            "German Schlager",
-            "Pop",
-            "Country"
-        )
-    )
+    batch_mode = st.toggle("Same song in several genres (batch mode)")
+    if batch_mode:
+        genres = st.multiselect("**Select the Musical Genres:**", GENRE_OPTIONS, default=list(GENRE_OPTIONS[:2]))
+    else:
+        genre = st.selectbox("**Select the Musical Genre:**", GENRE_OPTIONS)
     topic = st.text_input("**Core Theme/Topic:**", placeholder="e.g., Heartbreak, A Road Trip, Overcoming Adversity")
 
 with col2:
@@ -506,31 +711,71 @@ with col2:
 # --- Crew Execution ---
 st.header("Step 2: Start the Session")
 
+polish_prompt = st.checkbox("Polish the compiled prompt with the Lyria Prompt Technician (slower)", value=False)
+render_song = st.checkbox("Render the song as audio after composing", value=True)
+
+def create_audio_backend():
+    if audio_backend_name.startswith("Google Lyria"):
+        return VertexLyriaBackend(project_id=st.session_state.project_id)
+    return FakeAudioBackend()
+
 if st.button("Compose & Generate Lyria Prompt"):
     if not topic and not text_input:
         st.error("🚨 Please provide a Topic or some Inspirational Text.")
+    elif batch_mode and not genres:
+        st.error("🚨 Please select at least one genre.")
+    elif batch_mode:
+        with st.spinner(f"Your AI Music Collective is writing one song for {len(genres)} genres... This may take a few minutes."):
+            try:
+                # The song is written once, then arranged for every genre in parallel
+                prompts = run_music_batch(genres, text_input, topic, polish=polish_prompt)
+
+                st.success(f"Song concept and {len(prompts)} prompts created successfully!")
+                st.subheader("✅ Your Final Lyria Prompts")
+                st.info("Copy a prompt and use it with a tool that connects to Google's Lyria model to generate the music.", icon="📋")
+
+                for batch_genre, final_prompt in prompts.items():
+                    with st.expander(f"🎼 {batch_genre}", expanded=len(prompts) == 1):
+                        st.code(final_prompt, language="text")
+
+            except Exception as e:
+                st.error(f"An error occurred during composition: {e}")
+                st.error("Please check your OpenAI API key in the .env file.")
     else:
         with st.spinner("Your AI Music Collective is warming up... This may take a few minutes."):
             try:
-                # Create and run the crew
-                music_creation_crew = create_music_crew(genre, text_input, topic)
-                result = music_creation_crew.kickoff()
+                # Write the song, then compile the prompt locally
+                run = run_music_crew(genre, text_input, topic, polish=polish_prompt)
 
-                st.success("Song concept and prompt created successfully!")
+                if run['reason']:
+                    st.warning(f"The songwriters were stopped early ({run['reason']}); the prompt uses the lyrics they had.")
+                else:
+                    st.success("Song concept and prompt created successfully!")
                 
                 st.subheader("✅ Your Final Lyria Prompt")
                 st.info("Copy this prompt and use it with a tool that connects to Google's Lyria model to generate the music.", icon="📋")
+                st.code(run['prompt'], language="text")
+                st.caption(f"Saved to `{run['artifact']}`")
                 
-                try:
-                    with open('final_lyria_prompt.txt', 'r', encoding='utf-8') as file:
-                        final_prompt = file.read()
-                    st.code(final_prompt, language="text")
-                except FileNotFoundError:
-                    st.error("The prompt file was not found. Displaying raw result instead.")
-                    st.write(result)
-                
-                with st.expander("👀 See the AI Team's Creative Process"):
-                    st.markdown(result)
+                with st.expander("👀 See the AI Team's Lyrics"):
+                    st.markdown(run['song'])
+
+                if render_song:
+                    if audio_backend_name.startswith("Google Lyria") and not st.session_state.project_id:
+                        st.warning("Enter your Google Cloud Project ID in the sidebar to render with Lyria.")
+                    else:
+                        st.subheader("🔊 Your Song")
+                        render_status = st.empty()
+                        audio_player = st.empty()
+                        # The player is refreshed as chunks arrive instead of blocking until the render is done,
+                        # each time the audio has doubled, so the refreshes copy it only about twice in total
+                        audio, played = bytearray(), 0
+                        for chunk, done in stream_audio(run['prompt'], create_audio_backend(), AudioCache()):
+                            audio += chunk
+                            if done or len(audio) >= 2 * played:
+                                audio_player.audio(bytes(audio), format="audio/wav")
+                                played = len(audio)
+                            render_status.caption("Rendering complete." if done else f"Rendering... {len(audio) // 1024} KB received")
 
             except Exception as e:
                 st.error(f"An error occurred during composition: {e}")
@@ -0,0 +1,339 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any
+from crewai import Crew
+from crewai.tools import BaseTool
+from llm_layer import LLMMiddleware, wrap_crew_llms
+
+# --- CREW BENCHMARK (record / replay) ---
+# Measures what our crews cost beyond the LLM and tool calls themselves, without live calls:
+#
+#   python crew_benchmark.py record                   # once, with real keys: writes the cassettes
+#   python crew_benchmark.py replay --save-baseline   # offline: writes benchmarks/baseline.json
+#   python crew_benchmark.py replay                   # offline: compares with the baseline
+#
+# Each crew is run the way its app runs it: the music and newspaper apps run staged pipelines
+# (run_music_crew, run_newspaper_edition) with several crews, some of them concurrent. Recording
+# wraps the LLM and tools of every crew the pipeline kicks off and stores each call's response
+# and latency in benchmarks/cassettes/<crew>.json. Replay serves the responses in recorded order
+# per agent or tool, sleeping for a synthetic latency (the recorded one x --latency-scale, or
+# --fixed-latency).
+#
+# Reported per crew: wall time, critical path (the time at least one LLM or tool call was in
+# flight: the sum of the calls for a sequential crew, overlapping calls counted once), overhead
+# (wall - critical path, i.e. the framework and our own code), CPU time, peak Python memory,
+# call counts, and prompt drift (requests that no longer match the recording, a sign the
+# prompts changed since it was made).
+
+BENCHMARK_DIR = 'benchmarks'
+CASSETTE_DIR = os.path.join(BENCHMARK_DIR, 'cassettes')
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+# A metric regresses when it exceeds the baseline by this fraction and by the absolute floor
+REGRESSION_TOLERANCE = 0.15
+REGRESSION_FLOORS = {'overhead_s': 0.05, 'cpu_s': 0.05, 'peak_mb': 2.0}
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def request_hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class Cassette:
+    """
+    Recorded interactions of one crew run, replayed in order per (kind, name).
+    """
+    def __init__(self, path, mode='replay', latency_scale=1.0, fixed_latency=None):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.fixed_latency = fixed_latency
+        self.interactions = []
+        self._queues = {}
+        self._lock = threading.Lock()
+        self.drift = 0
+        self.calls = {'llm': 0, 'tool': 0}
+        # (start, end) of every call, for the critical path
+        self.intervals = []
+        if mode == 'replay':
+            with open(path, 'r', encoding='utf-8') as file:
+                self.interactions = json.load(file)['interactions']
+            for entry in self.interactions:
+                self._queues.setdefault((entry['kind'], entry['name']), []).append(entry)
+
+    def _charge(self, kind, start, end):
+        with self._lock:
+            self.calls[kind] += 1
+            self.intervals.append((start, end))
+
+    def play(self, kind, name, payload):
+        with self._lock:
+            queue = self._queues.get((kind, name))
+            if not queue:
+                raise CassetteMiss(f"No recorded {kind} call left for '{name}'.")
+            entry = queue.pop(0)
+            if entry['request'] != request_hash(payload):
+                self.drift += 1
+        seconds = self.fixed_latency if self.fixed_latency is not None else entry['latency'] * self.latency_scale
+        start = time.perf_counter()
+        time.sleep(seconds)
+        self._charge(kind, start, time.perf_counter())
+        return entry['response']
+
+    def record(self, kind, name, payload, call):
+        start = time.perf_counter()
+        response = call()
+        end = time.perf_counter()
+        with self._lock:
+            self.interactions.append({'kind': kind, 'name': name, 'request': request_hash(payload),
+                                      'latency': round(end - start, 4), 'response': response})
+        self._charge(kind, start, end)
+        return response
+
+    def handle(self, kind, name, payload, call):
+        return self.play(kind, name, payload) if self.mode == 'replay' else self.record(kind, name, payload, call)
+
+    def save(self, crew_name):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump({'crew': crew_name, 'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'interactions': self.interactions}, file, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class CassetteLLM(LLMMiddleware):
+    def __init__(self, inner, cassette, name):
+        super().__init__(inner)
+        self.cassette = cassette
+        self.name = name
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        return self.cassette.handle('llm', self.name, {'model': self.model, 'messages': messages},
+                                    lambda: super(CassetteLLM, self).call(messages, tools, callbacks, available_functions, **kwargs))
+
+    def supports_function_calling(self):
+        # Native tool calls go straight to litellm (past LLM.call); the text protocol stays on the tape
+        return False
+
+
+class CassetteTool(BaseTool):
+    tool: Any = None
+    cassette: Any = None
+
+    def _run(self, *args, **kwargs):
+        return self.cassette.handle('tool', self.name, {'args': args, 'kwargs': kwargs}, lambda: self.tool.run(*args, **kwargs))
+
+
+def _on_tape(llm):
+    # Agents reused across a pipeline's crews (reporters in the editor's crew) keep their cassette,
+    # possibly below a layer added since (BudgetedLLM)
+    while llm is not None:
+        if isinstance(llm, CassetteLLM):
+            return True
+        llm = getattr(llm, 'inner', None)
+    return False
+
+
+def attach_cassette(crew, cassette):
+    wrap_crew_llms(crew, lambda llm, agent: llm if _on_tape(llm) else CassetteLLM(llm, cassette, agent.role))
+    for agent in crew.agents:
+        agent.tools = [
+            tool if isinstance(tool, CassetteTool) or isinstance(getattr(tool, 'tool', None), CassetteTool) else
+            CassetteTool(name=tool.name, description=tool.description, args_schema=tool.args_schema, tool=tool, cassette=cassette)
+            for tool in agent.tools or []
+        ]
+    # Long-term memory would call an embedding API that is not on the tape
+    crew.memory = False
+    return crew
+
+
+@contextmanager
+def cassette_on_every_crew(cassette):
+    """
+    Attaches the cassette to every crew kicked off inside the block, including the ones a
+    pipeline builds internally.
+    """
+    kickoff = Crew.kickoff
+
+    def taped_kickoff(crew, *args, **kwargs):
+        return kickoff(attach_cassette(crew, cassette), *args, **kwargs)
+
+    Crew.kickoff = taped_kickoff
+    try:
+        yield cassette
+    finally:
+        Crew.kickoff = kickoff
+
+
+def critical_path(intervals):
+    """
+    Seconds during which at least one call was in flight: the union of the call intervals. For
+    a sequential crew that is the sum of its calls; concurrent calls (reporters, the song and
+    its arrangement) count once.
+    """
+    total, covered_until = 0.0, None
+    for start, end in sorted(intervals):
+        if covered_until is None or start > covered_until:
+            total += end - start
+            covered_until = end
+        elif end > covered_until:
+            total += end - covered_until
+            covered_until = end
+    return total
+
+
+# --- CREWS UNDER TEST ---
+# Each runs what its app runs, with a scratch directory for anything the pipeline persists.
+
+def _bible_study(scratch):
+    from bible_study_crew import bind_bible_study_crew
+    crew, inputs = bind_bible_study_crew("Ruth", "English", "gemini/gemini-2.0-flash",
+                                         os.environ.get('GEMINI_API_KEY', 'replay'), os.environ.get('SERPER_API_KEY', 'replay'))
+    crew.kickoff(inputs=inputs)
+
+
+def _book(scratch):
+    from book_crew import bind_book_crew
+    crew, inputs = bind_book_crew("Grace", "A short devotional book about grace and forgiveness for a modern audience.", "English")
+    crew.kickoff(inputs=inputs)
+
+
+def _music(scratch):
+    from arrangement_library import ArrangementLibrary
+    from artifact_store import ArtifactStore
+    from music_crew import run_music_crew
+    # An empty library, so the arranger runs in every recording and replay
+    library = ArrangementLibrary(os.path.join(scratch, 'arrangements.json'))
+    run_music_crew("Gospel", "Psalm 23", "Trust in hard times", library=library, run_id='benchmark',
+                   artifacts=ArtifactStore(os.path.join(scratch, 'artifacts.sqlite')))
+
+
+def _flyer(scratch):
+    from flyer_crew import bind_flyer_crew
+    crew, inputs = bind_flyer_crew("Local climate action", "Vote for a Greener Tomorrow", "Poster (Portrait)")
+    crew.kickoff(inputs=inputs)
+
+
+def _newspaper(scratch):
+    from artifact_store import ArtifactStore
+    from edition_store import EditionStore
+    from newspaper_crew import run_newspaper_edition
+    run_newspaper_edition("National", "Germany", ["Top Story", "Business & Stock Market", "Sports"], incremental=False,
+                          store=EditionStore(os.path.join(scratch, 'editions')),
+                          artifacts=ArtifactStore(os.path.join(scratch, 'artifacts.sqlite')))
+
+
+CREWS = {'bible_study': _bible_study, 'book': _book, 'music': _music, 'flyer': _flyer, 'newspaper': _newspaper}
+
+
+def cassette_path(crew_name):
+    return os.path.join(CASSETTE_DIR, f'{crew_name}.json')
+
+
+def run_crew(crew_name, mode='replay', latency_scale=1.0, fixed_latency=None):
+    """
+    Records or replays one crew and returns its metrics.
+    """
+    # The response cache would answer repeated calls and hide their cost
+    os.environ['LLM_CACHE'] = '0'
+    if mode == 'replay':
+        # Agent constructors build API clients; replay never uses them
+        for variable in ('OPENAI_API_KEY', 'SERPER_API_KEY', 'GEMINI_API_KEY'):
+            os.environ.setdefault(variable, 'replay')
+    cassette = Cassette(cassette_path(crew_name), mode, latency_scale, fixed_latency)
+
+    scratch = tempfile.mkdtemp()
+    tracemalloc.start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    with cassette_on_every_crew(cassette):
+        CREWS[crew_name](scratch)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if mode == 'record':
+        cassette.save(crew_name)
+    path = critical_path(cassette.intervals)
+    return {
+        'wall_s': round(wall, 3), 'critical_path_s': round(path, 3), 'overhead_s': round(max(0.0, wall - path), 3),
+        'cpu_s': round(cpu, 3), 'peak_mb': round(peak / 1024 ** 2, 2),
+        'llm_calls': cassette.calls['llm'], 'tool_calls': cassette.calls['tool'], 'drift': cassette.drift,
+    }
+
+
+def median_metrics(runs):
+    return {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+
+
+def compare(results, baseline):
+    """
+    Returns a list of regression messages for metrics above baseline + tolerance.
+    """
+    regressions = []
+    for crew_name, metrics in results.items():
+        reference = baseline.get(crew_name)
+        if not reference:
+            continue
+        for key, floor in REGRESSION_FLOORS.items():
+            old, new = reference.get(key), metrics.get(key)
+            if old is not None and new > old * (1 + REGRESSION_TOLERANCE) and new - old > floor:
+                regressions.append(f"{crew_name}: {key} {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay crew runs and report their overhead.")
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('crews', nargs='*', default=list(CREWS), help=f"Crews to run (default: all of {', '.join(CREWS)})")
+    parser.add_argument('--latency-scale', type=float, default=1.0, help="Replay latency as a multiple of the recorded latency")
+    parser.add_argument('--fixed-latency', type=float, default=None, help="Replay every call with this latency in seconds instead")
+    parser.add_argument('--repeat', type=int, default=3, help="Replays per crew; the median is reported")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this replay as the new baseline")
+    args = parser.parse_args()
+
+    results = {}
+    for crew_name in args.crews:
+        if args.mode == 'record':
+            results[crew_name] = run_crew(crew_name, 'record')
+        else:
+            runs = [run_crew(crew_name, 'replay', args.latency_scale, args.fixed_latency) for _ in range(max(1, args.repeat))]
+            results[crew_name] = median_metrics(runs)
+
+    columns = ['wall_s', 'critical_path_s', 'overhead_s', 'cpu_s', 'peak_mb', 'llm_calls', 'tool_calls', 'drift']
+    print(f"{'crew':<12}" + ''.join(f"{column:>16}" for column in columns))
+    for crew_name, metrics in results.items():
+        print(f"{crew_name:<12}" + ''.join(f"{metrics[column]:>16}" for column in columns))
+
+    if args.mode == 'record':
+        print(f"Cassettes written to {CASSETTE_DIR}/")
+        return 0
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressions = compare(results, json.load(file))
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import threading
+import time
+from typing import Any
+from crewai.tools import BaseTool
+from llm_layer import LLMMiddleware
+
+# --- CREW BUDGETS ---
+# Hard limits for one crew run, so a delegation or tool-call loop cannot run for ten minutes:
+#
+#   max_iter         reasoning steps per agent and task (crewai's Agent.max_iter)
+#   max_delegations  "Delegate work / Ask question to coworker" calls in the whole run
+#   max_tokens       completion tokens per LLM call; the run as a whole may produce max_iter times
+#                    that (estimated from the agents' step text)
+#   max_final_tokens completion tokens per call for the agent of the crew's last task, the one
+#                    that compiles the final document (editors); sized from real outputs
+#   deadline         wall-clock seconds for the run; every agent, tool call and child budget
+#                    only gets what is left of it
+#
+# An exhausted budget stops the run at its next step, tool call or LLM call. run_with_budget()
+# then returns the best partial output instead of raising: the last finished task's output, or
+# the latest step of the agent that was interrupted.
+#
+# A budget's `on_crew(crew)` hook (inherited by its children) sees every crew run under it just
+# before it starts, so a caller of a multi-crew pipeline can adjust the crews it never builds.
+
+# Per-crew defaults; callers can override any field, e.g. crew_budget('book', deadline=900).
+# Final documents: a study guide runs to ~5k tokens (final_study_guide_german.md), a newspaper to
+# ~1k per article plus the editor's framing, the edited book chapters to ~10k.
+CREW_BUDGETS = {
+    'bible_study': {'max_iter': 10, 'max_delegations': 0, 'max_tokens': 4096, 'max_final_tokens': 12288, 'deadline': 600},
+    'book': {'max_iter': 12, 'max_delegations': 3, 'max_tokens': 8192, 'max_final_tokens': 16384, 'deadline': 900},
+    'music': {'max_iter': 8, 'max_delegations': 0, 'max_tokens': 2048, 'deadline': 300},
+    'flyer': {'max_iter': 8, 'max_delegations': 0, 'max_tokens': 2048, 'deadline': 300},
+    'newspaper': {'max_iter': 10, 'max_delegations': 4, 'max_tokens': 2048, 'max_final_tokens': 12288, 'deadline': 600},
+}
+DELEGATION_TOOLS = ('delegate work to coworker', 'ask question to coworker')
+# Extra time a run gets past its deadline to wind down before its partial output is returned
+GRACE_SECONDS = 5
+CHARS_PER_TOKEN = 4
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Budget:
+    """
+    Limits and usage counters for one run. Child budgets (e.g. one per reporter) have their own
+    limits but charge their parent too and never outlive its deadline.
+    """
+    def __init__(self, max_iter=15, max_delegations=3, max_tokens=None, max_final_tokens=None, deadline=None, parent=None,
+                 on_crew=None):
+        self.max_iter = max_iter
+        self.max_delegations = max_delegations
+        self.max_tokens = max_tokens
+        self.max_final_tokens = max_final_tokens
+        self.deadline_at = time.monotonic() + deadline if deadline else None
+        self.parent = parent
+        self.on_crew = on_crew
+        self.delegations = 0
+        self.tool_calls = 0
+        self.tokens = 0
+        self.exhausted = None  # the reason, once a limit is hit
+        self.task_outputs = []
+        self.last_step = None
+        self._lock = threading.Lock()
+
+    def child(self, **limits):
+        merged = {'max_iter': self.max_iter, 'max_delegations': self.max_delegations, 'max_tokens': self.max_tokens,
+                  'max_final_tokens': self.max_final_tokens, 'on_crew': self.on_crew}
+        merged.update(limits)
+        return Budget(parent=self, **merged)
+
+    def remaining(self):
+        """
+        Seconds left before the nearest deadline of this budget or its parents, or None.
+        """
+        own = self.deadline_at - time.monotonic() if self.deadline_at else None
+        inherited = self.parent.remaining() if self.parent else None
+        candidates = [value for value in (own, inherited) if value is not None]
+        return max(0.0, min(candidates)) if candidates else None
+
+    @property
+    def max_run_tokens(self):
+        return max(self.max_tokens, self.max_final_tokens or 0) * self.max_iter if self.max_tokens else None
+
+    @property
+    def reason(self):
+        """
+        Why this budget or one of its parents is exhausted, or None.
+        """
+        return self.exhausted or (self.parent.reason if self.parent else None)
+
+    def exhaust(self, reason):
+        with self._lock:
+            self.exhausted = self.exhausted or reason
+
+    def check(self):
+        """
+        Raises BudgetExceeded if this budget or a parent is used up.
+        """
+        if self.exhausted is None and self.remaining() == 0:
+            self.exhaust("deadline reached")
+        if self.exhausted:
+            raise BudgetExceeded(self.exhausted)
+        if self.parent:
+            self.parent.check()
+
+    def charge(self, delegations=0, tool_calls=0, tokens=0):
+        with self._lock:
+            self.delegations += delegations
+            self.tool_calls += tool_calls
+            self.tokens += tokens
+            if self.delegations > self.max_delegations:
+                self.exhausted = self.exhausted or f"more than {self.max_delegations} delegations"
+            elif self.max_run_tokens and self.tokens > self.max_run_tokens:
+                self.exhausted = self.exhausted or f"more than {self.max_run_tokens} tokens"
+        if self.parent:
+            self.parent.charge(delegations, tool_calls, tokens)
+
+    def usage(self):
+        return {'delegations': self.delegations, 'tool_calls': self.tool_calls, 'tokens': self.tokens,
+                'seconds_left': self.remaining(), 'exhausted': self.reason}
+
+
+def crew_budget(crew_name, **overrides):
+    limits = dict(CREW_BUDGETS.get(crew_name, {}))
+    limits.update(overrides)
+    return Budget(**limits)
+
+
+class BudgetedTool(BaseTool):
+    """
+    Wraps a tool so every call first checks the run's budget and counts against it.
+    """
+    tool: Any = None
+    budget: Any = None
+
+    def _run(self, *args, **kwargs):
+        self.budget.check()
+        self.budget.charge(tool_calls=1)
+        return self.tool.run(*args, **kwargs)
+
+
+def budgeted_tool(tool, budget):
+    if isinstance(tool, BudgetedTool):
+        tool = tool.tool
+    return BudgetedTool(name=tool.name, description=tool.description, args_schema=tool.args_schema, tool=tool, budget=budget)
+
+
+class BudgetedLLM(LLMMiddleware):
+    """
+    Checks the run's budget before every LLM call, so a run abandoned at its deadline stops
+    spending tokens even while an agent is between steps, and caps each call's max_tokens.
+    The cap goes with the call: the wrapped LLM may be shared with other agents and runs.
+    """
+    def __init__(self, inner, budget, max_tokens=None):
+        super().__init__(inner)
+        self.budget = budget
+        self.token_cap = max_tokens
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        self.budget.check()
+        if self.token_cap:
+            own = self.setting('max_tokens', kwargs)
+            kwargs['max_tokens'] = min(own or self.token_cap, self.token_cap)
+        return super().call(messages, tools, callbacks, available_functions, **kwargs)
+
+
+def _step_text(step):
+    for attribute in ('output', 'result', 'log', 'text'):
+        value = getattr(step, attribute, None)
+        if isinstance(value, str) and value:
+            return value
+    return str(step)
+
+
+def apply_budget(crew, budget):
+    """
+    Passes the budget into every agent, tool and task of a crew (in place) and returns the crew.
+    """
+    remaining = budget.remaining()
+    # The agent of the last task compiles the crew's final document and may write more per call
+    final_role = getattr(crew.tasks[-1].agent, 'role', None) if crew.tasks else None
+    for agent in crew.agents:
+        agent.max_iter = min(agent.max_iter or budget.max_iter, budget.max_iter)
+        if remaining is not None:
+            agent.max_execution_time = max(1, int(remaining))
+        if isinstance(getattr(agent, 'llm', None), BudgetedLLM):
+            agent.llm = agent.llm.inner
+        if getattr(agent, 'llm', None) is not None:
+            cap = budget.max_final_tokens if agent.role == final_role and budget.max_final_tokens else budget.max_tokens
+            agent.llm = BudgetedLLM(agent.llm, budget, cap)
+        agent.tools = [budgeted_tool(tool, budget) for tool in agent.tools or []]
+
+        # Re-budgeting an agent (e.g. reporters reused in the editor's crew) replaces the old wrapper
+        previous_step = getattr(agent.step_callback, 'unbudgeted', agent.step_callback)
+
+        def on_step(step, previous_step=previous_step):
+            text = _step_text(step)
+            budget.last_step = text
+            tool_name = (getattr(step, 'tool', '') or '').strip().lower()
+            budget.charge(delegations=1 if tool_name in DELEGATION_TOOLS else 0, tokens=len(text) // CHARS_PER_TOKEN)
+            if previous_step:
+                previous_step(step)
+            budget.check()
+
+        on_step.unbudgeted = previous_step
+        agent.step_callback = on_step
+
+    for task in crew.tasks:
+        previous_callback = getattr(task.callback, 'unbudgeted', task.callback)
+
+        def on_task(output, previous_callback=previous_callback):
+            budget.task_outputs.append(output.raw)
+            if previous_callback:
+                previous_callback(output)
+
+        on_task.unbudgeted = previous_callback
+        task.callback = on_task
+    return crew
+
+
+def run_with_budget(crew, budget, inputs=None):
+    """
+    Runs crew.kickoff() under the budget, with `inputs` filling the {placeholders} of a crew
+    bound from a template (see crew_templates.py). Never raises for an exhausted budget; returns
+    {'output', 'complete', 'reason', 'task_outputs', 'usage'} where output is the final result
+    or, for an interrupted run, the best partial output.
+    """
+    if budget.on_crew:
+        budget.on_crew(crew)
+    apply_budget(crew, budget)
+    outcome = {}
+
+    def kickoff():
+        try:
+            outcome['result'] = crew.kickoff(inputs=inputs) if inputs else crew.kickoff()
+        except BaseException as e:
+            outcome['error'] = e
+
+    worker = threading.Thread(target=kickoff, daemon=True)
+    worker.start()
+    remaining = budget.remaining()
+    worker.join(None if remaining is None else remaining + GRACE_SECONDS)
+
+    if worker.is_alive():
+        # Past the deadline: the run stops at its next step, tool or LLM call; its result is dropped
+        budget.exhaust("deadline reached")
+    elif 'result' in outcome:
+        return {'output': outcome['result'].raw, 'complete': True, 'reason': None,
+                'task_outputs': list(budget.task_outputs), 'usage': budget.usage()}
+    elif not isinstance(outcome['error'], BudgetExceeded) and budget.reason is None:
+        # A real failure, not the budget stopping the run (crewai may wrap BudgetExceeded)
+        raise outcome['error']
+
+    partial = budget.task_outputs[-1] if budget.task_outputs else (budget.last_step or '')
+    return {'output': partial, 'complete': False, 'reason': budget.reason,
+            'task_outputs': list(budget.task_outputs), 'usage': budget.usage()}
@@ -0,0 +1,475 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from artifact_store import default_artifact_store, record_crew_run
+from crew_budgets import crew_budget, run_with_budget
+from crew_budgets import BudgetedLLM
+from llm_layer import LLMMiddleware, wrap_crew_llms
+
+# --- CREW SERVICE (HTTP API) ---
+# The five crews behind one stateless-per-request HTTP API, so several replicas can run behind a
+# load balancer instead of one Streamlit process per user:
+#
+#   GET  /crews                               crews and their parameters
+#   POST /jobs {"crew": ..., "params": {...}} 202 with the job id; 503 when the queue is full
+#   GET  /jobs/{id}                           status, timings, final output
+#   GET  /jobs/{id}/events                    Server-Sent Events: status, each agent step, each
+#                                             finished task (partial output), then "done"
+#   GET  /jobs/{id}/artifacts[/{name}]        files the crew wrote (each task's output file)
+#   GET  /search?q=...&crew=...               full-text search over every recorded crew output
+#
+# Submissions go onto a bounded asyncio queue; DISPATCHERS coroutines take jobs off it and run
+# each crew (blocking) on a worker thread pool under the crew's budget. Every job writes into its
+# own directory under runs/jobs/<id>/, with job.json kept current, so any replica that shares
+# runs/ can answer status and artifact requests; the event stream is served by the replica
+# running the job.
+#
+#   uvicorn crew_service:app --port 8000
+#   CREW_SERVICE_STUB_LLM=1 uvicorn crew_service:app   # every agent answers from a stub model
+
+JOBS_DIR = os.path.join('runs', 'jobs')
+# Job ids are uuid4().hex; anything else in a URL is rejected before it touches the file system
+JOB_ID = re.compile(r'[0-9a-f]{32}')
+WORKERS = int(os.environ.get('CREW_SERVICE_WORKERS', '4'))
+DISPATCHERS = WORKERS
+MAX_QUEUED = int(os.environ.get('CREW_SERVICE_MAX_QUEUED', '64'))
+# Finished jobs stay in memory this long for the event stream; job.json and artifacts stay on disk
+KEEP_FINISHED_SECONDS = 3600
+STUB_LLM = os.environ.get('CREW_SERVICE_STUB_LLM') == '1'
+if STUB_LLM:
+    # Stub answers never pass the output checks; retrying them would multiply the load-test calls
+    os.environ['OUTPUT_GUARDRAILS'] = '0'
+STUB_LATENCY = float(os.environ.get('CREW_SERVICE_STUB_LATENCY', '0.05'))
+
+
+# --- CREWS ---
+
+# Each runner takes the job and its budget and returns a run_with_budget()-style outcome. Crews
+# with a template (crew_templates.py) are copied from one built per process, so a job only pays
+# for binding its parameters. Music and newspaper jobs run the same multi-crew pipelines as their
+# apps (compiled Lyria prompt, clustered wire, concurrent and incremental reporters); every crew
+# they start passes through prepare_crew via the budget's on_crew hook.
+
+def _run_crew(job, budget, crew, inputs):
+    outcome = run_with_budget(crew, budget, inputs=inputs)
+    if not STUB_LLM:
+        record_crew_run(job.crew, crew, job.public_params(), outcome, job.started)
+    return outcome
+
+
+def _bible_study(job, budget):
+    from bible_study_crew import bind_bible_study_crew
+    params = job.params
+    return _run_crew(job, budget, *bind_bible_study_crew(params['book'], params.get('language', 'English'),
+                                                         params.get('model', 'gemini/gemini-2.5-flash'),
+                                                         params.get('gemini_api_key') or os.environ.get('GEMINI_API_KEY'),
+                                                         params.get('serper_api_key') or os.environ.get('SERPER_API_KEY')))
+
+
+def _book(job, budget):
+    from book_crew import bind_book_crew
+    params = job.params
+    return _run_crew(job, budget, *bind_book_crew(params['topic'], params['description'], params.get('language', 'English')))
+
+
+@contextmanager
+def _stores(**factories):
+    """
+    Stub jobs get throwaway stores, so stub answers never reach the shared arrangement library,
+    edition store or artifact store; real jobs use the shared ones (an empty dict).
+    """
+    if not STUB_LLM:
+        yield {}
+        return
+    with tempfile.TemporaryDirectory() as scratch:
+        yield {name: factory(os.path.join(scratch, name)) for name, factory in factories.items()}
+
+
+def _music(job, budget):
+    from arrangement_library import ArrangementLibrary
+    from artifact_store import ArtifactStore
+    from lyria_prompt_compiler import RUNS_DIR
+    from music_crew import run_music_crew
+    params = job.params
+    with _stores(library=ArrangementLibrary, artifacts=ArtifactStore) as stores:
+        # The prompt artifact goes into the job directory (runs/jobs/<id>/lyria_prompt.txt)
+        run = run_music_crew(params['genre'], params['text'], params['topic'], polish=bool(params.get('polish')),
+                             run_id=os.path.relpath(job.directory, RUNS_DIR), budget=budget, **stores)
+    return {'output': run['prompt'], 'complete': run['reason'] is None, 'reason': run['reason']}
+
+
+def _flyer(job, budget):
+    from flyer_crew import bind_flyer_crew
+    params = job.params
+    return _run_crew(job, budget, *bind_flyer_crew(params['topic'], params['text_element'], params.get('flyer_type', 'Poster (Portrait)')))
+
+
+def _newspaper(job, budget):
+    from artifact_store import ArtifactStore
+    from edition_store import EditionStore
+    from newspaper_crew import run_newspaper_edition
+    params = job.params
+    with _stores(store=EditionStore, artifacts=ArtifactStore) as stores:
+        edition = run_newspaper_edition(params.get('scope', 'National'), params.get('location', 'Germany'),
+                                        params.get('topics', ['Top Story']), incremental=params.get('incremental', True),
+                                        wire_source=params.get('wire_source', 'search'), budget=budget,
+                                        output_file=os.path.join(job.directory, 'final_newspaper.md'), **stores)
+    return {'output': edition['newspaper'], 'complete': edition['reason'] is None, 'reason': edition['reason']}
+
+
+# name -> (runner, required params, optional params)
+CREWS = {
+    'bible_study': (_bible_study, ('book',), ('language', 'model', 'gemini_api_key', 'serper_api_key')),
+    'book': (_book, ('topic', 'description'), ('language',)),
+    'music': (_music, ('genre', 'text', 'topic'), ('polish',)),
+    'flyer': (_flyer, ('topic', 'text_element'), ('flyer_type',)),
+    'newspaper': (_newspaper, (), ('scope', 'location', 'topics', 'incremental', 'wire_source')),
+}
+
+
+class StubLLM(LLMMiddleware):
+    """
+    Answers every call with a final answer after STUB_LATENCY seconds, for load tests.
+    """
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        time.sleep(STUB_LATENCY)
+        prompt = messages if isinstance(messages, str) else messages[-1].get('content', '')
+        return f"Thought: I now know the final answer\nFinal Answer: Stub answer to: {str(prompt)[:80]}"
+
+    def supports_function_calling(self):
+        return False
+
+
+# --- JOBS ---
+
+class Job:
+    def __init__(self, crew, params):
+        self.id = uuid.uuid4().hex
+        self.crew = crew
+        self.params = params
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.output = None
+        self.reason = None
+        self.error = None
+        self.directory = os.path.join(JOBS_DIR, self.id)
+        self.events = []
+        self._tasks = 0  # tasks started so far, over all of the job's crews
+        self._lock = threading.Lock()
+        self._waiters = []  # (loop, asyncio.Event) of open event streams
+
+    def summary(self):
+        return {'id': self.id, 'crew': self.crew, 'status': self.status, 'created': self.created,
+                'started': self.started, 'finished': self.finished, 'output': self.output,
+                'reason': self.reason, 'error': self.error}
+
+    def publish(self, kind, data):
+        """
+        Appends an event and wakes the event streams; safe to call from worker threads.
+        """
+        with self._lock:
+            self.events.append({'event': kind, 'data': data})
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def subscribe(self):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.append(waiter)
+        return waiter
+
+    def unsubscribe(self, waiter):
+        with self._lock:
+            self._waiters.remove(waiter)
+
+    def set_status(self, status):
+        self.status = status
+        self.save()
+        self.publish('status', {'status': status})
+
+    def next_task_index(self):
+        with self._lock:
+            self._tasks += 1
+            return self._tasks - 1
+
+    def public_params(self):
+        return {key: value for key, value in self.params.items() if not key.endswith('_api_key')}
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(dict(self.summary(), params=self.public_params()), file, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.directory, 'job.json'))
+
+
+def job_path(job_id):
+    """
+    The directory of job `job_id`, or None if the id is not a job id.
+    """
+    if not JOB_ID.fullmatch(job_id):
+        return None
+    jobs_dir = os.path.realpath(JOBS_DIR)
+    directory = os.path.realpath(os.path.join(jobs_dir, job_id))
+    return directory if os.path.dirname(directory) == jobs_dir else None
+
+
+def load_job_summary(job_id):
+    """
+    A job's last saved state from disk (jobs run by another replica, or finished long ago).
+    """
+    directory = job_path(job_id)
+    path = directory and os.path.join(directory, 'job.json')
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _stubbed(llm):
+    return isinstance(llm, StubLLM) or isinstance(llm, BudgetedLLM) and isinstance(llm.inner, StubLLM)
+
+
+def prepare_crew(job, crew):
+    """
+    Redirects a crew's files into the job directory and publishes its steps and finished tasks
+    as events; the on_crew hook of the job's budget, so it runs for every crew of a pipeline.
+    Agents reused by a later crew (reporters in the editor's crew) are not wrapped twice.
+    """
+    if STUB_LLM:
+        wrap_crew_llms(crew, lambda llm, agent: llm if _stubbed(agent.llm) else StubLLM(llm))
+        for agent in crew.agents:
+            agent.tools = []
+    for agent in crew.agents:
+        previous_step = getattr(agent.step_callback, 'unbudgeted', agent.step_callback)
+        previous_step = getattr(previous_step, 'unpublished', previous_step)
+
+        def on_step(step, previous_step=previous_step, role=agent.role):
+            job.publish('step', {'agent': role, 'text': str(getattr(step, 'output', None) or getattr(step, 'text', None) or step)[-2000:]})
+            if previous_step:
+                previous_step(step)
+
+        on_step.unpublished = previous_step
+        agent.step_callback = on_step
+    for task in crew.tasks:
+        index = job.next_task_index()
+        task.output_file = os.path.join(job.directory, os.path.basename(task.output_file or f'task_{index + 1}.md'))
+        previous = getattr(task.callback, 'unbudgeted', task.callback)
+        previous = getattr(previous, 'unpublished', previous)
+
+        def on_task(output, previous=previous, index=index):
+            job.publish('task', {'index': index, 'output': output.raw})
+            if previous:
+                previous(output)
+
+        on_task.unpublished = previous
+        task.callback = on_task
+    return crew
+
+
+def run_job(job):
+    """
+    Runs one job to completion on a worker thread.
+    """
+    job.started = time.time()
+    job.set_status('running')
+    try:
+        runner = CREWS[job.crew][0]
+        outcome = runner(job, crew_budget(job.crew, on_crew=lambda crew: prepare_crew(job, crew)))
+        job.output, job.reason = outcome['output'], outcome['reason']
+        status = 'done' if outcome['complete'] else 'partial'
+    except Exception as e:
+        job.error = f"{type(e).__name__}: {e}"
+        status = 'failed'
+    job.finished = time.time()
+    job.set_status(status)
+    job.publish('done', job.summary())
+
+
+class Dispatcher:
+    """
+    Bounded job queue drained by async dispatchers onto a worker thread pool.
+    """
+    def __init__(self, workers=WORKERS, dispatchers=DISPATCHERS, max_queued=MAX_QUEUED):
+        self.workers = workers
+        self.dispatchers = dispatchers
+        self.max_queued = max_queued
+        self.jobs = {}
+        self._queue = None
+        self._pool = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.max_queued)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crew-worker')
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.dispatchers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, crew, params):
+        """
+        Queues a job; raises asyncio.QueueFull when the service is saturated.
+        """
+        job = Job(crew, params)
+        self._queue.put_nowait(job)
+        self.jobs[job.id] = job
+        job.save()
+        self._forget_old()
+        return job
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._pool, run_job, job)
+            finally:
+                self._queue.task_done()
+
+    def _forget_old(self):
+        cutoff = time.time() - KEEP_FINISHED_SECONDS
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        statuses = [job.status for job in self.jobs.values()]
+        return {'queued': self._queue.qsize() if self._queue else 0, 'running': statuses.count('running'),
+                'workers': self.workers, 'max_queued': self.max_queued}
+
+
+# --- HTTP API ---
+
+class JobRequest(BaseModel):
+    crew: str
+    params: dict = {}
+
+
+app = FastAPI(title="Crew service")
+dispatcher = Dispatcher()
+
+
+@app.on_event('startup')
+async def startup():
+    await dispatcher.start()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await dispatcher.stop()
+
+
+@app.get('/healthz')
+async def healthz():
+    return dict(dispatcher.stats(), status='ok')
+
+
+@app.get('/crews')
+async def list_crews():
+    return {name: {'required': list(required), 'optional': list(optional)} for name, (_, required, optional) in CREWS.items()}
+
+
+@app.post('/jobs', status_code=202)
+async def submit_job(request: JobRequest):
+    if request.crew not in CREWS:
+        raise HTTPException(404, f"Unknown crew '{request.crew}'.")
+    missing = [name for name in CREWS[request.crew][1] if name not in request.params]
+    if missing:
+        raise HTTPException(422, f"Missing parameters: {', '.join(missing)}.")
+    try:
+        job = dispatcher.submit(request.crew, request.params)
+    except asyncio.QueueFull:
+        raise HTTPException(503, "Too many queued jobs; retry later.", headers={'Retry-After': '5'})
+    return {'id': job.id, 'status': job.status, 'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events', 'artifacts_url': f'/jobs/{job.id}/artifacts'}
+
+
+@app.get('/jobs/{job_id}')
+async def job_status(job_id: str):
+    job = dispatcher.jobs.get(job_id)
+    summary = job.summary() if job else load_job_summary(job_id)
+    if summary is None:
+        raise HTTPException(404, "Unknown job.")
+    return summary
+
+
+@app.get('/jobs/{job_id}/events')
+async def job_events(job_id: str):
+    job = dispatcher.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job, or it runs on another replica.")
+
+    async def stream():
+        waiter = job.subscribe()
+        sent = 0
+        try:
+            while True:
+                waiter[1].clear()
+                events = job.events[sent:]
+                for event in events:
+                    yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+                    if event['event'] == 'done':
+                        return
+                sent += len(events)
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            job.unsubscribe(waiter)
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+def _job_directory(job_id):
+    directory = job_path(job_id)
+    if not directory or not os.path.isdir(directory):
+        raise HTTPException(404, "Unknown job.")
+    return directory
+
+
+@app.get('/jobs/{job_id}/artifacts')
+async def list_artifacts(job_id: str):
+    directory = _job_directory(job_id)
+    return [{'name': name, 'size': os.path.getsize(os.path.join(directory, name)), 'url': f'/jobs/{job_id}/artifacts/{name}'}
+            for name in sorted(os.listdir(directory)) if name != 'job.json' and not name.endswith('.tmp')]
+
+
+@app.get('/jobs/{job_id}/artifacts/{name}')
+async def download_artifact(job_id: str, name: str):
+    directory = _job_directory(job_id)
+    path = os.path.realpath(os.path.join(directory, os.path.basename(name)))
+    if os.path.dirname(path) != directory or not os.path.isfile(path) or os.path.basename(path) == 'job.json':
+        raise HTTPException(404, "Unknown artifact.")
+    return FileResponse(path, filename=os.path.basename(name))
+
+
+@app.get('/search')
+async def search_outputs(q: str, crew: str = None, limit: int = 20):
+    return default_artifact_store().search(q, crew=crew, limit=min(limit, 100))
+
+
+@app.delete('/jobs/{job_id}', status_code=204)
+async def delete_job(job_id: str):
+    directory = _job_directory(job_id)
+    job = dispatcher.jobs.get(job_id)
+    if job and job.status in ('queued', 'running'):
+        raise HTTPException(409, "The job has not finished.")
+    dispatcher.jobs.pop(job_id, None)
+    shutil.rmtree(directory, ignore_errors=True)
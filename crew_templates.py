@@ -0,0 +1,136 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# --- CREW TEMPLATES ---
+# Building a crew means constructing every Agent, its LLM stack and tools, and every Task with its
+# multi-paragraph prompt, on each button press. A template builds the crew once per process with
+# {placeholders} in place of the request's parameters; each request then gets a copy of the
+# prebuilt graph (crew.copy()) and crewai fills the placeholders in at kickoff(inputs=...):
+#
+#   crew, inputs = crew_template(create_book_crew, ('topic', 'user_prompt'), language='German').bind(topic=..., user_prompt=...)
+#   run_with_budget(crew, crew_budget('book'), inputs=inputs)
+#
+# Parameters that change the graph itself (the language, which selects guardrails, tools and the
+# output file; the model and API key) are fixed per template and part of its cache key.
+# Templates live in a small process-wide LRU registry, so Streamlit reruns and service workers
+# reuse them.
+
+TEMPLATE_CACHE_SIZE = 32
+
+
+class CrewTemplate:
+    """
+    A prebuilt crew whose prompts contain {placeholder} fields.
+    """
+    def __init__(self, crew, placeholders):
+        self.crew = crew
+        self.placeholders = tuple(placeholders)
+
+    def bind(self, **inputs):
+        """
+        A fresh copy of the crew for one request, and the inputs to kick it off with.
+        """
+        missing = [name for name in self.placeholders if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing template inputs: {', '.join(missing)}")
+        return self.crew.copy(), {name: str(inputs[name]) for name in self.placeholders}
+
+
+def _cache_key(factory, placeholders, fixed):
+    # Fixed arguments may include API keys; only their digest is kept in the key
+    payload = json.dumps(sorted(fixed.items()), default=str, ensure_ascii=False)
+    return factory.__module__, factory.__qualname__, tuple(placeholders), hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
+
+def crew_template(factory, placeholders, **fixed):
+    """
+    The template for factory(**fixed, <placeholder>='{<placeholder>}'), built on first use.
+    `factory` must return a Crew and use its placeholder arguments only inside prompt text.
+    """
+    key = _cache_key(factory, placeholders, fixed)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+            return template
+    template = CrewTemplate(factory(**fixed, **{name: '{' + name + '}' for name in placeholders}), placeholders)
+    with _templates_lock:
+        template = _templates.setdefault(key, template)
+        while len(_templates) > TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    return template
+
+
+def clear_templates():
+    with _templates_lock:
+        _templates.clear()
+
+
+# --- MICRO-BENCHMARK ---
+
+def _measure(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark(repeat=20):
+    """
+    Per-request crew construction cost, direct factory call vs. template bind, for each crew
+    that has a template. Returns {crew: (factory_ms, bind_ms)}.
+    """
+    from bible_study_crew import bind_bible_study_crew, create_bible_study_crew
+    from book_crew import bind_book_crew, create_book_crew
+    from flyer_crew import bind_flyer_crew, create_flyer_crew
+    from music_crew import bind_song_crew, create_song_crew
+
+    cases = {
+        'bible_study': (lambda: create_bible_study_crew("Ruth", "English", "gemini/gemini-2.5-flash", "key", "key"),
+                        lambda: bind_bible_study_crew("Ruth", "English", "gemini/gemini-2.5-flash", "key", "key")),
+        'book': (lambda: create_book_crew("Grace", "A short devotional book.", "English"),
+                 lambda: bind_book_crew("Grace", "A short devotional book.", "English")),
+        'music': (lambda: create_song_crew("Psalm 23", "Trust"), lambda: bind_song_crew("Psalm 23", "Trust")),
+        'flyer': (lambda: create_flyer_crew("Climate", "Vote green", "Poster (Portrait)"),
+                  lambda: bind_flyer_crew("Climate", "Vote green", "Poster (Portrait)")),
+    }
+    results = {}
+    for name, (build, bind) in cases.items():
+        bind()  # builds the template
+        results[name] = (_measure(build, repeat), _measure(bind, repeat))
+    return results
+
+
+def rerun_latency(script, repeat=5):
+    """
+    Mean milliseconds for Streamlit to rerun an app script without pressing its button.
+    """
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(script, default_timeout=60)
+    app.run()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        app.run()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == '__main__':
+    # python crew_templates.py  -- crew construction per request, and app rerun latency
+    import os
+    for variable in ('OPENAI_API_KEY', 'SERPER_API_KEY', 'GEMINI_API_KEY'):
+        os.environ.setdefault(variable, 'benchmark')
+    print(f"{'crew':<12}{'factory ms':>12}{'bind ms':>10}")
+    for name, (factory_ms, bind_ms) in benchmark().items():
+        print(f"{name:<12}{factory_ms:>12.2f}{bind_ms:>10.2f}")
+    for script in ('bible_study.py', 'book.py', 'flyer.py', 'christian_musik.py', 'news_paper.py'):
+        try:
+            print(f"rerun {script:<22}{rerun_latency(script):8.1f} ms")
+        except Exception as e:
+            print(f"rerun {script:<22} skipped ({type(e).__name__}: {e})")
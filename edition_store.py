@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from wire_clustering import similarity
+
+# --- INCREMENTAL EDITION STORE ---
+# Remembers, per edition (scope, location, sections), the clustered wire stories each section was
+# written from and the article that came out of it. On a refresh only sections with new or
+# materially changed stories are re-reported; the editor only runs again if an article changed.
+#
+#   runs/editions/<edition key>.json
+#
+# Stories are compared by their MinHash signatures rather than exact ids: a cluster that gained
+# one more source, or whose summary was reworded, still matches its earlier version.
+
+EDITION_STORE_DIR = os.path.join('runs', 'editions')
+# A story counts as unchanged if a stored story of the same section is at least this similar
+UNCHANGED_SIMILARITY = 0.8
+
+
+def edition_key(scope, location, topics):
+    payload = json.dumps([scope, location or '', sorted(topics)], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def wire_digest(wire_text):
+    return hashlib.sha256(wire_text.encode('utf-8')).hexdigest()
+
+
+def slice_fingerprint(clusters):
+    return [{'id': cluster['id'], 'headline': cluster['headline'], 'signature': list(cluster['signature'])} for cluster in clusters]
+
+
+def is_stale(section, clusters, digest):
+    """
+    Whether a section needs a new article. `section` is its stored state (or None), `clusters`
+    its current slice, `digest` the hash of the full wire (used by sections without a slice).
+    A story that disappeared from the wire does not by itself make the article stale.
+    """
+    if not section or not section.get('article'):
+        return True
+    if not clusters:
+        return section.get('wire_digest') != digest
+    stored = [entry['signature'] for entry in section.get('clusters', [])]
+    return any(
+        not any(similarity(cluster['signature'], signature) >= UNCHANGED_SIMILARITY for signature in stored)
+        for cluster in clusters
+    )
+
+
+class EditionStore:
+    """
+    One JSON state file per edition, written atomically.
+    """
+    def __init__(self, root=EDITION_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.root, f'{key}.json')
+
+    def load(self, key):
+        try:
+            with open(self.path(key), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self, key, state):
+        state = dict(state, updated_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(state, file, ensure_ascii=False)
+            os.replace(tmp_path, self.path(key))
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_edition_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = EditionStore()
+        return _default_store
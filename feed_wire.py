@@ -0,0 +1,410 @@
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from wire_clustering import names_country, partition_by_city
+
+# --- FEED WIRE ---
+# Collects the wire from RSS/Atom feeds instead of an LLM agent driving web searches:
+#   - every feed is requested concurrently,
+#   - requests are conditional (If-None-Match / If-Modified-Since with the ETag and Last-Modified
+#     of the previous response); on 304 Not Modified the cached items are reused,
+#   - responses are parsed incrementally as they arrive (XMLPullParser), one item at a time.
+# The result is the same item list parse_wire_items() produces from the agent's output.
+
+FEED_CACHE_FILE = os.path.join('runs', 'feed_cache.json')
+# Optional JSON file overriding DEFAULT_FEEDS, same shape:
+#   {"Global": [...], "National": {"<Country>": [...]}, "<City>": [...]}
+# A country without national feeds gets no feed wire (the edition falls back to the search agent).
+FEEDS_FILE = os.environ.get('WIRE_FEEDS_FILE', 'wire_feeds.json')
+DEFAULT_FEEDS = {
+    "Global": ["https://feeds.bbci.co.uk/news/world/rss.xml", "https://rss.dw.com/xml/rss-en-all"],
+    "National": {
+        "Germany": ["https://www.tagesschau.de/xml/rss2/", "https://rss.dw.com/xml/rss-en-ger"],
+        "Austria": ["https://rss.orf.at/news.xml"],
+        "France": ["https://www.france24.com/en/france/rss"],
+        "United Kingdom": ["https://feeds.bbci.co.uk/news/uk/rss.xml"],
+        "United States": ["https://feeds.npr.org/1003/rss.xml"],
+    },
+}
+# The country of the local editions (LOCAL_CITIES), whose national feeds cover cities without feeds of their own
+DEFAULT_COUNTRY = "Germany"
+MAX_FEED_WORKERS = 8
+FEED_TIMEOUT = 10
+MAX_ITEMS_PER_FEED = 30
+MAX_SUMMARY_CHARS = 300
+READ_CHUNK = 64 * 1024
+USER_AGENT = "AI-Newsroom-FeedWire/1.0"
+
+TAG = re.compile(r'<[^>]+>')
+
+log = logging.getLogger(__name__)
+
+
+def load_feed_config(path=FEEDS_FILE):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    return DEFAULT_FEEDS
+
+
+def national_feeds(country, config=None):
+    """
+    The national feeds of the country the user entered ("Deutschland" finds Germany's).
+    """
+    config = config or load_feed_config()
+    for name, urls in config.get("National", {}).items():
+        if names_country(country, name):
+            return urls
+    return []
+
+
+def feeds_for(scope, location="", config=None, country=DEFAULT_COUNTRY):
+    """
+    The feed URLs for an edition; `location` is the country of a national edition and the city
+    of a local one. A city without feeds of its own uses the national feeds of `country` (its
+    stories are picked out afterwards with partition_by_city).
+    """
+    config = config or load_feed_config()
+    if scope == "Local":
+        return config.get(location) or national_feeds(country, config)
+    if scope == "National":
+        return national_feeds(location, config)
+    return config.get(scope, [])
+
+
+def feed_wire_items(scope, location="", cities=(), cache=None):
+    """
+    The wire for an edition from feeds alone (no LLM call). Local editions without feeds of their
+    own keep only the national stories about their city. With `cities`, the national feeds of the
+    country `location` and every city's feeds are fetched together, for a batch of editions to
+    partition later.
+    """
+    config = load_feed_config()
+    if cities:
+        urls = list(dict.fromkeys(national_feeds(location, config) + [url for city in cities for url in config.get(city, [])]))
+        return fetch_feeds(urls, cache)[0] if urls else []
+    urls = feeds_for(scope, location, config)
+    if not urls:
+        return []
+    items, _ = fetch_feeds(urls, cache)
+    if scope == "Local" and location not in config:
+        items = partition_by_city(items, [location])[location]
+    return items
+
+
+# --- PARSING ---
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1].lower()
+
+
+def _text(value):
+    text = html.unescape(TAG.sub(' ', value or ''))
+    text = ' '.join(text.split())
+    if len(text) > MAX_SUMMARY_CHARS:
+        text = text[:MAX_SUMMARY_CHARS].rsplit(' ', 1)[0] + '…'
+    return text
+
+
+def _entry_to_item(element, feed_title, feed_url):
+    fields = {}
+    for child in element:
+        name = _local(child.tag)
+        if name == 'link':
+            # Atom: <link rel="alternate" href="..."/>, RSS: <link>...</link>
+            href = child.get('href')
+            if href and child.get('rel', 'alternate') == 'alternate':
+                fields.setdefault('link', href)
+            elif child.text:
+                fields.setdefault('link', child.text.strip())
+        elif name in ('title', 'description', 'summary', 'content', 'encoded', 'guid') and name not in fields:
+            fields[name] = child.text or ''
+    url = fields.get('link') or (fields.get('guid', '') if fields.get('guid', '').startswith('http') else '')
+    return {
+        'headline': _text(fields.get('title')),
+        'url': url,
+        'source': feed_title or urlparse(url or feed_url).netloc.removeprefix('www.'),
+        'summary': _text(fields.get('description') or fields.get('summary') or fields.get('content') or fields.get('encoded')),
+        'location': '',
+    }
+
+
+class FeedParser:
+    """
+    Incremental RSS 2.0 / RSS 1.0 (RDF) / Atom parser: feed() bytes as they arrive, finished
+    items are collected and their elements released immediately.
+    """
+    def __init__(self, feed_url, max_items=MAX_ITEMS_PER_FEED):
+        self.feed_url = feed_url
+        self.max_items = max_items
+        self.items = []
+        self.feed_title = ''
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._depth = 0
+        self._entry_depth = None
+
+    @property
+    def full(self):
+        return len(self.items) >= self.max_items
+
+    def feed(self, data):
+        self._parser.feed(data)
+        for event, element in self._parser.read_events():
+            name = _local(element.tag)
+            if event == 'start':
+                self._depth += 1
+                if name in ('item', 'entry') and self._entry_depth is None:
+                    self._entry_depth = self._depth
+                continue
+            self._depth -= 1
+            if name in ('item', 'entry') and self._entry_depth == self._depth + 1:
+                self._entry_depth = None
+                if not self.full:
+                    item = _entry_to_item(element, self.feed_title, self.feed_url)
+                    if item['headline']:
+                        self.items.append(item)
+                element.clear()
+            elif name == 'title' and self._entry_depth is None and not self.feed_title:
+                # The channel/feed title (the first title outside an item) names the source
+                self.feed_title = _text(element.text)
+
+    def close(self):
+        try:
+            self._parser.close()
+        except ET.ParseError:
+            if not self.items:
+                raise
+        return self.items
+
+
+def parse_feed(data, feed_url=''):
+    parser = FeedParser(feed_url)
+    parser.feed(data)
+    return parser.close()
+
+
+# --- FETCHING ---
+
+class FeedCache:
+    """
+    Validators (ETag, Last-Modified) and the last parsed items per feed URL, persisted as JSON.
+    """
+    def __init__(self, path=FEED_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def get(self, url):
+        with self._lock:
+            return self.entries.get(url)
+
+    def put(self, url, entry):
+        with self._lock:
+            self.entries[url] = entry
+
+    def save(self):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+def fetch_feed(url, cache, timeout=FEED_TIMEOUT):
+    """
+    Fetches one feed conditionally. Returns (items, status) with status 'fetched', 'not_modified',
+    'stale' (the request failed, cached items were used) or 'failed'.
+    """
+    cached = cache.get(url)
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, 'Accept-Encoding': 'identity'})
+    if cached:
+        if cached.get('etag'):
+            request.add_header('If-None-Match', cached['etag'])
+        if cached.get('last_modified'):
+            request.add_header('If-Modified-Since', cached['last_modified'])
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            parser = FeedParser(url)
+            while not parser.full:
+                chunk = response.read(READ_CHUNK)
+                if not chunk:
+                    break
+                parser.feed(chunk)
+            items = parser.items if parser.full else parser.close()
+            cache.put(url, {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'items': items,
+            })
+            return items, 'fetched'
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached:
+            return cached['items'], 'not_modified'
+        error = e
+    except (urllib.error.URLError, OSError, ET.ParseError) as e:
+        error = e
+    log.warning("Feed %s failed: %s", url, error)
+    return (cached['items'], 'stale') if cached else ([], 'failed')
+
+
+def fetch_feeds(urls, cache=None, max_workers=MAX_FEED_WORKERS, timeout=FEED_TIMEOUT):
+    """
+    Fetches all feeds concurrently. Returns (items, statuses) where items keeps feed order and
+    drops exact repeats of a URL; statuses maps each feed URL to its fetch status.
+    """
+    cache = cache or FeedCache()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls) or 1))) as executor:
+        results = list(executor.map(lambda url: fetch_feed(url, cache, timeout), urls))
+    cache.save()
+
+    items, seen = [], set()
+    for feed_items, _ in results:
+        for item in feed_items:
+            key = item['url'] or item['headline']
+            if key not in seen:
+                seen.add(key)
+                items.append(item)
+    return items, {url: status for url, (_, status) in zip(urls, results)}
+
+
+def format_items(items):
+    """
+    Renders items in the wire service's list format, so they can stand in for its output.
+    """
+    entries = []
+    for number, item in enumerate(items, start=1):
+        entry = f"{number}. Headline: {item['headline']}\n   Source: {item['url'] or item['source']}\n   Summary: {item['summary']}"
+        if item.get('location'):
+            entry += f"\n   Location: {item['location']}"
+        entries.append(entry)
+    return '\n'.join(entries)
+
+
+# --- LOCAL FEED SERVER ---
+
+class FeedRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves feed files with ETag and Last-Modified validators and answers conditional requests
+    with 304. `latency` (seconds) simulates a remote server.
+    """
+    latency = 0.0
+
+    def send_head(self):
+        time.sleep(self.latency)
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            etag = f'"{hashlib.sha1(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()[:16]}"'
+            last_modified = formatdate(stat.st_mtime, usegmt=True)
+            if self.headers.get('If-None-Match') == etag or self._not_modified_since(stat.st_mtime):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+                self.end_headers()
+                return None
+            self._validators = (etag, last_modified)
+        return super().send_head()
+
+    def _not_modified_since(self, mtime):
+        since = self.headers.get('If-Modified-Since')
+        if not since or self.headers.get('If-None-Match'):
+            return False
+        try:
+            return int(mtime) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def end_headers(self):
+        validators = getattr(self, '_validators', None)
+        if validators:
+            self.send_header('ETag', validators[0])
+            self._validators = None
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeedServer:
+    """
+    A local feed server on a background thread, for development and benchmarks:
+
+        with FeedServer('feeds/') as server:
+            items, statuses = fetch_feeds([server.url('world.xml')])
+    """
+    def __init__(self, directory, port=0, latency=0.0):
+        handler = type('Handler', (FeedRequestHandler,), {'latency': latency})
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), lambda *args: handler(*args, directory=directory))
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/{name}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def write_sample_feeds(directory, feeds=8, items=40):
+    """
+    Writes synthetic RSS 2.0 and Atom feeds and returns their file names.
+    """
+    names = []
+    for index in range(feeds):
+        atom = index % 2 == 1
+        entries = []
+        for number in range(items):
+            title = html.escape(f"Story {number} from feed {index}: city council votes on budget {number % 7}")
+            link = f"https://example.org/{index}/{number}"
+            summary = html.escape(f"<p>The council voted on item {number}. More details followed in the afternoon.</p>")
+            if atom:
+                entries.append(f'<entry><title>{title}</title><link rel="alternate" href="{link}"/><summary>{summary}</summary></entry>')
+            else:
+                entries.append(f'<item><title>{title}</title><link>{link}</link><description>{summary}</description></item>')
+        if atom:
+            body = f'<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Feed {index}</title>{"".join(entries)}</feed>'
+        else:
+            body = f'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel><title>Feed {index}</title>{"".join(entries)}</channel></rss>'
+        name = f"feed{index}.{'atom' if atom else 'rss'}.xml"
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as file:
+            file.write(body)
+        names.append(name)
+    return names
+
+
+if __name__ == '__main__':
+    # python feed_wire.py  -- cold and conditional fetch of 8 local feeds with 200 ms server latency
+    with tempfile.TemporaryDirectory() as directory:
+        names = write_sample_feeds(directory)
+        cache = FeedCache(os.path.join(directory, 'cache.json'))
+        with FeedServer(directory, latency=0.2) as server:
+            urls = [server.url(name) for name in names]
+            for label in ('cold', 'conditional'):
+                start = time.perf_counter()
+                items, statuses = fetch_feeds(urls, cache)
+                print(f"{label}: {len(items)} items from {len(urls)} feeds in {(time.perf_counter() - start) * 1000:.0f} ms "
+                      f"({', '.join(sorted(set(statuses.values())))})")
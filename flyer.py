@@ -1,7 +1,8 @@
 import os
 from crewai import Agent, Task, Crew, Process
 from crewai_tools import SerperDevTool
-from langchain_openai import ChatOpenAI
+from crew_templates import crew_template
+from llm_layer import build_llm
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -12,7 +13,7 @@ load_dotenv()
 
 class FlyerDesignAgents:
     def __init__(self):
-        self.llm = ChatOpenAI(model_name="gpt-4o", temperature=0.8)
+        self.llm = build_llm("gpt-4o", temperature=0.8, crew='flyer')
         self.search_tool = SerperDevTool()
 
     def creative_brief_specialist(self):
@@ -51,7 +52,7 @@ class FlyerDesignAgents:
 # --- TASK DEFINITIONS (New Task and Final Output Structure) ---
 
 class FlyerDesignTasks:
-    def briefing_task(self, agent, topic, text_element, flyer_type):
+    def briefing_task(self, agent, topic, text_element, flyer_type, date=None):
         return Task(
             description=f"""
                 Analyze the provided information to create a Creative Brief.
@@ -59,7 +60,7 @@ class FlyerDesignTasks:
                 - Key Text/Slogan: "{text_element}"
                 - Flyer Type: "{flyer_type}"
                 Your brief must clearly define: Target Audience, Desired Emotion, and Core Message.
-                The current date is {datetime.now().strftime('%Y-%m-%d')}.
+                The current date is {date or datetime.now().strftime('%Y-%m-%d')}.
             """,
             expected_output="A concise creative brief document.",
             agent=agent,
@@ -105,7 +106,11 @@ class FlyerDesignTasks:
 
 # --- CREW SETUP (Updated to include the new agent and aggregate the output) ---
 
-def create_flyer_crew(topic, text_element, flyer_type):
+def create_flyer_crew(topic, text_element, flyer_type, on_image_prompt=None, on_social_copy=None, date=None):
+    """
+    Builds the flyer crew. The optional callbacks receive each task's output as soon as that task
+    finishes, so image rendering can start while the copywriter is still working.
+    """
     agents = FlyerDesignAgents()
     tasks = FlyerDesignTasks()
 
@@ -116,12 +121,14 @@ def create_flyer_crew(topic, text_element, flyer_type):
     copywriter = agents.social_media_copywriter()
 
     # Instantiate Tasks
-    briefing = tasks.briefing_task(brief_specialist, topic, text_element, flyer_type)
+    briefing = tasks.briefing_task(brief_specialist, topic, text_element, flyer_type, date)
     visualizing = tasks.visual_concept_task(concept_developer, context=[briefing])
     
     # These two tasks can potentially run in parallel after visualizing
     crafting_prompt = tasks.prompt_crafting_task(prompt_crafter, context=[briefing, visualizing])
     crafting_copy = tasks.copywriting_task(copywriter, context=[briefing, visualizing])
+    crafting_prompt.callback = on_image_prompt
+    crafting_copy.callback = on_social_copy
 
     # Assemble the Crew
     flyer_crew = Crew(
@@ -131,101 +138,84 @@ def create_flyer_crew(topic, text_element, flyer_type):
         verbose=2,
     )
     
-    # The result will be a list of the outputs from each task.
-    # The prompt is from task 3 (index 2) and the copy is from task 4 (index 3).
+    # The prompt task runs before the copywriting task, so its callback fires while
+    # the copywriter still has a full LLM call ahead of it.
     return flyer_crew
-import streamlit as st
-import vertexai
-from vertexai.preview.vision_models import ImageGenerationModel
-from google.api_core.exceptions import PermissionDenied, ClientError
 
-# The location is generally static, but could also be a parameter if needed.
-LOCATION = "us-central1"
 
-# The function is now self-contained and relies on parameters.
-# Using st.cache_data is still a good practice to prevent re-generation for the same prompt.
-@st.cache_data
-def generate_image_with_imagen(project_id: str, prompt: str):
+def bind_flyer_crew(topic, text_element, flyer_type, on_image_prompt=None, on_social_copy=None):
     """
-    Generates an image using Google's Imagen model in Vertex AI.
-    Requires the user's Google Cloud Project ID.
+    Like create_flyer_crew, but copies a crew built once per process. Returns (crew, inputs);
+    run it with run_with_budget(crew, budget, inputs=inputs).
     """
-    try:
-        # Initialize Vertex AI with the user-provided project ID.
-        # This will use the Application Default Credentials (ADC) from the environment.
-        vertexai.init(project=project_id, location=LOCATION)
-        
-        model = ImageGenerationModel.from_pretrained("imagegeneration@006")
-        
-        images = model.generate_images(
-            prompt=prompt,
-            number_of_images=1,
-            aspect_ratio="1:1",
-        )
-        
-        return images[0]._image_bytes
-
-    except PermissionDenied:
-        st.error("Authentication failed: Permission Denied.")
-        st.error("Please ensure you have authenticated your environment by running 'gcloud auth application-default login' in your terminal and that the Vertex AI API is enabled for your project.")
-        return None
-    except ClientError as e:
-        # Handle cases where the project ID might be invalid or the API not enabled.
-        st.error(f"A client error occurred: {e}")
-        st.error(f"Please double-check that your Project ID ('{project_id}') is correct and that the Vertex AI API is enabled in the Google Cloud Console.")
-        return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred during image generation: {e}")
-        return None
-        
-        
- 
-import streamlit as st
-import vertexai
-from vertexai.preview.vision_models import ImageGenerationModel
-
-# The location is generally fixed for the model endpoint
-LOCATION = "us-central1" 
-
-@st.cache_data # Cache the result to avoid re-generating on every interaction
-def generate_image_with_imagen(prompt: str, project_id: str):
+    template = crew_template(create_flyer_crew, ('topic', 'text_element', 'flyer_type', 'date'))
+    crew, inputs = template.bind(topic=topic, text_element=text_element, flyer_type=flyer_type,
+                                 date=datetime.now().strftime('%Y-%m-%d'))
+    # Callbacks belong to this request, so they go on the copied tasks
+    crew.tasks[2].callback = on_image_prompt
+    crew.tasks[3].callback = on_social_copy
+    return crew, inputs
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from image_store import default_store, image_key
+from imagen_client import IMAGEN_MODEL, LOCATION, get_imagen_client
+
+# Imagen aspect ratios rendered for each flyer type; the first one is the primary format
+FLYER_ASPECT_RATIOS = {
+    "Social Media Post (Square)": ["1:1"],
+    "Poster (Portrait)": ["3:4", "9:16"],
+    "Banner (Landscape)": ["16:9", "4:3"],
+}
+
+# Upper bound on Imagen requests in flight at once, to stay within the project's quota
+MAX_CONCURRENT_GENERATIONS = 4
+
+def generate_image_variants(prompt: str, project_id: str, aspect_ratios, variants: int = 1,
+                            max_concurrency: int = MAX_CONCURRENT_GENERATIONS):
     """
-    Generates an image using Google's Imagen model in Vertex AI.
-    Args:
-        prompt (str): The detailed text prompt for image generation.
-        project_id (str): The user's Google Cloud Project ID.
+    Generates `variants` images for every aspect ratio concurrently, at most `max_concurrency`
+    requests at a time, and yields (aspect_ratio, variant, image_path, error) as each one
+    completes. Exactly one of image_path and error is None. Variants already in the image
+    store are yielded first without calling Imagen.
+
+    Workers never touch Streamlit; errors are yielded so the caller can report them.
     """
-    # The project_id check is now handled in the main app before calling this function.
-    try:
-        # Initialize Vertex AI with the user-provided project
-        vertexai.init(project=project_id, location=LOCATION)
-        
-        # Load the model
-        model = ImageGenerationModel.from_pretrained("imagegeneration@006")
-        
-        # Generate image
-        images = model.generate_images(
-            prompt=prompt,
-            number_of_images=1,
-            aspect_ratio="1:1",
-        )
-        
-        # Return the raw image data
-        return images[0]._image_bytes
-
-    except Exception as e:
-        st.error(f"An error occurred during image generation: {e}")
-        st.warning("""
-        **Troubleshooting Tips:**
-        1.  Ensure the Project ID you entered is correct.
-        2.  Make sure you have authenticated your local environment by running `gcloud auth application-default login` in your terminal.
-        3.  Verify that the Vertex AI API is enabled in your Google Cloud project.
-        """)
-        return None
+    store = default_store()
+    jobs = []
+    for aspect_ratio in aspect_ratios:
+        for variant in range(variants):
+            key = image_key(prompt, IMAGEN_MODEL, aspect_ratio, variant)
+            cached_path = store.get(key)
+            if cached_path:
+                yield aspect_ratio, variant, cached_path, None
+            else:
+                jobs.append((aspect_ratio, variant, key))
+    if not jobs:
+        return
+
+    # All workers (and all sessions) share one warm client
+    client = get_imagen_client(project_id, LOCATION, IMAGEN_MODEL)
+
+    def render(aspect_ratio, variant, key):
+        return store.put(key, client.generate(prompt, aspect_ratio=aspect_ratio, seed=variant)[0])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(jobs)))) as executor:
+        futures = {executor.submit(render, aspect_ratio, variant, key): (aspect_ratio, variant) for aspect_ratio, variant, key in jobs}
+        for future in as_completed(futures):
+            aspect_ratio, variant = futures[future]
+            try:
+                yield aspect_ratio, variant, future.result(), None
+            except Exception as e:
+                yield aspect_ratio, variant, None, e
  
- import streamlit as st
-from flyer_crew import create_flyer_crew
-from image_generator import generate_image_with_imagen
+import queue
+import threading
+import streamlit as st
+from flyer_compositor import EXPORT_FORMATS, export_flyer_set, zip_exports
+from flyer_crew import bind_flyer_crew
+from crew_budgets import crew_budget, run_with_budget
+from image_generator import FLYER_ASPECT_RATIOS, generate_image_variants
+from artifact_store import default_artifact_store
+import time
 
 # --- Page Configuration ---
 st.set_page_config(page_title="AI Flyer Production Studio", page_icon="🚀", layout="wide")
@@ -273,6 +263,15 @@ with col2:
 
 flyer_type = st.selectbox("**Flyer Type:**", ("Social Media Post (Square)", "Poster (Portrait)", "Banner (Landscape)"))
 
+col3, col4 = st.columns(2)
+with col3:
+    num_variants = st.slider("**Image variants per format:**", min_value=1, max_value=4, value=2)
+with col4:
+    all_formats = st.checkbox(
+        f"Also render alternative formats ({', '.join(FLYER_ASPECT_RATIOS[flyer_type][1:]) or 'none for this type'})",
+        value=False, disabled=len(FLYER_ASPECT_RATIOS[flyer_type]) == 1
+    )
+
 
 # --- Execution Logic ---
 st.header("Step 2: Produce & Distribute")
@@ -285,46 +284,136 @@ if st.button("🚀 Generate Flyer and Social Copy"):
     elif not topic or not text_element:
         st.error("❌ Please provide both a Topic and Key Text to proceed.")
     else:
-        # If credentials are provided, run the full process
-        crew_result = None
-        with st.spinner("Your AI Design Studio is developing the concept..."):
+        # If credentials are provided, run the full process.
+        # The crew runs on a worker thread; image rendering starts from the prompt task's callback
+        # and overlaps with the copywriter. Workers only post events, all UI updates happen here.
+        aspect_ratios = FLYER_ASPECT_RATIOS[flyer_type] if all_formats else FLYER_ASPECT_RATIOS[flyer_type][:1]
+        total_images = len(aspect_ratios) * num_variants
+        project_id = st.session_state['project_id']
+        events = queue.Queue()
+
+        def render_images(output):
+            events.put(('prompt', output.raw))
+            def run():
+                try:
+                    for update in generate_image_variants(output.raw, project_id, aspect_ratios, num_variants):
+                        events.put(('image', update))
+                except Exception as e:
+                    events.put(('images_error', e))
+                events.put(('images_done', None))
+            threading.Thread(target=run, daemon=True).start()
+
+        def run_crew():
             try:
-                flyer_design_crew = create_flyer_crew(topic, text_element, flyer_type)
-                crew_result = flyer_design_crew.kickoff()
-                
-                image_prompt = crew_result.tasks_output[2].exported_output
-                social_copy = crew_result.tasks_output[3].exported_output
-                
-                st.success("Concept approved! Prompt and copy are ready.")
-                st.subheader("🎨 Generated Image Prompt")
-                st.code(image_prompt, language="text")
-
-            except Exception as e:
-                st.error(f"An error occurred during AI crew execution: {e}")
-                crew_result = None
-
-        if crew_result:
-            image_bytes = None
-            with st.spinner("Sending prompt to Google Imagen for final rendering..."):
-                # Pass the project_id from session_state to the function
-                image_bytes = generate_image_with_imagen(
-                    project_id=st.session_state['project_id'],
-                    prompt=image_prompt
+                crew, crew_inputs = bind_flyer_crew(
+                    topic, text_element, flyer_type,
+                    on_image_prompt=render_images,
+                    on_social_copy=lambda output: events.put(('copy', output.raw))
                 )
-
-            if image_bytes:
-                st.success("Rendering complete!")
-                st.subheader("✅ Your Final Flyer")
-                st.image(image_bytes, caption="Generated by Google Imagen")
-
-                st.subheader("Step 3: Download & Share")
-                st.download_button(
-                    label="Download Flyer Image",
-                    data=image_bytes,
-                    file_name="generated_flyer.png",
-                    mime="image/png"
-                )
-                st.text_area("✍️ Your Social Media Caption (Ready to Copy)", social_copy, height=150)
+                outcome = run_with_budget(crew, crew_budget('flyer'), inputs=crew_inputs)
+                if not outcome['complete']:
+                    events.put(('crew_error', f"the crew was stopped: {outcome['reason']}"))
+            except Exception as e:
+                events.put(('crew_error', e))
+
+        threading.Thread(target=run_crew, daemon=True).start()
+
+        status = st.status("Your AI Design Studio is developing the concept...", expanded=False)
+        st.subheader("🎨 Generated Image Prompt")
+        prompt_slot = st.empty()
+        st.subheader("✅ Your Flyer Variants")
+        progress = st.progress(0.0, text="Waiting for the image prompt...")
+        # One gallery slot per (format, variant); each slot is filled as soon as its image arrives
+        gallery = {}
+        for aspect_ratio in aspect_ratios:
+            columns = st.columns(num_variants)
+            for variant, column in enumerate(columns):
+                gallery[(aspect_ratio, variant)] = column.empty()
+        st.subheader("Step 3: Download & Share")
+        copy_slot = st.empty()
+
+        rendered = 0
+        failures = []
+        primary_image_path = None
+        started = time.time()
+        # Kept in the artifact store once the loop ends: the prompt, the caption and every image
+        image_prompt, social_copy, image_blobs = None, None, []
+        pending = {'images', 'copy'}
+        while pending:
+            kind, payload = events.get()
+            if kind == 'crew_error':
+                status.update(label="The AI crew stopped.", state="error")
+                st.error(f"An error occurred during AI crew execution: {payload}")
+                break
+            elif kind == 'prompt':
+                status.update(label="Concept approved! Rendering while the copywriter works...")
+                image_prompt = payload
+                prompt_slot.code(payload, language="text")
+                progress.progress(0.0, text=f"Rendering {total_images} images with Google Imagen...")
+            elif kind == 'copy':
+                pending.discard('copy')
+                social_copy = payload
+                copy_slot.text_area("✍️ Your Social Media Caption (Ready to Copy)", payload, height=150)
+            elif kind == 'images_error':
+                failures.append(payload)
+            elif kind == 'images_done':
+                pending.discard('images')
+            elif kind == 'image':
+                aspect_ratio, variant, image_path, error = payload
+                rendered += 1
+                progress.progress(rendered / total_images, text=f"Rendered {rendered} of {total_images} images")
+                slot = gallery[(aspect_ratio, variant)].container()
+                if error:
+                    failures.append(error)
+                    slot.error(f"{aspect_ratio} variant {variant + 1} failed.")
+                    continue
+                if aspect_ratio == aspect_ratios[0] and (primary_image_path is None or variant == 0):
+                    primary_image_path = image_path
+                # Shown from the image store path (pinned there while this run uses it). Streamlit
+                # still copies each displayed image and download into its in-session media cache,
+                # so the image store bounds what is kept across runs, not what one page holds.
+                # The artifact store reads the file by path when the run is recorded.
+                slot.image(image_path, caption=f"{aspect_ratio} · variant {variant + 1}")
+                image_blobs.append((f"flyer_{aspect_ratio.replace(':', 'x')}_{variant + 1}.png", image_path, "image/png"))
+                with open(image_path, 'rb') as image_file:
+                    slot.download_button(
+                        label="Download",
+                        data=image_file,
+                        file_name=f"generated_flyer_{aspect_ratio.replace(':', 'x')}_{variant + 1}.png",
+                        mime="image/png",
+                        key=f"download_{aspect_ratio}_{variant}"
+                    )
+
+        if failures:
+            st.error(f"An error occurred during image generation: {failures[0]}")
+            st.warning("""
+            **Troubleshooting Tips:**
+            1.  Ensure the Project ID you entered is correct.
+            2.  Make sure you have authenticated your local environment by running `gcloud auth application-default login` in your terminal.
+            3.  Verify that the Vertex AI API is enabled in your Google Cloud project.
+            """)
+        if primary_image_path:
+            # Put the slogan on the first variant and export every format in one pass
+            st.subheader("🖼️ Finished Flyer with Your Key Text")
+            with open(primary_image_path, 'rb') as image_file:
+                exports = export_flyer_set(image_file.read(), text_element, flyer_type)
+            preview_name = {"Poster (Portrait)": "poster.png", "Banner (Landscape)": "banner.jpg"}.get(flyer_type, "social_square.jpg")
+            st.image(exports[preview_name], caption=f"{preview_name} with \"{text_element}\"")
+            st.download_button(
+                label=f"Download All Formats ({', '.join(EXPORT_FORMATS)} + thumbnails)",
+                data=zip_exports(exports),
+                file_name="flyer_export_set.zip",
+                mime="application/zip"
+            )
+        if image_prompt or social_copy:
+            default_artifact_store().record(
+                'flyer', {'topic': topic, 'text_element': text_element, 'flyer_type': flyer_type}, social_copy,
+                title=f"{topic}: {text_element}", started=started, status='done' if not pending and not failures else 'partial',
+                tasks=[("Imagen Prompt Crafter", "Image prompt", image_prompt), ("Social Media Copywriter", "Caption", social_copy)],
+                blobs=image_blobs
+            )
+        if not pending:
+            status.update(label="Your flyer is ready!", state="complete")
 
 # --- Footer ---
 st.markdown("---")
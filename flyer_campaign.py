@@ -0,0 +1,191 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from crew_budgets import crew_budget, run_with_budget
+from flyer_crew import bind_flyer_crew
+from image_generator import FLYER_ASPECT_RATIOS
+from image_store import default_store, image_key
+from imagen_client import IMAGEN_MODEL, LOCATION, get_imagen_client
+
+# --- FLYER CAMPAIGN BATCH MODE ---
+# Headless entry point for producing many flyers in one unattended run:
+#
+#   python flyer_campaign.py campaign.csv --project my-gcp-project --out campaign_output
+#
+# Each row (topic, text_element, flyer_type) runs the flyer crew, copied from its template and
+# under the 'flyer' budget, and an Imagen render. Crews and renders have separate concurrency
+# limits; a row's render starts as soon as its image prompt is ready. Finished rows are appended
+# to manifest.jsonl (a row stopped by its budget with the reason), so rerunning the same command
+# resumes where an interrupted run stopped.
+
+DEFAULT_FLYER_TYPE = "Social Media Post (Square)"
+MANIFEST_FILE = 'manifest.jsonl'
+# Row ids name the row's output directory: anything but letters, digits, '_' and '-' is replaced
+UNSAFE_ID_CHARS = re.compile(r'[^A-Za-z0-9_-]+')
+
+
+def read_jobs(path):
+    """
+    Reads campaign rows from a .csv (with a header row) or .jsonl file.
+    Required fields: topic, text_element. Optional: flyer_type, id. Ids are reduced to safe
+    directory names and must be unique; rows without one are identified by their content.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.lower().endswith('.jsonl'):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = list(csv.DictReader(file))
+
+    jobs, rows_by_id = [], {}
+    for number, row in enumerate(rows, start=1):
+        topic, text_element = (row.get('topic') or '').strip(), (row.get('text_element') or '').strip()
+        if not topic or not text_element:
+            raise ValueError(f"Row {number} of {path} needs both a topic and a text_element.")
+        flyer_type = (row.get('flyer_type') or DEFAULT_FLYER_TYPE).strip()
+        if flyer_type not in FLYER_ASPECT_RATIOS:
+            raise ValueError(f"Row {number} of {path} has an unknown flyer_type '{flyer_type}'.")
+        job_id = UNSAFE_ID_CHARS.sub('-', str(row.get('id') or '')).strip('-') or \
+            hashlib.sha1(f"{topic}\0{text_element}\0{flyer_type}".encode('utf-8')).hexdigest()[:12]
+        # Compared case-insensitively, as output directories may be on a case-insensitive file system
+        if job_id.lower() in rows_by_id:
+            raise ValueError(f"Rows {rows_by_id[job_id.lower()]} and {number} of {path} share the id '{job_id}'; give each row its own id.")
+        rows_by_id[job_id.lower()] = number
+        jobs.append({'id': job_id, 'topic': topic, 'text_element': text_element, 'flyer_type': flyer_type})
+    return jobs
+
+
+class Manifest:
+    """
+    Append-only JSONL record of finished rows; the last entry per row id wins.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['id']] = entry
+
+    def is_done(self, job_id):
+        return self.entries.get(job_id, {}).get('status') == 'done'
+
+    def record(self, entry):
+        with self._lock:
+            self.entries[entry['id']] = entry
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+
+
+def package_row(out_dir, job, image_path, image_prompt, social_copy, compose):
+    """
+    Writes everything for one row into out_dir/<id>/ and returns the list of files.
+    """
+    row_dir = os.path.join(out_dir, job['id'])
+    os.makedirs(row_dir, exist_ok=True)
+    shutil.copyfile(image_path, os.path.join(row_dir, 'image.png'))
+    with open(os.path.join(row_dir, 'prompt.txt'), 'w', encoding='utf-8') as file:
+        file.write(image_prompt)
+    with open(os.path.join(row_dir, 'social_copy.md'), 'w', encoding='utf-8') as file:
+        file.write(social_copy)
+    with open(os.path.join(row_dir, 'job.json'), 'w', encoding='utf-8') as file:
+        json.dump(job, file, ensure_ascii=False, indent=2)
+
+    if compose:
+        from flyer_compositor import export_flyer_set
+        with open(image_path, 'rb') as image_file:
+            exports = export_flyer_set(image_file.read(), job['text_element'], job['flyer_type'])
+        for name, data in exports.items():
+            with open(os.path.join(row_dir, name), 'wb') as file:
+                file.write(data)
+    return sorted(os.listdir(row_dir))
+
+
+def run_campaign(jobs, project_id, out_dir, crew_concurrency=3, render_concurrency=4, compose=False, log=print):
+    """
+    Runs every job that the manifest does not already mark as done.
+    Returns {'done': n, 'failed': n, 'skipped': n}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(out_dir, MANIFEST_FILE))
+    pending = [job for job in jobs if not manifest.is_done(job['id'])]
+    counts = {'done': 0, 'failed': 0, 'skipped': len(jobs) - len(pending)}
+    counts_lock = threading.Lock()
+    client = get_imagen_client(project_id, LOCATION, IMAGEN_MODEL)
+    store = default_store()
+
+    def finish(job, started, status, error=None, files=None, reason=None):
+        manifest.record({
+            'id': job['id'], 'status': status, 'error': error, 'reason': reason, 'files': files or [],
+            'seconds': round(time.time() - started, 2), 'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+        with counts_lock:
+            counts[status] += 1
+        log(f"[{status}] {job['id']}: {job['topic']} / {job['text_element']}" + (f" ({error or reason})" if error or reason else ""))
+
+    def render(job, image_prompt):
+        aspect_ratio = FLYER_ASPECT_RATIOS[job['flyer_type']][0]
+        key = image_key(image_prompt, IMAGEN_MODEL, aspect_ratio, 0)
+        return store.get_or_create(key, lambda: client.generate(image_prompt, aspect_ratio=aspect_ratio, seed=0)[0])
+
+    with ThreadPoolExecutor(max_workers=render_concurrency) as render_pool, \
+         ThreadPoolExecutor(max_workers=crew_concurrency) as crew_pool:
+
+        def run_row(job):
+            started = time.time()
+            render_future, outputs = {}, {}
+
+            def on_image_prompt(output):
+                # The render is queued as soon as the prompt is written, while the copywriter works
+                outputs['image_prompt'] = output.raw
+                render_future.setdefault('future', render_pool.submit(render, job, output.raw))
+
+            try:
+                crew, inputs = bind_flyer_crew(job['topic'], job['text_element'], job['flyer_type'], on_image_prompt=on_image_prompt,
+                                               on_social_copy=lambda output: outputs.setdefault('social_copy', output.raw))
+                outcome = run_with_budget(crew, crew_budget('flyer'), inputs=inputs)
+                if not outcome['complete']:
+                    finish(job, started, 'failed', reason=outcome['reason'])
+                    return
+                if 'future' not in render_future:
+                    raise RuntimeError("The crew finished without an image prompt.")
+                image_path = render_future['future'].result()
+                files = package_row(out_dir, job, image_path, outputs['image_prompt'], outputs['social_copy'], compose)
+                finish(job, started, 'done', files=files)
+            except Exception as e:
+                finish(job, started, 'failed', error=str(e))
+
+        list(crew_pool.map(run_row, pending))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a batch of flyers from a CSV or JSONL campaign file.")
+    parser.add_argument('jobs', help="CSV or JSONL file with topic, text_element and optional flyer_type and id columns")
+    parser.add_argument('--project', required=True, help="Google Cloud Project ID for Imagen")
+    parser.add_argument('--out', default='campaign_output', help="Output directory (holds the resumable manifest)")
+    parser.add_argument('--crew-concurrency', type=int, default=3, help="Flyer crews running at once")
+    parser.add_argument('--render-concurrency', type=int, default=4, help="Imagen requests in flight at once")
+    parser.add_argument('--compose', action='store_true', help="Also export the slogan-composited formats per row")
+    args = parser.parse_args()
+
+    jobs = read_jobs(args.jobs)
+    print(f"{len(jobs)} flyers in {args.jobs}")
+    counts = run_campaign(jobs, args.project, args.out, args.crew_concurrency, args.render_concurrency, args.compose)
+    print(f"Done: {counts['done']}, failed: {counts['failed']}, skipped (already done): {counts['skipped']}")
+    print(f"Manifest: {os.path.join(args.out, MANIFEST_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import io
+import sys
+import time
+import zipfile
+from PIL import Image, ImageDraw, ImageFont
+
+# --- FLYER COMPOSITOR ---
+# Puts the slogan (text_element) onto the generated background and exports every format in one
+# pass: the PNG is decoded once, each format is resampled straight from that buffer (crop and
+# resize in a single resize() call), the slogan is drawn at the target resolution so it stays
+# crisp, and every output is encoded exactly once.
+
+# name: (width, height, encoding)
+EXPORT_FORMATS = {
+    'social_square': (1080, 1080, 'JPEG'),
+    'story': (1080, 1920, 'JPEG'),
+    'poster': (2480, 3508, 'PNG'),  # A4 at 300 dpi
+    'banner': (1500, 500, 'JPEG'),
+}
+THUMBNAIL_SIZE = 320
+
+# Where and how the slogan sits, per flyer type
+LAYOUT_PRESETS = {
+    "Social Media Post (Square)": {'anchor': 'bottom', 'align': 'center', 'font_scale': 0.075, 'max_width': 0.86, 'scrim': 150},
+    "Poster (Portrait)": {'anchor': 'top', 'align': 'center', 'font_scale': 0.09, 'max_width': 0.84, 'scrim': 120},
+    "Banner (Landscape)": {'anchor': 'middle', 'align': 'left', 'font_scale': 0.13, 'max_width': 0.55, 'scrim': 140},
+}
+
+FONT_CANDIDATES = ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf", "LiberationSans-Bold.ttf")
+
+
+def load_font(size):
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def fill_box(source_size, target_size):
+    """
+    The centred crop box of the source that has the target's aspect ratio.
+    """
+    source_w, source_h = source_size
+    target_w, target_h = target_size
+    scale = max(target_w / source_w, target_h / source_h)
+    crop_w, crop_h = target_w / scale, target_h / scale
+    left, top = (source_w - crop_w) / 2, (source_h - crop_h) / 2
+    return (left, top, left + crop_w, top + crop_h)
+
+
+def wrap_text(draw, text, font, max_width):
+    lines, line = [], ''
+    for word in text.split():
+        candidate = f'{line} {word}'.strip()
+        if line and draw.textlength(candidate, font=font) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def overlay_slogan(image, text, layout):
+    """
+    Draws the slogan onto an RGB image in place, on a translucent scrim for legibility.
+    """
+    width, height = image.size
+    font_size = max(14, int(min(width, height) * layout['font_scale']))
+    font = load_font(font_size)
+    overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+
+    lines = wrap_text(draw, text, font, width * layout['max_width'])
+    line_height = int(font_size * 1.25)
+    block_height = line_height * len(lines)
+    padding = int(font_size * 0.6)
+    margin = int(min(width, height) * 0.06)
+
+    if layout['anchor'] == 'top':
+        top = margin
+    elif layout['anchor'] == 'bottom':
+        top = height - margin - block_height
+    else:
+        top = (height - block_height) // 2
+
+    # Centred text gets a full-width band, left-aligned text a panel behind the text only
+    text_width = max(draw.textlength(line, font=font) for line in lines) if lines else 0
+    scrim_right = width if layout['align'] == 'center' else min(width, 2 * margin + text_width)
+    draw.rectangle((0, top - padding, scrim_right, top + block_height + padding), fill=(0, 0, 0, layout['scrim']))
+    for index, line in enumerate(lines):
+        line_width = draw.textlength(line, font=font)
+        left = margin if layout['align'] == 'left' else (width - line_width) / 2
+        draw.text((left, top + index * line_height), line, font=font, fill=(255, 255, 255, 255))
+
+    image.paste(overlay, (0, 0), overlay)
+    return image
+
+
+def encode(image, encoding):
+    buffer = io.BytesIO()
+    if encoding == 'JPEG':
+        image.save(buffer, 'JPEG', quality=90, optimize=True)
+    else:
+        image.save(buffer, 'PNG', compress_level=6)
+    return buffer.getvalue()
+
+
+def export_flyer_set(image_bytes, text_element, flyer_type, formats=EXPORT_FORMATS):
+    """
+    Composites the slogan and exports every format plus a thumbnail of each.
+    Returns {file_name: encoded_bytes}.
+    """
+    layout = LAYOUT_PRESETS.get(flyer_type, LAYOUT_PRESETS["Social Media Post (Square)"])
+    base = Image.open(io.BytesIO(image_bytes)).convert('RGB')  # the only decode
+
+    exports = {}
+    for name, (width, height, encoding) in formats.items():
+        # Crop-to-fill and resample in one step; reducing_gap lets Pillow shrink by integer
+        # factors first, which is much faster for large downscales
+        flyer = base.resize((width, height), Image.LANCZOS, box=fill_box(base.size, (width, height)), reducing_gap=2.0)
+        if text_element:
+            overlay_slogan(flyer, text_element, layout)
+        extension = 'jpg' if encoding == 'JPEG' else 'png'
+        exports[f'{name}.{extension}'] = encode(flyer, encoding)
+
+        # Thumbnails come from the composed frame already in memory
+        thumbnail = flyer.copy()
+        thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR, reducing_gap=2.0)
+        exports[f'{name}_thumb.jpg'] = encode(thumbnail, 'JPEG')
+    return exports
+
+
+def zip_exports(exports):
+    buffer = io.BytesIO()
+    # The images are already compressed, so they are stored as-is
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for name, data in exports.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def benchmark(image_bytes, text_element="Vote for a Greener Tomorrow", flyer_type="Poster (Portrait)", runs=5):
+    """
+    Returns the mean wall time in seconds to produce one full export set.
+    """
+    export_flyer_set(image_bytes, text_element, flyer_type)  # warm up font loading
+    start = time.perf_counter()
+    for _ in range(runs):
+        export_flyer_set(image_bytes, text_element, flyer_type)
+    return (time.perf_counter() - start) / runs
+
+
+if __name__ == '__main__':
+    # python flyer_compositor.py [image.png]  (defaults to a synthetic 1536x1536 image)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as file:
+            source = file.read()
+    else:
+        buffer = io.BytesIO()
+        Image.merge('RGB', [Image.linear_gradient('L').resize((1536, 1536))] * 3).save(buffer, 'PNG')
+        source = buffer.getvalue()
+    seconds = benchmark(source)
+    print(f"{len(EXPORT_FORMATS)} formats + thumbnails: {seconds * 1000:.0f} ms per export set")
@@ -0,0 +1,21 @@
+# --- GEMINI MODELS ---
+# The Gemini models the apps offer, in litellm's "gemini/<name>" form. Shared by the bible study
+# app's model picker and the hedging layer's fallback choices; a fallback answers the same chat
+# request, so only GEMINI_CHAT_MODELS (no speech or image generation models) qualify.
+
+GEMINI_MODEL_LIST = [
+    "gemini/gemini-2.5-pro-preview-03-25", "gemini/gemini-2.5-flash-preview-05-20",
+    "gemini/gemini-2.5-flash", "gemini/gemini-2.5-flash-lite-preview-06-17",
+    "gemini/gemini-2.5-pro-preview-05-06", "gemini/gemini-2.5-pro-preview-06-05",
+    "gemini/gemini-2.5-pro", "gemini/gemini-2.0-flash-exp", "gemini/gemini-2.0-flash",
+    "gemini/gemini-2.0-flash-001", "gemini/gemini-2.0-flash-exp-image-generation",
+    "gemini/gemini-2.0-flash-lite-001", "gemini/gemini-2.0-flash-lite",
+    "gemini/gemini-2.0-flash-preview-image-generation", "gemini/gemini-2.0-flash-lite-preview-02-05",
+    "gemini/gemini-2.0-flash-lite-preview", "gemini/gemini-2.0-pro-exp",
+    "gemini/gemini-2.0-pro-exp-02-05", "gemini/gemini-exp-1206",
+    "gemini/gemini-2.0-flash-thinking-exp-01-21", "gemini/gemini-2.0-flash-thinking-exp",
+    "gemini/gemini-2.0-flash-thinking-exp-1219", "gemini/gemini-2.5-flash-preview-tts",
+    "gemini/gemini-2.5-pro-preview-tts"
+]
+NON_CHAT_MARKERS = ('-tts', 'image-generation')
+GEMINI_CHAT_MODELS = [name for name in GEMINI_MODEL_LIST if not any(marker in name for marker in NON_CHAT_MARKERS)]
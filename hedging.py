@@ -0,0 +1,228 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from crewai import LLM
+from gemini_models import GEMINI_CHAT_MODELS
+from llm_layer import LLMMiddleware, as_llm, call_llm
+
+# --- HEDGED LLM REQUESTS ---
+# One slow call stalls a whole sequential crew, and our slowest calls take several times the
+# median. A HedgedLLM starts the call as usual; if it has not answered after the model's rolling
+# p90 latency, a duplicate goes to the same model or a fallback model, and whichever answers
+# first is returned.
+#
+#   - crewai's LLM.call() returns the whole completion at once, so "slow" means no answer yet,
+#     not no first token yet; the threshold is the p90 of complete calls of the same model.
+#   - A losing request cannot be aborted mid-HTTP call; it runs to completion in the background
+#     and its answer is dropped (a hedge that has not started yet is cancelled outright).
+#   - A shared HedgeBudget caps the extra traffic: hedges may add at most HEDGE_RATIO of the
+#     primary calls, plus a small burst.
+#
+# Opt-in: build_llm(..., hedge=True) or LLM_HEDGE=1; fallbacks via hedge_fallbacks= or
+# LLM_HEDGE_FALLBACKS (comma-separated; Gemini fallbacks must be in GEMINI_CHAT_MODELS).
+
+LATENCY_WINDOW = 200
+# Until a model has this many samples, hedge after INITIAL_HEDGE_DELAY seconds
+MIN_SAMPLES = 20
+INITIAL_HEDGE_DELAY = 20.0
+MIN_HEDGE_DELAY = 0.5
+HEDGE_PERCENTILE = 0.9
+# Hedging at p90 fires for about a tenth of calls by design; the rest of the ratio covers bursts
+HEDGE_RATIO = 0.2
+HEDGE_BURST = 5
+MAX_WORKERS = 32
+
+
+class LatencyTracker:
+    """
+    Rolling latency window per model.
+    """
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model, fraction):
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def hedge_delay(self, model, floor=MIN_HEDGE_DELAY):
+        p90 = self.percentile(model, HEDGE_PERCENTILE)
+        return INITIAL_HEDGE_DELAY if p90 is None else max(floor, p90)
+
+
+class HedgeBudget:
+    """
+    Token bucket shared by all hedged LLMs: each primary call earns `ratio` of a hedge.
+    """
+    def __init__(self, ratio=HEDGE_RATIO, burst=HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = float(burst)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'denied': 0}
+
+    def earn(self):
+        with self._lock:
+            self.stats['calls'] += 1
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.stats['hedges'] += 1
+                return True
+            self.stats['denied'] += 1
+            return False
+
+    def won(self):
+        with self._lock:
+            self.stats['hedge_wins'] += 1
+
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='llm-hedge')
+        return _pool
+
+
+def hedge_fallbacks(model, fallbacks=None):
+    """
+    The fallback models for `model`: the given ones, else LLM_HEDGE_FALLBACKS. Gemini fallbacks
+    are limited to GEMINI_CHAT_MODELS; unknown names are dropped.
+    """
+    if fallbacks is None:
+        fallbacks = [name.strip() for name in os.environ.get('LLM_HEDGE_FALLBACKS', '').split(',') if name.strip()]
+    if model.startswith('gemini/'):
+        fallbacks = [name for name in fallbacks if name in GEMINI_CHAT_MODELS]
+    return [name for name in fallbacks if name != model]
+
+
+class HedgedLLM(LLMMiddleware):
+    """
+    Sends a duplicate request when the first one is slower than the model's rolling p90.
+    """
+    def __init__(self, inner, fallbacks=(), tracker=latency_tracker, budget=hedge_budget, min_delay=MIN_HEDGE_DELAY):
+        super().__init__(inner)
+        self.fallbacks = [as_llm(fallback) for fallback in fallbacks]
+        self.tracker = tracker
+        self.budget = budget
+        self.min_delay = min_delay
+
+    def _hedge_target(self):
+        """
+        The fallback that has been fastest so far, or the same model.
+        """
+        if not self.fallbacks:
+            return self.inner
+        return min(self.fallbacks, key=lambda llm: self.tracker.percentile(llm.model, HEDGE_PERCENTILE) or INITIAL_HEDGE_DELAY)
+
+    def _submit(self, llm, messages, tools, callbacks, available_functions, kwargs):
+        def timed_call():
+            start = time.perf_counter()
+            response = call_llm(llm, messages, tools, callbacks, available_functions, **kwargs)
+            self.tracker.record(llm.model, time.perf_counter() - start)
+            return response
+        return _executor().submit(timed_call)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        self.budget.earn()
+        primary = self._submit(self.inner, messages, tools, callbacks, available_functions, kwargs)
+        try:
+            return primary.result(timeout=self.tracker.hedge_delay(self.inner.model, self.min_delay))
+        except FutureTimeout:
+            pass
+        # Native tool calls run their functions inside the call; never run those twice
+        if available_functions or not self.budget.try_spend():
+            return primary.result()
+
+        target = self._hedge_target()
+        if target is not self.inner:
+            # A fallback is shared by every hedged LLM naming it: this call's settings go with the call
+            kwargs = dict(kwargs, stop=self.setting('stop', kwargs), max_tokens=self.setting('max_tokens', kwargs))
+        hedge = self._submit(target, messages, tools, callbacks, available_functions, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        self.budget.won()
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+
+# --- LOCAL CHECK ---
+
+class TailLatencyLLM(LLM):
+    """
+    A stand-in model whose latency is mostly `median` seconds with an occasional slow call.
+    """
+    def __init__(self, model='gpt-4o', median=0.1, slow=1.5, slow_fraction=0.05, seed=None):
+        super().__init__(model=model)
+        self.median = median
+        self.slow = slow
+        self.slow_fraction = slow_fraction
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        with self._lock:
+            slow = self._random.random() < self.slow_fraction
+            jitter = self._random.uniform(0.8, 1.2)
+        time.sleep((self.slow if slow else self.median) * jitter)
+        return "Final Answer: done"
+
+
+def simulate_crews(crews=20, calls_per_crew=12, hedge=True, seed=7):
+    """
+    Runs `crews` sequential crews of `calls_per_crew` calls each; returns the sorted crew times.
+    """
+    tracker, budget = LatencyTracker(), HedgeBudget()
+    model = TailLatencyLLM(seed=seed)
+    # The stand-in runs ~10x faster than a real model, and so does the hedge delay floor
+    llm = HedgedLLM(model, tracker=tracker, budget=budget, min_delay=MIN_HEDGE_DELAY / 10) if hedge else model
+    # Warm the latency window, as the first calls of a running app would
+    for _ in range(MIN_SAMPLES):
+        start = time.perf_counter()
+        model.call([{'role': 'user', 'content': 'warm up'}])
+        tracker.record(model.model, time.perf_counter() - start)
+    durations = []
+    for _ in range(crews):
+        start = time.perf_counter()
+        for step in range(calls_per_crew):
+            llm.call([{'role': 'user', 'content': f'step {step}'}])
+        durations.append(time.perf_counter() - start)
+    return sorted(durations), budget.stats
+
+
+if __name__ == '__main__':
+    # python hedging.py  -- crew tail latency with and without hedging, against a stand-in model
+    for hedge in (False, True):
+        durations, stats = simulate_crews(hedge=hedge)
+        p50, p99 = durations[len(durations) // 2], durations[min(len(durations) - 1, int(0.99 * len(durations)))]
+        print(f"{'hedged' if hedge else 'plain':<8} crew p50 {p50:5.2f} s  p99 {p99:5.2f} s  max {durations[-1]:5.2f} s"
+              + (f"  hedges {stats['hedges']}/{stats['calls']} ({stats['hedge_wins']} won, {stats['denied']} denied)" if hedge else ''))
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- DISK-BACKED IMAGE STORE ---
+# Content-addressed PNG store shared by every worker process on a machine. Images live on disk
+# rather than in st.cache_data, so the server no longer keeps every PNG it ever generated;
+# Streamlit only holds the images a session is currently showing, in its media cache.
+#
+#   <root>/<first two hex digits>/<sha256>.png
+#
+# Writes go through a temp file and an atomic rename, so concurrent writers of the same key are
+# harmless. The total size is kept under a byte budget by evicting the least recently used files;
+# a hit refreshes the file's modification time, which serves as its LRU timestamp. Images used
+# within the last PIN_SECONDS are pinned: eviction skips them, so a path handed out by get() or
+# put() stays valid while the caller serves it (the store may overshoot its budget meanwhile).
+
+IMAGE_STORE_DIR = os.path.join('runs', 'image_store')
+DEFAULT_BUDGET_BYTES = 2 * 1024 ** 3
+# Evict down to this fraction of the budget, so eviction does not run on every write
+EVICTION_TARGET = 0.9
+# Re-measure the directory every N writes to account for other processes' writes
+RESCAN_EVERY = 64
+PIN_SECONDS = 600
+
+
+def image_key(prompt, model, aspect_ratio, seed=0):
+    payload = json.dumps([prompt, model, aspect_ratio, seed], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ImageStore:
+    """
+    A size-capped, LRU-evicted, content-addressed image store on disk.
+    """
+    def __init__(self, root=IMAGE_STORE_DIR, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._approx_bytes = self._scan_size()
+        self._writes = 0
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f'{key}.png')
+
+    def get(self, key):
+        """
+        Returns the path of the stored image, or None. Callers pass the path on (st.image(path),
+        a file response, ...) instead of keeping the bytes themselves; the file is pinned for
+        PIN_SECONDS.
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, image_bytes):
+        """
+        Stores an image and returns its path, evicting old images if the budget is exceeded.
+        """
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(image_bytes)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._approx_bytes += len(image_bytes)
+            self._writes += 1
+            due = self._approx_bytes > self.budget_bytes or self._writes % RESCAN_EVERY == 0
+        if due:
+            self.evict()
+        return path
+
+    def get_or_create(self, key, render):
+        """
+        Returns the stored image path for `key`, calling `render()` for the bytes on a miss.
+        """
+        return self.get(key) or self.put(key, render())
+
+    def evict(self):
+        """
+        Deletes least recently used images until the store is under its eviction target,
+        skipping pinned ones. Serialized across processes with a lock file.
+        """
+        pinned_since = time.time() - PIN_SECONDS
+        with self._process_lock():
+            files = []
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.png'):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            if total > self.budget_bytes:
+                target = self.budget_bytes * EVICTION_TARGET
+                for mtime, size, path in sorted(files):
+                    if total <= target or mtime >= pinned_since:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except FileNotFoundError:
+                        total -= size
+                    except OSError:  # Windows: still open in another process
+                        pass
+            with self._lock:
+                self._approx_bytes = total
+
+    def _scan_size(self):
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in names if name.endswith('.png'))
+        return total
+
+    @contextmanager
+    def _process_lock(self):
+        with open(os.path.join(self.root, '.lock'), 'a+b') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store():
+    """
+    Returns the process-wide image store; the budget can be set with IMAGE_STORE_BUDGET_MB.
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            budget_mb = os.environ.get('IMAGE_STORE_BUDGET_MB')
+            budget = int(budget_mb) * 1024 ** 2 if budget_mb else DEFAULT_BUDGET_BYTES
+            _default_store = ImageStore(budget_bytes=budget)
+        return _default_store
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+
+# --- IMAGEN CLIENT ---
+# One warm model handle per (project, location, model) and process. vertexai.init() and
+# ImageGenerationModel.from_pretrained() run once, on first use; every session and every
+# concurrent generation afterwards shares the same handle.
+#
+# vertexai.init() sets process-global configuration, which from_pretrained() reads when it
+# builds the handle. Both therefore run under one lock, after which the handle keeps its own
+# project and location and is safe to call from many threads.
+
+LOCATION = "us-central1"
+IMAGEN_MODEL = "imagegeneration@006"
+
+# Output sizes of the fake model per aspect ratio (kept small; only the shape matters)
+FAKE_SIZES = {"1:1": (256, 256), "3:4": (192, 256), "9:16": (144, 256), "4:3": (256, 192), "16:9": (256, 144)}
+
+
+def _vertex_model_factory(project_id, location, model_name):
+    import vertexai
+    from vertexai.preview.vision_models import ImageGenerationModel
+    vertexai.init(project=project_id, location=location)
+    return ImageGenerationModel.from_pretrained(model_name)
+
+
+def encode_png(width, height, rgb_rows):
+    """
+    Minimal PNG encoder for 8-bit RGB rows (bytes of length 3 * width each).
+    """
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+    raw = b''.join(b'\x00' + row for row in rgb_rows)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b'')
+
+
+class _FakeImage:
+    def __init__(self, image_bytes):
+        self._image_bytes = image_bytes
+
+
+class FakeImageGenerationModel:
+    """
+    Local stand-in for ImageGenerationModel: returns a gradient PNG derived from the prompt,
+    after `latency` seconds, with the dimensions of the requested aspect ratio.
+    """
+    def __init__(self, latency=0.5):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_images(self, prompt, number_of_images=1, aspect_ratio="1:1", seed=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        width, height = FAKE_SIZES.get(aspect_ratio, FAKE_SIZES["1:1"])
+        images = []
+        for index in range(number_of_images):
+            digest = hashlib.sha256(f"{prompt}\0{seed}\0{index}".encode('utf-8')).digest()
+            top, bottom = digest[:3], digest[3:6]
+            rows = []
+            for y in range(height):
+                pixel = bytes(top[c] + (bottom[c] - top[c]) * y // max(1, height - 1) for c in range(3))
+                rows.append(pixel * width)
+            images.append(_FakeImage(encode_png(width, height, rows)))
+        return images
+
+
+class ImagenClient:
+    """
+    A shared, thread-safe handle on one Imagen model.
+    """
+    def __init__(self, model):
+        self.model = model
+
+    def generate(self, prompt, aspect_ratio="1:1", number_of_images=1, seed=None):
+        """
+        Returns a list of PNG byte strings. With a `seed` the same prompt renders the same image
+        (Imagen only accepts a seed for unwatermarked images).
+        """
+        options = {} if seed is None else {'seed': seed, 'add_watermark': False}
+        images = self.model.generate_images(prompt=prompt, number_of_images=number_of_images, aspect_ratio=aspect_ratio, **options)
+        return [image._image_bytes for image in images]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_model_factory = _vertex_model_factory
+
+
+def set_model_factory(factory):
+    """
+    Replaces how model handles are built, e.g. `set_model_factory(lambda *_: FakeImageGenerationModel())`
+    to run everything offline. Clears the handles built so far.
+    """
+    global _model_factory
+    with _clients_lock:
+        _model_factory = factory
+        _clients.clear()
+
+
+def get_imagen_client(project_id, location=LOCATION, model_name=IMAGEN_MODEL):
+    """
+    Returns the process-wide client for (project, location, model), creating it on first use.
+    """
+    key = (project_id, location, model_name)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = ImagenClient(_model_factory(project_id, location, model_name))
+                _clients[key] = client
+    return client
+
+
+# IMAGEN_FAKE=1 runs the apps against the local fake model
+if os.environ.get('IMAGEN_FAKE') == '1':
+    set_model_factory(lambda *_: FakeImageGenerationModel())
@@ -0,0 +1,125 @@
+import copy
+import os
+from crewai import LLM
+
+# --- LLM LAYER ---
+# Every agent talks to its model through crewai's LLM.call(). LLMMiddleware wraps an LLM and
+# forwards everything to it, so behaviour (recording, caching, ...) can be stacked below the
+# agents without touching the agent definitions:
+#
+#   wrap_crew_llms(crew, lambda llm, agent: CassetteLLM(llm, cassette, agent.role))
+#
+# Agent classes get their model from build_llm(), which stacks the shared layers.
+#
+# LLM objects are shared (by the agents of a crew, by template copies of it, by concurrent runs),
+# so a wrapper that needs other settings for one call (apply_budget's token caps) passes them in
+# the call's kwargs rather than setting them on the object; the layer above the plain crewai LLM
+# applies them to a private copy of it.
+
+PER_CALL_SETTINGS = ('max_tokens', 'stop')
+
+
+def as_llm(llm):
+    """
+    A crewai LLM for whatever an agent was given: an LLM, a model name, or a LangChain chat
+    model such as ChatOpenAI (crewai converts those the same way).
+    """
+    if isinstance(llm, LLM):
+        return llm
+    if isinstance(llm, str):
+        return LLM(model=llm)
+    model = getattr(llm, 'model_name', None) or getattr(llm, 'model', None)
+    return LLM(model=model, temperature=getattr(llm, 'temperature', None))
+
+
+def call_llm(llm, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+    """
+    llm.call() with per-call settings (PER_CALL_SETTINGS) from kwargs: wrappers receive them as
+    kwargs, a plain crewai LLM on a copy of itself.
+    """
+    if not isinstance(llm, LLMMiddleware):
+        settings = {name: kwargs.pop(name) for name in PER_CALL_SETTINGS if name in kwargs}
+        if settings:
+            llm = copy.copy(llm)
+            for name, value in settings.items():
+                setattr(llm, name, value)
+    return llm.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs)
+
+
+class LLMMiddleware(LLM):
+    """
+    Base class for wrappers: delegates every call to `inner`. Subclasses override call().
+    """
+    def __init__(self, inner):
+        self.inner = as_llm(inner)
+        self._forwarding = False
+        super().__init__(model=self.inner.model, temperature=getattr(self.inner, 'temperature', None))
+        self._forwarding = True
+
+    # The agent executor sets stop words on the LLM it holds; they belong to the wrapped model,
+    # as does max_tokens. LLM.__init__ assigns defaults to both, which must not reset the wrapped
+    # model's values.
+    @property
+    def stop(self):
+        return self.inner.stop
+
+    @stop.setter
+    def stop(self, value):
+        if self._forwarding:
+            self.inner.stop = value
+
+    @property
+    def max_tokens(self):
+        return getattr(self.inner, 'max_tokens', None)
+
+    @max_tokens.setter
+    def max_tokens(self, value):
+        if self._forwarding:
+            self.inner.max_tokens = value
+
+    def setting(self, name, kwargs):
+        """
+        The value of a per-call setting for this call: from its kwargs, else the model's own.
+        """
+        return kwargs[name] if name in kwargs else getattr(self, name)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        return call_llm(self.inner, messages, tools, callbacks, available_functions, **kwargs)
+
+    def supports_function_calling(self):
+        return self.inner.supports_function_calling()
+
+    def supports_stop_words(self):
+        return self.inner.supports_stop_words()
+
+    def get_context_window_size(self):
+        return self.inner.get_context_window_size()
+
+
+def wrap_crew_llms(crew, wrap):
+    """
+    Replaces every agent's LLM with wrap(llm, agent), in place. Returns the crew.
+    """
+    for agent in crew.agents:
+        agent.llm = wrap(as_llm(agent.llm), agent)
+    return crew
+
+
+def build_llm(model, temperature=None, crew=None, hedge=None, hedge_fallbacks=None, **kwargs):
+    """
+    The LLM for an agent of `crew`: optionally hedged against slow calls (hedge=True or
+    LLM_HEDGE=1), prompts reordered and marked for provider-side prefix caching (disable with
+    PREFIX_CACHE=0), with the shared response cache in front (disable with LLM_CACHE=0).
+    """
+    llm = LLM(model=model, temperature=temperature, **kwargs)
+    if hedge if hedge is not None else os.environ.get('LLM_HEDGE', '0') == '1':
+        from hedging import HedgedLLM, hedge_fallbacks as fallback_models
+        fallbacks = [LLM(model=name, temperature=temperature, **kwargs) for name in fallback_models(model, hedge_fallbacks)]
+        llm = HedgedLLM(llm, fallbacks)
+    if os.environ.get('PREFIX_CACHE', '1') != '0':
+        from prefix_cache import PrefixCachingLLM
+        llm = PrefixCachingLLM(llm)
+    if os.environ.get('LLM_CACHE', '1') != '0':
+        from response_cache import CachedLLM, default_response_cache
+        llm = CachedLLM(llm, default_response_cache(), crew)
+    return llm
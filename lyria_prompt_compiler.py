@@ -0,0 +1,175 @@
+import os
+import re
+import uuid
+from datetime import datetime
+
+# --- LYRIA PROMPT COMPILER ---
+# Turns the songwriter's lyrics and the arranger's guide into the final Lyria prompt with
+# plain templates, so the last stage of the music crew needs no LLM round-trip.
+
+RUNS_DIR = 'runs'
+
+# Matches section labels such as "Verse 1", "**Chorus**", "[Bridge]", "## Pre-Chorus:", "(Outro)"
+# or "Verse 1 (Intro)"
+SECTION_LABEL = re.compile(
+    r'^\s*(?:#+\s*)?[\[\(\*_]*\s*'
+    r'(intro|verse(?:\s*\d+)?|pre[- ]?chorus|chorus|refrain|hook|bridge|tag|outro|interlude)'
+    r'(?:\s*\d+)?\s*(?:[-–]\s*[^\n\]\)]*|\([^)\n]*\))?\s*[\]\)\*_:]*\s*$',
+    re.IGNORECASE
+)
+
+# How the arrangement should feel in each kind of section
+SECTION_FEEL = {
+    'intro': 'Open with {lead} alone, setting the {mood_word} atmosphere.',
+    'verse': 'Keep the verse sparse and intimate, carried by {lead} and a restrained rhythm section.',
+    'pre-chorus': 'Build tension in the pre-chorus by adding {second} and lifting the dynamics.',
+    'chorus': 'The chorus opens up into the full arrangement with {instruments}, big and memorable.',
+    'hook': 'The hook sits on top of the full groove with {instruments}.',
+    'bridge': 'Drop down for the bridge, strip back to {lead}, then build into the final chorus.',
+    'tag': 'Repeat the last line as a tag over a gentle groove.',
+    'interlude': 'An instrumental interlude featuring {second}.',
+    'outro': 'Close with a soft outro, fading out on {lead}.',
+}
+
+# Words that can stand alone as the feel of an intro ("setting the {mood_word} atmosphere"); the
+# first one the arrangement's mood text uses is taken, nouns mapped to their adjective
+MOOD_WORDS = {word: word for word in (
+    'intimate', 'sparse', 'contemplative', 'reflective', 'reverent', 'warm', 'aching', 'tender',
+    'bright', 'celebratory', 'joyful', 'festive', 'uplifting', 'upbeat', 'positive', 'danceable',
+    'gritty', 'soulful', 'raw', 'melancholic', 'dark', 'moody', 'confident', 'laid-back',
+    'anthemic', 'powerful', 'energetic', 'driving',
+)}
+MOOD_WORDS.update({'celebration': 'celebratory', 'joy': 'joyful', 'energy': 'energetic', 'warmth': 'warm',
+                   'reverence': 'reverent', 'reflection': 'reflective', 'melancholy': 'melancholic'})
+DEFAULT_MOOD_WORD = 'intimate'
+
+
+def section_kind(label):
+    """
+    Maps a section label ("Verse 2", "Refrain", ...) to a SECTION_FEEL key.
+    """
+    lowered = label.lower().replace(' ', '-')
+    if lowered.startswith('pre'):
+        return 'pre-chorus'
+    if lowered.startswith('refrain'):
+        return 'chorus'
+    return re.sub(r'[-\d]+$', '', lowered) or 'verse'
+
+
+def parse_song_sections(song_text):
+    """
+    Splits the songwriter's output into a list of (label, lyrics) tuples in song order.
+    A bare repeat marker (a second "(Chorus)" with no lines under it) comes back as the section
+    again with the lyrics of the first section of that label, or failing that of that kind.
+    Text before the first recognised label (titles, notes) is dropped; lyrics without any
+    recognised label come back as a single 'Verse' holding the whole song.
+    """
+    sections = []
+
+    def close(label, lines):
+        lyrics = '\n'.join(l for l in lines if l.strip())
+        if not lyrics:
+            earlier = (next((text for name, text in sections if name == label), None)
+                       or next((text for name, text in sections if section_kind(name) == section_kind(label)), None))
+            if earlier is None:
+                return
+            lyrics = earlier
+        sections.append((label, lyrics))
+
+    label, lines = None, []
+    for line in song_text.splitlines():
+        match = SECTION_LABEL.match(line)
+        if match:
+            if label:
+                close(label, lines)
+            label, lines = match.group(1).title(), []
+        elif label:
+            lines.append(line.strip().strip('*_'))
+    if label:
+        close(label, lines)
+    if not sections and song_text.strip():
+        sections.append(('Verse', '\n'.join(l.strip() for l in song_text.splitlines() if l.strip())))
+    return sections
+
+
+def mood_word(mood):
+    """
+    The first of MOOD_WORDS in the mood text, or DEFAULT_MOOD_WORD.
+    """
+    words = re.findall(r"[a-z][a-z'-]*", (mood or '').lower())
+    return next((MOOD_WORDS[word] for word in words if word in MOOD_WORDS), DEFAULT_MOOD_WORD)
+
+
+def parse_arrangement(guide):
+    """
+    Returns {'genre', 'tempo', 'mood', 'instrumentation'} from either a structured guide of the
+    arrangement library or the free-text Musical Arrangement Guide written by the arranger agent.
+    """
+    if 'text' not in guide:
+        return guide
+
+    text = guide['text']
+    def field(pattern):
+        match = re.search(rf'{pattern}[^:\n]*:\**\s*(.+)', text, re.IGNORECASE)
+        return match.group(1).strip().strip('*') if match else ''
+
+    instrumentation = []
+    block = re.search(r'instrumentation[^:\n]*:\**\s*\n((?:\s*[-*\d.]+\s+.+\n?)+)', text, re.IGNORECASE)
+    if block:
+        for line in block.group(1).splitlines():
+            item = re.sub(r'^\s*[-*\d.]+\s+', '', line).strip().strip('*')
+            if item:
+                instrumentation.append(re.split(r':\**\s', item)[0].strip('*'))
+    elif field('instrumentation'):
+        instrumentation = [item.strip() for item in field('instrumentation').split(',')]
+
+    return {
+        'genre': guide.get('genre', ''),
+        'tempo': field('tempo'),
+        'mood': field('mood'),
+        'instrumentation': instrumentation,
+    }
+
+
+def compile_lyria_prompt(genre, sections, arrangement):
+    """
+    Renders the final Lyria prompt from parsed song sections and a parsed arrangement.
+    """
+    instruments = arrangement['instrumentation'] or ['full band']
+    lead = instruments[0]
+    second = instruments[1] if len(instruments) > 1 else instruments[0]
+    values = {
+        'lead': lead,
+        'second': second,
+        'instruments': ', '.join(instruments),
+        'mood_word': mood_word(arrangement['mood']),
+    }
+
+    overview = [f"A {genre} song."]
+    if arrangement['tempo']:
+        overview.append(f"Tempo and rhythm: {arrangement['tempo'].rstrip('.')}.")
+    if arrangement['mood']:
+        overview.append(f"Mood and dynamics: {arrangement['mood'].rstrip('.')}.")
+    overview.append(f"Instrumentation: {', '.join(instruments)}.")
+
+    parts = [' '.join(overview)]
+    for label, lyrics in sections:
+        feel = SECTION_FEEL.get(section_kind(label), SECTION_FEEL['verse']).format(**values)
+        parts.append(f"[{label}] {feel}\n{lyrics}")
+    return '\n\n'.join(parts) + '\n'
+
+
+def new_run_id():
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def write_prompt_artifact(prompt, run_id, filename='lyria_prompt.txt'):
+    """
+    Writes the prompt into this run's artifact directory (runs/<run_id>/) and returns its path.
+    """
+    run_dir = os.path.join(RUNS_DIR, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, filename)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(prompt)
+    return path
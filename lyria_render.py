@@ -0,0 +1,210 @@
+import asyncio
+import base64
+import hashlib
+import math
+import os
+import queue
+import struct
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# --- LYRIA AUDIO RENDER PIPELINE ---
+# Takes the final Lyria prompt to audio. Backends are pluggable and asynchronous: they yield
+# the WAV file in chunks as it becomes available, so the UI can start playing and showing
+# progress long before a render finishes. Finished renders are cached by content address.
+
+AUDIO_CACHE_DIR = os.path.join('runs', 'audio_cache')
+LOCATION = "us-central1"
+SAMPLE_RATE = 48000
+
+
+def wav_header(data_size, sample_rate=SAMPLE_RATE, channels=2, bits=16):
+    """
+    A 44-byte PCM WAV header for `data_size` bytes of audio.
+    """
+    block_align = channels * bits // 8
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, 1, channels,
+        sample_rate, sample_rate * block_align, block_align, bits, b'data', data_size
+    )
+
+
+class AudioBackend(ABC):
+    """
+    Base class for render backends. `render` is an async generator of WAV byte chunks;
+    the concatenation of all chunks is the complete file.
+    """
+    name = 'base'
+
+    @abstractmethod
+    def render(self, prompt):
+        ...
+
+
+class FakeAudioBackend(AudioBackend):
+    """
+    Offline stand-in that synthesizes a short chord progression derived from the prompt,
+    with a configurable render latency, for testing and benchmarking the pipeline.
+    """
+    name = 'fake'
+
+    def __init__(self, seconds=8.0, chunk_seconds=1.0, render_speed=4.0, sample_rate=22050):
+        self.seconds = seconds
+        self.chunk_seconds = chunk_seconds
+        # How many seconds of audio are "rendered" per wall-clock second
+        self.render_speed = render_speed
+        self.sample_rate = sample_rate
+
+    def _chord(self, prompt):
+        seed = int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:4], 'little')
+        root = 196.0 * 2 ** ((seed % 12) / 12)
+        return [root, root * 2 ** (4 / 12), root * 2 ** (7 / 12)]
+
+    def _samples(self, chord, start, count):
+        frames = bytearray()
+        for n in range(start, start + count):
+            t = n / self.sample_rate
+            value = sum(math.sin(2 * math.pi * f * t) for f in chord) / len(chord)
+            sample = int(value * 0.3 * 32767)
+            frames += struct.pack('<hh', sample, sample)
+        return bytes(frames)
+
+    async def render(self, prompt):
+        chord = self._chord(prompt)
+        total_frames = int(self.seconds * self.sample_rate)
+        chunk_frames = int(self.chunk_seconds * self.sample_rate)
+        yield wav_header(total_frames * 4, self.sample_rate)
+        for start in range(0, total_frames, chunk_frames):
+            count = min(chunk_frames, total_frames - start)
+            await asyncio.sleep(count / self.sample_rate / self.render_speed)
+            yield self._samples(chord, start, count)
+
+
+class VertexLyriaBackend(AudioBackend):
+    """
+    Renders with Lyria on Vertex AI. The predict call returns the whole clip at once,
+    which is then handed on in chunks.
+    """
+    name = 'lyria-002'
+
+    def __init__(self, project_id, location=LOCATION, model="lyria-002", chunk_size=256 * 1024):
+        from google.cloud import aiplatform_v1
+        self._aiplatform = aiplatform_v1
+        self.client = aiplatform_v1.PredictionServiceAsyncClient(
+            client_options={"api_endpoint": f"{location}-aiplatform.googleapis.com"}
+        )
+        self.endpoint = f"projects/{project_id}/locations/{location}/publishers/google/models/{model}"
+        self.chunk_size = chunk_size
+
+    async def render(self, prompt):
+        from google.protobuf import json_format, struct_pb2
+        instance = json_format.ParseDict({"prompt": prompt}, struct_pb2.Value())
+        response = await self.client.predict(endpoint=self.endpoint, instances=[instance])
+        audio = base64.b64decode(response.predictions[0]["bytesBase64Encoded"])
+        for start in range(0, len(audio), self.chunk_size):
+            yield audio[start:start + self.chunk_size]
+
+
+class AudioCache:
+    """
+    Content-addressed store of finished renders: identical (backend, prompt) pairs are
+    rendered once and served from disk afterwards.
+    """
+    def __init__(self, directory=AUDIO_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(backend, prompt):
+        return hashlib.sha256(f"{backend.name}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.wav')
+
+    def get(self, key):
+        path = self.path(key)
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                return file.read()
+        return None
+
+    def put(self, key, audio):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(audio)
+        os.replace(tmp_path, self.path(key))
+        return self.path(key)
+
+
+async def render_audio(prompt, backend, cache=None, on_chunk=None):
+    """
+    Renders `prompt` and returns the complete WAV bytes. `on_chunk(chunk, done)` is called
+    with every new chunk and finally with (b'', True); a cache hit calls it once with the
+    finished file. Concatenating the chunks gives the file either way.
+    """
+    cache = cache or AudioCache()
+    key = AudioCache.key(backend, prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        if on_chunk:
+            on_chunk(cached, True)
+        return cached
+
+    audio = bytearray()
+    async for chunk in backend.render(prompt):
+        audio += chunk
+        if on_chunk:
+            on_chunk(chunk, False)
+    audio = bytes(audio)
+    cache.put(key, audio)
+    if on_chunk:
+        on_chunk(b'', True)
+    return audio
+
+
+def stream_audio(prompt, backend, cache=None):
+    """
+    Synchronous wrapper for Streamlit: runs the render on a background event loop and yields
+    (chunk, done) as chunks arrive, so the caller can refresh st.audio in place.
+    """
+    updates = queue.Queue()
+    failure = []
+
+    def run():
+        try:
+            asyncio.run(render_audio(prompt, backend, cache, lambda audio, done: updates.put((audio, done))))
+        except Exception as e:
+            failure.append(e)
+        finally:
+            updates.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    while (update := updates.get()) is not None:
+        yield update
+    if failure:
+        raise failure[0]
+
+
+async def benchmark(prompts, backend, cache):
+    """
+    Renders all prompts concurrently twice (cold, then from cache) and returns both wall times.
+    """
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        await asyncio.gather(*(render_audio(prompt, backend, cache) for prompt in prompts))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+if __name__ == '__main__':
+    # Offline benchmark with the fake backend: python lyria_render.py [number_of_prompts]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    with tempfile.TemporaryDirectory() as directory:
+        backend = FakeAudioBackend()
+        cold, warm = asyncio.run(benchmark([f"Benchmark prompt {i}" for i in range(count)], backend, AudioCache(directory)))
+    print(f"{count} renders of {backend.seconds:.0f}s audio: cold {cold:.2f}s, cached {warm * 1000:.1f}ms")
@@ -1,9 +1,18 @@
 import os
+import tempfile
+import time
 from crewai import Agent, Task, Crew, Process
 from crewai_tools import SerperDevTool
-from langchain_openai import ChatOpenAI
+from llm_layer import build_llm
 from dotenv import load_dotenv
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from crew_budgets import CREW_BUDGETS, crew_budget, run_with_budget
+from feed_wire import feed_wire_items, format_items
+from artifact_store import default_artifact_store
+from edition_store import default_edition_store, edition_key, is_stale, slice_fingerprint, wire_digest
+from output_validators import GUARDRAIL_RETRIES, guardrail, has_headline_and_byline, max_words, min_headings, min_words
+from wire_clustering import cluster_items, format_slice, parse_wire_items, partition_by_city, route_clusters
 
 # Load environment variables
 load_dotenv()
@@ -18,7 +27,7 @@ class NewsAgents:
     A class to encapsulate the definitions of all agents in our AI newsroom.
     """
     def __init__(self):
-        self.llm = ChatOpenAI(model_name="gpt-4o", temperature=0.7)
+        self.llm = build_llm("gpt-4o", temperature=0.7, crew='newspaper')
 
     def managing_editor(self):
         return Agent(
@@ -82,7 +91,36 @@ class NewsTasks:
             agent=agent
         )
 
-    def reporting_task(self, agent, topic, scope, context):
+    def regional_fetch_news_task(self, agent, country, cities):
+        # One fetch that serves the national edition and every city edition of the batch
+        return Task(
+            description=f"""
+                Fetch the most recent and significant news stories for {country} as a whole and for each of these cities: {', '.join(cities)}.
+                The current date is {datetime.now().strftime('%Y-%m-%d')}. Your information must be as up-to-date as possible.
+                Cover a wide range of topics including general news, politics, business, technology, sports, and culture,
+                with several local stories for every city.
+                For each story give its headline, URL source, a one-sentence summary, and its location:
+                the city name if it is a local story for one of the cities above, otherwise "{country}".
+            """,
+            expected_output=(
+                "A numbered list of current news stories. Each entry has the lines 'Headline:', 'Source:' (a URL), "
+                "'Summary:' (one sentence) and 'Location:' (a city from the list or the country)."
+            ),
+            agent=agent
+        )
+
+    def reporting_task(self, agent, topic, scope, context, wire_slice=None):
+        # With a wire_slice (the pre-clustered stories for this beat) the reporter reads only that
+        # slice instead of the full wire context
+        if wire_slice is not None:
+            source_note = f"""
+                Stories from today's news wire (near-duplicate reports are already merged, with all their sources):
+
+                {wire_slice}
+            """
+            context = []
+        else:
+            source_note = "Base your article strictly on the information from the news wire context."
         return Task(
             description=f"""
                 Using the provided news wire data, identify the single most important story related to your beat: '{topic}'.
@@ -93,17 +131,25 @@ class NewsTasks:
                 2.  A byline with your role (e.g., "By the Financial Reporter").
                 3.  A 2-3 paragraph body summarizing the key information (who, what, when, where, why).
                 
-                Ensure your writing style is objective, clear, and engaging. Base your article strictly on the information from the news wire context.
+                Ensure your writing style is objective, clear, and engaging. {source_note}
             """,
             expected_output="A well-formatted news article with a headline, byline, and a 2-3 paragraph body.",
             agent=agent,
-            context=context
+            context=context,
+            guardrail=guardrail(has_headline_and_byline, min_words(100), max_words(700)),
+            max_retries=GUARDRAIL_RETRIES
         )
 
-    def editing_task(self, agent, context):
+    def editing_task(self, agent, context, articles=None, output_file='final_newspaper.md'):
+        # articles: {section: article text} handed over directly, e.g. articles kept from the previous edition
+        drafted = ''
+        if articles:
+            drafted = "\n\n".join(f"--- {topic} ---\n{article}" for topic, article in articles.items())
+            drafted = f"\n                The drafted articles, by section:\n\n{drafted}\n"
+            context = []
         return Task(
-            description="""
-                Review all the drafted articles from the specialist reporters.
+            description=f"""
+                Review all the drafted articles from the specialist reporters.{drafted}
                 Assemble them into a single, cohesive newspaper format.
                 The final output should be a single block of text, formatted in Markdown.
                 
@@ -116,7 +162,10 @@ class NewsTasks:
             expected_output="A single, well-formatted Markdown document containing the complete newspaper with all its articles.",
             agent=agent,
             context=context,
-            output_file='final_newspaper.md'
+            output_file=output_file,
+            # One "## Section" heading per article
+            guardrail=guardrail(min_headings(len(articles) if articles else 1, level=2)),
+            max_retries=GUARDRAIL_RETRIES
         )
 
 # --- CREW SETUP ---
@@ -157,8 +206,186 @@ def create_newspaper_crew(scope, location, topics):
     )
 
     return crew
+
+# --- STAGED EDITION (concurrent reporters) ---
+
+# Reporters writing at the same time; keeps LLM and search rate limits in check
+MAX_CONCURRENT_REPORTERS = 3
+# Editions of a city batch built at the same time (each runs its own reporters)
+MAX_CONCURRENT_EDITIONS = 2
+LOCAL_CITIES = ["Berlin", "Hamburg", "Munich", "Cologne", "Frankfurt"]
+
+
+def run_fetch(fetch_task, budget):
+    crew = Crew(agents=[fetch_task.agent], tasks=[fetch_task], process=Process.sequential, verbose=2)
+    return run_with_budget(crew, budget.child(max_final_tokens=None))['output']
+
+
+def write_edition(path, newspaper):
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        file.write(newspaper)
+    os.replace(tmp_path, path)
+
+
+def build_edition(scope, location, topics, items, wire_text, max_concurrent_reporters=MAX_CONCURRENT_REPORTERS,
+                  incremental=True, store=None, output_file='final_newspaper.md', budget=None, artifacts=None):
+    """
+    Everything after the wire fetch for one edition: local deduplication and routing of the
+    wire items, the reporters (concurrently, each on its own slice) and the managing editor.
+
+    With incremental=True the previous run of the same edition is reused: only sections whose
+    stories are new or materially changed are re-reported, and if none are, the stored newspaper
+    is returned without running the editor.
+
+    Every crew runs under a child of `budget` (default: the 'newspaper' crew budget). An article
+    cut short by its budget is used for this edition but not kept for the next refresh.
+
+    Every newly edited newspaper is also recorded in the artifact store (default: the shared one),
+    with its section articles, so earlier editions can be found again.
+
+    Returns {'newspaper': Markdown, 'rewritten': the re-reported topics, 'reason': why a budget
+    cut the editor or a reporter short, or None}; the newspaper is also written to `output_file`,
+    whether or not the editor ran.
+    """
+    started = time.time()
+    agents = NewsAgents()
+    tasks = NewsTasks()
+    budget = budget or crew_budget('newspaper')
+    store = store or default_edition_store()
+    key = edition_key(scope, location, topics)
+    previous = store.load(key) if incremental else {}
+    sections = previous.get('sections', {})
+
+    # Merge near-duplicate stories locally and give every beat only its own clusters. A beat with
+    # no routed stories gets all of the edition's stories (or the raw wire if it could not be parsed).
+    clusters = cluster_items(items)
+    slices = route_clusters(clusters, topics)
+    full_wire = format_slice(clusters) if clusters else wire_text
+    digest = wire_digest(full_wire)
+    stale = [topic for topic in topics if is_stale(sections.get(topic), slices.get(topic), digest)]
+
+    # Reporters work in parallel, each in its own single-task crew
+    reporters = {topic: agents.specialist_reporter(topic, scope) for topic in topics}
+
+    def report(topic):
+        wire_slice = format_slice(slices[topic]) if slices.get(topic) else full_wire
+        task = tasks.reporting_task(reporters[topic], topic, scope, [], wire_slice=wire_slice)
+        # A reporter's article is not the edition's final document: the per-call cap applies
+        crew = Crew(agents=[reporters[topic]], tasks=[task], process=Process.sequential, verbose=2)
+        return run_with_budget(crew, budget.child(max_final_tokens=None))
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrent_reporters, len(stale)))) as executor:
+            fresh = dict(zip(stale, executor.map(report, stale)))
+    else:
+        fresh = {}
+    articles = {topic: sections[topic]['article'] for topic in topics if topic not in fresh}
+    reason = next((outcome['reason'] for outcome in fresh.values() if not outcome['complete']), None)
+    for topic, outcome in fresh.items():
+        articles[topic] = outcome['output']
+        if outcome['complete']:
+            sections[topic] = {'clusters': slice_fingerprint(slices.get(topic) or []), 'wire_digest': digest, 'article': outcome['output']}
+        else:
+            sections.pop(topic, None)
+
+    # The editor assembles the final newspaper; reporters stay available for delegation.
+    # Nothing re-reported means the previous newspaper still stands.
+    newspaper = previous.get('newspaper')
+    if fresh or not newspaper:
+        editor = agents.managing_editor()
+        editing_task = tasks.editing_task(
+            editor, [], articles={topic: articles[topic] for topic in topics}, output_file=output_file
+        )
+        crew = Crew(
+            agents=[editor] + list(reporters.values()),
+            tasks=[editing_task],
+            process=Process.sequential,
+            verbose=2
+        )
+        # The editor's delegations to reporters count against the edition's budget
+        outcome = run_with_budget(crew, budget.child())
+        newspaper = outcome['output'] or "\n\n".join(articles[topic] for topic in topics)
+        (artifacts or default_artifact_store()).record(
+            'newspaper', {'scope': scope, 'location': location or '', 'topics': list(topics)}, newspaper,
+            title=f"{location or scope} edition, {time.strftime('%Y-%m-%d %H:%M')}", models=[agents.llm.model],
+            started=started, status='done' if outcome['complete'] else 'partial',
+            tasks=[(f"{topic} reporter", topic, articles[topic]) for topic in topics]
+        )
+        if not outcome['complete']:
+            # Not kept as the stored newspaper, so the next refresh runs the editor again
+            store.save(key, {'sections': sections, 'newspaper': None})
+            write_edition(output_file, newspaper)
+            return {'newspaper': newspaper, 'rewritten': stale, 'reason': outcome['reason']}
+
+    store.save(key, {'sections': sections, 'newspaper': newspaper})
+    write_edition(output_file, newspaper)
+    return {'newspaper': newspaper, 'rewritten': stale, 'reason': reason}
+
+
+def run_newspaper_edition(scope, location, topics, max_concurrent_reporters=MAX_CONCURRENT_REPORTERS, incremental=True, store=None,
+                          wire_source='search', budget=None, artifacts=None, output_file='final_newspaper.md'):
+    """
+    Builds an edition in stages: one wire fetch, then build_edition (deduplication, concurrent
+    reporters, editor). Wall time is roughly fetch + slowest reporter + editor instead of the
+    sum of all reporters.
+    wire_source='feeds' reads the wire from RSS/Atom feeds instead of the search agent, falling
+    back to the agent if the feeds yield nothing.
+    Returns build_edition's {'newspaper', 'rewritten', 'reason'}; the newspaper is also written
+    to `output_file`.
+    """
+    budget = budget or crew_budget('newspaper')
+    if wire_source == 'feeds':
+        items = feed_wire_items(scope, location)
+        if items:
+            return build_edition(scope, location, topics, items, format_items(items), max_concurrent_reporters, incremental, store,
+                                 output_file, budget=budget, artifacts=artifacts)
+
+    agents = NewsAgents()
+    tasks = NewsTasks()
+    wire_text = run_fetch(tasks.fetch_news_task(agents.news_wire_service(), scope, location), budget)
+    return build_edition(scope, location, topics, parse_wire_items(wire_text), wire_text,
+                         max_concurrent_reporters, incremental, store, output_file, budget=budget, artifacts=artifacts)
+
+
+def run_city_editions(topics, country="Germany", cities=LOCAL_CITIES, max_concurrent_editions=MAX_CONCURRENT_EDITIONS,
+                      max_concurrent_reporters=MAX_CONCURRENT_REPORTERS, incremental=True, store=None, wire_source='search',
+                      budget=None):
+    """
+    The morning batch: the national edition plus one local edition per city, all from a single
+    wire fetch. The wire is split locally by city; stories not tied to a city go to the national
+    edition. Returns {edition name: newspaper Markdown}, the national edition first; each edition
+    is also written to final_newspaper_<name>.md. A city with no stories on the wire gets a short
+    note instead of an edition written from other cities' news. All editions share one budget.
+    """
+    budget = budget or crew_budget('newspaper', deadline=CREW_BUDGETS['newspaper']['deadline'] * 2)
+    items = feed_wire_items("National", country, cities=cities) if wire_source == 'feeds' else []
+    if items:
+        wire_text = format_items(items)
+    else:
+        agents = NewsAgents()
+        tasks = NewsTasks()
+        wire_text = run_fetch(tasks.regional_fetch_news_task(agents.news_wire_service(), country, cities), budget)
+        items = parse_wire_items(wire_text)
+    partitions = partition_by_city(items, cities, country)
+
+    editions = [("National", country, partitions[None])] + [("Local", city, partitions[city]) for city in cities if partitions[city]]
+
+    def build(edition):
+        scope, location, items = edition
+        return build_edition(scope, location, topics, items, wire_text, max_concurrent_reporters, incremental, store,
+                             output_file=f"final_newspaper_{location.lower()}.md", budget=budget.child())['newspaper']
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrent_editions, len(editions)))) as executor:
+        newspapers = dict(zip((location for _, location, _ in editions), executor.map(build, editions)))
+    for city in cities:
+        newspapers.setdefault(city, f"_No {city} stories on the wire this time, so no local edition was written._")
+    return {location: newspapers[location] for location in [country] + list(cities)}
+
 import streamlit as st
-from newspaper_crew import create_newspaper_crew
+from newspaper_crew import LOCAL_CITIES, run_city_editions, run_newspaper_edition
+from artifact_store import default_artifact_store
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -181,14 +408,22 @@ scope_options = ["Global", "National", "Local"]
 scope = st.selectbox("**Select Newspaper Scope:**", scope_options)
 
 location = ""
+city_batch = False
 if scope == "Local":
-    location = st.selectbox("Select City:", ["Berlin", "Hamburg", "Munich", "Cologne", "Frankfurt"])
+    city_batch = st.toggle("Morning batch: every city plus the national edition from one shared wire fetch")
+    if not city_batch:
+        location = st.selectbox("Select City:", LOCAL_CITIES)
 elif scope == "National":
     location = st.text_input("Enter Country:", "Germany")
 
 st.markdown("**Select the sections to include in your newspaper:**")
 topic_options = ["Top Story", "Business & Stock Market", "Sports", "Technology", "Fashion & Trends"]
 selected_topics = [topic for topic in topic_options if st.checkbox(topic, True)]
+incremental = st.toggle("Refresh the last edition (re-report only new or changed stories)", value=True)
+wire_source = st.radio(
+    "**News wire source:**", ['search', 'feeds'], horizontal=True,
+    format_func=lambda source: {'search': "Web search agent", 'feeds': "RSS/Atom feeds (no LLM)"}[source]
+)
 
 
 # --- Crew Execution ---
@@ -200,28 +435,50 @@ if st.button("Assemble Today's Newspaper"):
     else:
         with st.spinner("Your AI Newsroom is on the story... This will take a few minutes."):
             try:
-                # Create and run the crew
-                newspaper_creation_crew = create_newspaper_crew(scope, location, selected_topics)
-                result = newspaper_creation_crew.kickoff()
+                if city_batch:
+                    # One fetch for all six editions, split by city locally
+                    editions = run_city_editions(selected_topics, incremental=incremental, wire_source=wire_source)
+                    st.success("All editions are ready!")
+                    for tab, (name, newspaper) in zip(st.tabs(list(editions)), editions.items()):
+                        with tab:
+                            st.subheader(f"The {name} Times")
+                            st.markdown(newspaper)
+                else:
+                    # Fetch once, report concurrently, then edit
+                    edition = run_newspaper_edition(scope, location, selected_topics, incremental=incremental, wire_source=wire_source)
+                    final_output, rewritten = edition['newspaper'], edition['rewritten']
 
-                st.success("Today's edition is ready!")
-                st.balloons()
-                
-                st.subheader(f"The {location if location else scope} Times")
-                
-                # Read the final newspaper from the output file
-                try:
-                    with open('final_newspaper.md', 'r', encoding='utf-8') as file:
-                        final_output = file.read()
+                    st.success("Today's edition is ready!")
+                    if incremental:
+                        st.caption(f"Re-reported: {', '.join(rewritten)}" if rewritten else "No story changed since the last edition.")
+                    st.balloons()
+
+                    st.subheader(f"The {location if location else scope} Times")
                     st.markdown(final_output)
-                except FileNotFoundError:
-                    st.error("The final newspaper file was not found. Displaying raw result instead.")
-                    st.write(result)
 
             except Exception as e:
                 st.error(f"An error occurred while running the AI crew: {e}")
                 st.error("Please check your API keys and network connection.")
 
+# --- Archive ---
+# Every edition is kept in the artifact store
+with st.expander("🗄️ Earlier editions"):
+    archive_query = st.text_input("Search all editions:", placeholder="e.g. Berlin transport strike")
+    if archive_query:
+        earlier = default_artifact_store().search(archive_query, crew='newspaper')
+    else:
+        earlier = default_artifact_store().find('newspaper', statuses=('done', 'partial'), limit=10,
+                                                **({'location': location} if location else {'scope': scope}))
+    if not earlier:
+        st.write("No earlier editions found.")
+    for edition in earlier:
+        with st.container(border=True):
+            st.markdown(f"**{edition['title']}**")
+            if edition.get('snippet'):
+                st.markdown(edition['snippet'])
+            if st.toggle("Show", key=f"edition_{edition['id']}"):
+                st.markdown(default_artifact_store().get(edition['id'])['output'])
+
 # --- Footer ---
 st.markdown("---")
 st.markdown("Developed by an AI News Anchor & Python Expert.")
\ No newline at end of file
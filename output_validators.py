@@ -0,0 +1,243 @@
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from lyria_prompt_compiler import parse_song_sections, section_kind
+
+# --- LOCAL OUTPUT VALIDATORS ---
+# Cheap checks that run on each task's output as a crewai guardrail, so a section that drifted
+# into English, lost a required heading or came back far too short is redone on the spot: crewai
+# re-runs only that task, with its upstream context unchanged, and tells the agent what to fix.
+# No LLM call is involved; the language check, the slowest, takes ~10 ms per thousand words.
+#
+#   task = Task(..., guardrail=guardrail(in_language('German'), min_words(300)), max_retries=GUARDRAIL_RETRIES)
+#
+# OUTPUT_GUARDRAILS=0 accepts every output unchecked (crew_service sets it for its stub model,
+# whose answers would otherwise be retried on every task).
+#
+# Language identification compares character trigram profiles against small built-in samples of
+# the four languages the apps offer. It is checked on the whole text and per paragraph, so one
+# paragraph that slipped into another language is caught too.
+
+log = logging.getLogger(__name__)
+
+GUARDRAIL_RETRIES = 2
+# Paragraphs shorter than this are too short to identify reliably and are not checked on their own
+MIN_PARAGRAPH_WORDS = 25
+# Share of the checked paragraphs that may be in another language (quotes, names, references)
+MAX_FOREIGN_PARAGRAPHS = 0.25
+PROFILE_SIZE = 400
+
+LANGUAGE_SAMPLES = {
+    'English': """
+        The book tells the story of a family that left their village and found a new home in a
+        city far away. It was not easy for them, but they believed that God would guide them and
+        they never gave up. In the first chapter we learn how the father lost his work and how
+        the mother kept the house together with faith and patience. There were many days when
+        they did not know what they would eat, yet they always shared what they had with their
+        neighbours. This is what grace looks like: receiving a gift that you have not earned and
+        passing it on to others. The children grew up with these values, and when they were older
+        they would remember the evenings when the whole family prayed together. Which of these
+        lessons can we apply in our own lives today? Think about the people around you and the
+        ways in which you have been helped, and write down three things for which you are thankful.
+        The news from the city council shows that the new budget will be discussed next week.
+    """,
+    'German': """
+        Das Buch erzählt die Geschichte einer Familie, die ihr Dorf verlassen hat und in einer
+        weit entfernten Stadt ein neues Zuhause fand. Es war nicht leicht für sie, aber sie
+        glaubten, dass Gott sie führen würde, und sie gaben niemals auf. Im ersten Kapitel
+        erfahren wir, wie der Vater seine Arbeit verlor und wie die Mutter das Haus mit Glauben
+        und Geduld zusammenhielt. Es gab viele Tage, an denen sie nicht wussten, was sie essen
+        würden, und doch teilten sie immer, was sie hatten, mit ihren Nachbarn. So sieht Gnade
+        aus: ein Geschenk zu empfangen, das man nicht verdient hat, und es an andere weiterzugeben.
+        Die Kinder wuchsen mit diesen Werten auf, und als sie älter waren, erinnerten sie sich an
+        die Abende, an denen die ganze Familie zusammen betete. Welche dieser Lektionen können wir
+        heute in unserem eigenen Leben anwenden? Denken Sie an die Menschen um sich herum und
+        schreiben Sie drei Dinge auf, für die Sie dankbar sind. Die Nachrichten aus dem Stadtrat
+        zeigen, dass der neue Haushalt in der nächsten Woche besprochen wird.
+    """,
+    'French': """
+        Le livre raconte l'histoire d'une famille qui a quitté son village et qui a trouvé un
+        nouveau foyer dans une ville lointaine. Ce n'était pas facile pour eux, mais ils croyaient
+        que Dieu les guiderait et ils n'ont jamais abandonné. Dans le premier chapitre, nous
+        apprenons comment le père a perdu son travail et comment la mère a tenu la maison avec foi
+        et patience. Il y avait beaucoup de jours où ils ne savaient pas ce qu'ils allaient manger,
+        et pourtant ils partageaient toujours ce qu'ils avaient avec leurs voisins. Voilà à quoi
+        ressemble la grâce : recevoir un don que l'on n'a pas mérité et le transmettre aux autres.
+        Les enfants ont grandi avec ces valeurs, et quand ils étaient plus âgés, ils se souvenaient
+        des soirées où toute la famille priait ensemble. Quelles leçons pouvons-nous appliquer
+        aujourd'hui dans notre propre vie ? Pensez aux personnes qui vous entourent et écrivez
+        trois choses pour lesquelles vous êtes reconnaissant. Les nouvelles du conseil municipal
+        montrent que le nouveau budget sera discuté la semaine prochaine.
+    """,
+    'Swahili': """
+        Kitabu hiki kinasimulia hadithi ya familia moja iliyoacha kijiji chao na kupata makazi
+        mapya katika mji wa mbali. Haikuwa rahisi kwao, lakini waliamini kwamba Mungu
+        atawaongoza na hawakukata tamaa kamwe. Katika sura ya kwanza tunajifunza jinsi baba
+        alivyopoteza kazi yake na jinsi mama alivyoitunza nyumba kwa imani na uvumilivu.
+        Kulikuwa na siku nyingi ambazo hawakujua watakula nini, lakini daima waligawana kile
+        walichokuwa nacho na majirani zao. Hivi ndivyo neema inavyoonekana: kupokea zawadi
+        ambayo hukustahili na kuwapa wengine pia. Watoto walikua na maadili haya, na walipokuwa
+        wakubwa walikumbuka jioni ambazo familia nzima ilisali pamoja. Ni mafundisho gani kati
+        ya haya tunaweza kuyatumia katika maisha yetu leo? Fikiria watu walio karibu nawe na
+        njia ambazo umesaidiwa, kisha andika mambo matatu ambayo unashukuru kwa ajili yake.
+        Habari kutoka kwa baraza la jiji zinaonyesha kwamba bajeti mpya itajadiliwa wiki ijayo.
+    """,
+}
+
+WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+MARKUP = re.compile(r"```.*?```|`[^`]*`|https?://\S+|\[[^\]]*\]\([^)]*\)|[#>*_|~-]+", re.S)
+
+
+def trigrams(text):
+    counts = Counter()
+    for word in WORD.findall(text.lower()):
+        padded = f' {word} '
+        for index in range(len(padded) - 2):
+            counts[padded[index:index + 3]] += 1
+    return counts
+
+
+def _profile(counts, size=PROFILE_SIZE):
+    top = dict(counts.most_common(size))
+    norm = math.sqrt(sum(value * value for value in top.values())) or 1.0
+    return {gram: value / norm for gram, value in top.items()}
+
+
+LANGUAGE_PROFILES = {language: _profile(trigrams(sample)) for language, sample in LANGUAGE_SAMPLES.items()}
+
+
+def language_scores(text):
+    """
+    Cosine similarity of the text's trigram profile with each language's, best first.
+    """
+    profile = _profile(trigrams(MARKUP.sub(' ', text)), size=2 * PROFILE_SIZE)
+    scores = {language: sum(weight * profile.get(gram, 0.0) for gram, weight in reference.items())
+              for language, reference in LANGUAGE_PROFILES.items()}
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def detect_language(text):
+    """
+    The most likely of the supported languages, or None for text without enough words.
+    """
+    if len(WORD.findall(text)) < 5:
+        return None
+    return language_scores(text)[0][0]
+
+
+def paragraphs(text):
+    return [block.strip() for block in re.split(r'\n\s*\n', text) if block.strip()]
+
+
+# --- CHECKS ---
+# Each check takes the output text and returns a problem description, or None.
+
+def in_language(language):
+    if language not in LANGUAGE_PROFILES:
+        return lambda text: None
+
+    def check(text):
+        detected = detect_language(text)
+        if detected and detected != language:
+            return f"The text is written in {detected}, but it MUST be written entirely in {language}."
+        long_paragraphs = [block for block in paragraphs(text) if len(WORD.findall(block)) >= MIN_PARAGRAPH_WORDS]
+        foreign = [block for block in long_paragraphs if detect_language(block) != language]
+        if long_paragraphs and len(foreign) / len(long_paragraphs) > MAX_FOREIGN_PARAGRAPHS:
+            excerpt = ' '.join(foreign[0].split()[:12])
+            return (f"{len(foreign)} of {len(long_paragraphs)} paragraphs are not in {language} "
+                    f"(e.g. \"{excerpt} ...\"). Translate them into {language}.")
+        return None
+    return check
+
+
+def min_words(count):
+    def check(text):
+        words = len(WORD.findall(text))
+        return f"The text has only {words} words; it needs at least {count}." if words < count else None
+    return check
+
+
+def max_words(count):
+    def check(text):
+        words = len(WORD.findall(text))
+        return f"The text has {words} words; keep it under {count}." if words > count else None
+    return check
+
+
+def min_headings(count, level=None):
+    """
+    At least `count` Markdown headings (of the given level, e.g. 2 for '##', or any level).
+    """
+    pattern = re.compile(rf"^\s*{'#' * level}\s+\S" if level else r"^\s*#{1,6}\s+\S", re.M)
+
+    def check(text):
+        found = len(pattern.findall(text))
+        if found < count:
+            kind = f"level-{level} ('{'#' * level} ...') headings" if level else "Markdown headings"
+            return f"The text has {found} {kind}; structure it with at least {count}."
+        return None
+    return check
+
+
+def has_song_sections(*kinds):
+    """
+    The lyrics contain every kind of section ('verse', 'chorus', 'bridge', ...), labeled the way
+    the Lyria prompt compiler reads them.
+    """
+    def check(text):
+        found = {section_kind(label) for label, _ in parse_song_sections(text)}
+        missing = [kind for kind in kinds if kind not in found]
+        if missing:
+            return (f"Missing labeled section(s): {', '.join(kind.title() for kind in missing)}. "
+                    "Put each label on its own line, e.g. [Verse 1], [Chorus], [Bridge].")
+        return None
+    return check
+
+
+# "By the Politics Desk", "_By the Politics Desk_", "**By** Jane Doe", "*Von* Anna Schmidt"
+BYLINE = re.compile(r'^[\W_]*(?:written\s+)?(by|von|par|na)\b[*_]*\s+\S', re.I | re.M)
+
+
+def has_headline_and_byline(text):
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    problems = []
+    if not lines or len(lines[0].split()) > 20 or (lines[0].endswith(('.', ',')) and not lines[0].startswith(('#', '*'))):
+        problems.append("start with a short headline on its own line")
+    if not BYLINE.search('\n'.join(lines[:5])):
+        problems.append('put a byline ("By the ... Reporter") right below the headline')
+    return f"The article must {' and '.join(problems)}." if problems else None
+
+
+def guardrail(*checks, retries=GUARDRAIL_RETRIES):
+    """
+    A crewai task guardrail running `checks` on the output text: (True, output) when all pass,
+    otherwise (False, feedback) and crewai retries the task with the feedback. Pass the same
+    `retries` as the task's max_retries: the last attempt is accepted as it is rather than
+    failing the whole crew.
+    """
+    # Failed attempts per (thread, task description): tasks copied from one template share this
+    # function, but each run executes its tasks on its own thread
+    failures = {}
+    lock = threading.Lock()
+
+    def validate(output):
+        if os.environ.get('OUTPUT_GUARDRAILS', '1') == '0':
+            return True, output
+        text = getattr(output, 'raw', output) or ''
+        problems = [problem for problem in (check(text) for check in checks) if problem]
+        key = (threading.get_ident(), getattr(output, 'description', None))
+        with lock:
+            attempts = failures.pop(key, 0) + 1
+            if problems and attempts <= retries:
+                failures[key] = attempts
+        if not problems:
+            return True, output
+        if attempts > retries:
+            log.warning("Accepting output that still fails validation: %s", '; '.join(problems))
+            return True, output
+        return False, "Your answer was rejected by an automatic check. Fix the following and answer again:\n- " + "\n- ".join(problems)
+
+    return validate
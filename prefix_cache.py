@@ -0,0 +1,337 @@
+import hashlib
+import json
+import threading
+import time
+from crewai import LLM
+from llm_layer import LLMMiddleware
+
+# --- PREFIX / CONTEXT CACHING ---
+# Within a task, every step of an agent re-sends the same system prompt (role, goal, backstory,
+# tool descriptions) and the same task prompt with its upstream context. Providers can cache a
+# stable prompt prefix and bill it at a fraction of the price, but only if it really is a prefix:
+#
+#   1. split: crewai puts the upstream context inside the task prompt, after the agent's system
+#      prompt, so two agents working from the same document (the book research, the news wire)
+#      never share a prefix. The context block is moved into its own leading system message,
+#      ahead of everything agent-specific. It is a system message because Anthropic and Gemini
+#      take system text before any conversation turn; litellm keeps system messages in order,
+#   2. mark: for Gemini and Anthropic, the shared context message and the end of the static part
+#      (agent system prompt and task) get cache_control breakpoints, which litellm turns into
+#      Gemini cached contents / Anthropic cache breakpoints. OpenAI caches long prefixes
+#      automatically, so only the ordering matters there,
+#   3. report: cached prompt tokens as reported by the provider, plus a local estimate of how
+#      many calls reused a prefix seen before.
+#
+# FakeCachingProvider stands in for a provider with prefix caching, for checks without network.
+
+CONTEXT_MARKER = "This is the context you're working with:"
+BEGIN_MARKER = "\n\nBegin!"
+CHARS_PER_TOKEN = 4
+# Smallest prefix, in tokens, each provider will cache
+MIN_PREFIX_TOKENS = {'gemini': 4096, 'anthropic': 1024, 'openai': 1024}
+# How long a provider keeps a prefix (Anthropic's and Gemini's default cache TTL is ~5 minutes)
+PREFIX_TTL_SECONDS = 300
+
+
+def provider_of(model):
+    model = (model or '').lower()
+    if model.startswith(('gemini/', 'vertex_ai/')) or 'gemini' in model:
+        return 'gemini'
+    if model.startswith('anthropic/') or 'claude' in model:
+        return 'anthropic'
+    return 'openai'
+
+
+def _text(content):
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') for block in content if isinstance(block, dict))
+    return content or ''
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def split_context(prompt):
+    """
+    Splits crewai's "This is the context you're working with:" block off a task prompt.
+    Returns (context block, task prompt without it), or (None, prompt).
+    """
+    start = prompt.find(CONTEXT_MARKER)
+    if start < 0:
+        return None, prompt
+    end = prompt.find(BEGIN_MARKER, start)
+    end = len(prompt) if end == -1 else end
+    context, task = prompt[start:end].strip(), (prompt[:start].rstrip('\n') + prompt[end:]).lstrip('\n')
+    return context, task
+
+
+def shared_context_first(messages):
+    """
+    The context block of the first user message as a leading system message of its own, then
+    the system messages, then the task; the conversation turns that change with every step stay
+    at the end in their original order. Returns (messages, whether a context message leads).
+    """
+    if isinstance(messages, str):
+        messages = [{'role': 'user', 'content': messages}]
+    system = [message for message in messages if message.get('role') == 'system']
+    rest = [message for message in messages if message.get('role') != 'system']
+    if rest and rest[0].get('role') == 'user' and isinstance(rest[0].get('content'), str):
+        context, task = split_context(rest[0]['content'])
+        if context:
+            return [{'role': 'system', 'content': context}] + system + [dict(rest[0], content=task)] + rest[1:], True
+    return system + rest, False
+
+
+def static_prefix_length(messages):
+    """
+    Number of leading messages that stay the same across an agent's steps: the system
+    messages and the first user message.
+    """
+    length = 0
+    for message in messages:
+        if message.get('role') == 'system':
+            length += 1
+            continue
+        if message.get('role') == 'user':
+            length += 1
+        break
+    return length
+
+
+def prefix_tokens(messages, count):
+    return estimate_tokens(''.join(_text(message.get('content')) for message in messages[:count]))
+
+
+def mark_cacheable(messages, ends):
+    """
+    Adds cache_control to the messages at `ends`, each the last message of a cacheable prefix
+    (as single text blocks, which is how litellm expects the marker).
+    """
+    return [dict(message, content=[{'type': 'text', 'text': _text(message.get('content')),
+                                    'cache_control': {'type': 'ephemeral'}}]) if index in ends else message
+            for index, message in enumerate(messages)]
+
+
+class PrefixCacheStats:
+    """
+    Process-wide counters; report() gives the hit rate and saved tokens.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = {}  # prefix hash -> last use
+        self.calls = 0
+        self.cacheable_calls = 0
+        self.prefix_reuses = 0
+        self.prompt_tokens = 0
+        self.reused_prefix_tokens = 0  # local estimate
+        self.provider_cached_tokens = 0  # as reported by the provider
+
+    def observe(self, prefixes, prompt_tokens):
+        """
+        `prefixes` are the (hash, tokens) prefixes of one call a provider could cache, longest
+        first; the longest one seen within the TTL counts as reused.
+        """
+        now = time.time()
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            if not prefixes:
+                return
+            self.cacheable_calls += 1
+            reused = next((tokens for prefix_hash, tokens in prefixes
+                           if now - self._seen.get(prefix_hash, -PREFIX_TTL_SECONDS) < PREFIX_TTL_SECONDS), None)
+            if reused is not None:
+                self.prefix_reuses += 1
+                self.reused_prefix_tokens += reused
+            for prefix_hash, _ in prefixes:
+                self._seen[prefix_hash] = now
+
+    def add_provider_usage(self, cached_tokens):
+        with self._lock:
+            self.provider_cached_tokens += cached_tokens
+
+    def report(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'cacheable_calls': self.cacheable_calls,
+                'hit_rate': round(self.prefix_reuses / self.cacheable_calls, 3) if self.cacheable_calls else 0.0,
+                'prompt_tokens': self.prompt_tokens,
+                'saved_tokens_estimated': self.reused_prefix_tokens,
+                'saved_tokens_reported': self.provider_cached_tokens,
+            }
+
+
+prefix_cache_stats = PrefixCacheStats()
+
+
+def cached_tokens_of(response_obj):
+    """
+    Cached prompt tokens from a litellm response: OpenAI and Gemini report
+    usage.prompt_tokens_details.cached_tokens, Anthropic cache_read_input_tokens.
+    """
+    usage = getattr(response_obj, 'usage', None) or (response_obj.get('usage') if isinstance(response_obj, dict) else None)
+    if usage is None:
+        return 0
+    get = (lambda obj, name: obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None))
+    details = get(usage, 'prompt_tokens_details')
+    return (get(details, 'cached_tokens') if details else None) or get(usage, 'cache_read_input_tokens') or 0
+
+
+class CachedTokenCounter:
+    """
+    A litellm success callback (crewai forwards LLM.call callbacks to litellm) that adds the
+    provider's cached-token counts to the stats.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.stats.add_provider_usage(cached_tokens_of(response_obj))
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_success_event(kwargs, response_obj, start_time, end_time)
+
+    def __getattr__(self, name):
+        # litellm calls a number of optional hooks on callbacks; the rest are no-ops
+        if name.startswith(('log_', 'async_log_')):
+            return lambda *args, **kwargs: None
+        raise AttributeError(name)
+
+
+def _counter_callback(stats):
+    try:
+        from litellm.integrations.custom_logger import CustomLogger
+    except ImportError:
+        return CachedTokenCounter(stats)
+
+    class LitellmCachedTokenCounter(CustomLogger):
+        def log_success_event(self, kwargs, response_obj, start_time, end_time):
+            stats.add_provider_usage(cached_tokens_of(response_obj))
+
+        async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+            stats.add_provider_usage(cached_tokens_of(response_obj))
+
+    return LitellmCachedTokenCounter()
+
+
+class PrefixCachingLLM(LLMMiddleware):
+    """
+    Puts the shared context first and marks the static prompt parts for provider-side caching.
+    """
+    def __init__(self, inner, stats=prefix_cache_stats):
+        super().__init__(inner)
+        self.stats = stats
+        self.provider = provider_of(self.inner.model)
+        self._counter = _counter_callback(stats)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        messages, has_context = shared_context_first(messages)
+        # Prefix ends: the shared context message, then the whole static part
+        ends = sorted({0, static_prefix_length(messages) - 1} if has_context else {static_prefix_length(messages) - 1})
+        ends = [end for end in ends if end >= 0 and prefix_tokens(messages, end + 1) >= MIN_PREFIX_TOKENS[self.provider]]
+        prefixes = [(hashlib.sha256(json.dumps([self.inner.model] + [_text(message.get('content')) for message in messages[:end + 1]],
+                                               ensure_ascii=False).encode('utf-8')).hexdigest(), prefix_tokens(messages, end + 1))
+                    for end in reversed(ends)]
+        self.stats.observe(prefixes, sum(estimate_tokens(_text(message.get('content'))) for message in messages))
+
+        if ends and self.provider in ('gemini', 'anthropic'):
+            messages = mark_cacheable(messages, set(ends))
+        callbacks = list(callbacks or []) + [self._counter]
+        return super().call(messages, tools, callbacks, available_functions, **kwargs)
+
+
+# --- LOCAL STAND-IN PROVIDER ---
+
+class FakeCachingProvider(LLM):
+    """
+    Behaves like a provider with prefix caching: a prompt whose marked prefix (Gemini/Anthropic)
+    or leading 1,024+ token block (OpenAI) was seen within the TTL is billed as cached and
+    answered faster. Reports usage to litellm-style callbacks like a real completion would.
+    """
+    def __init__(self, model='gpt-4o', base_latency=0.05, seconds_per_1k_uncached=0.02, answer="Final Answer: done"):
+        super().__init__(model=model)
+        self.base_latency = base_latency
+        self.seconds_per_1k_uncached = seconds_per_1k_uncached
+        self.answer = answer
+        self.provider = provider_of(model)
+        self._prefixes = {}
+        self._lock = threading.Lock()
+        self.billed = {'prompt_tokens': 0, 'cached_tokens': 0}
+
+    def _prefixes_of(self, messages):
+        """
+        The (tokens, key) prefixes the provider would cache for this prompt.
+        """
+        prefixes, prefix = [], ''
+        for index, message in enumerate(messages):
+            prefix += json.dumps({'role': message.get('role'), 'content': _text(message.get('content'))}, sort_keys=True, ensure_ascii=False)
+            if self.provider in ('gemini', 'anthropic'):
+                # Explicit caching: every marked message ends a cached prefix
+                if isinstance(message.get('content'), list) and any('cache_control' in block for block in message['content']):
+                    prefixes.append((prefix_tokens(messages, index + 1), prefix))
+            elif estimate_tokens(prefix) >= MIN_PREFIX_TOKENS['openai']:
+                # Automatic caching: every prefix of whole messages that is long enough
+                prefixes.append((prefix_tokens(messages, index + 1), prefix))
+        return prefixes
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        prompt_tokens = sum(estimate_tokens(_text(message.get('content'))) for message in messages)
+        now = time.time()
+        with self._lock:
+            prefixes = self._prefixes_of(messages)
+            cached = max((tokens for tokens, key in prefixes
+                          if now - self._prefixes.get(key, -PREFIX_TTL_SECONDS) < PREFIX_TTL_SECONDS), default=0)
+            for _, key in prefixes:
+                self._prefixes[key] = now
+            self.billed['prompt_tokens'] += prompt_tokens
+            self.billed['cached_tokens'] += cached
+        time.sleep(self.base_latency + self.seconds_per_1k_uncached * (prompt_tokens - cached) / 1000)
+        usage = {'prompt_tokens': prompt_tokens, 'prompt_tokens_details': {'cached_tokens': cached}}
+        for callback in callbacks or []:
+            if hasattr(callback, 'log_success_event'):
+                callback.log_success_event({}, {'usage': usage}, now, time.time())
+        return self.answer
+
+    def supports_function_calling(self):
+        return False
+
+    def supports_stop_words(self):
+        return True
+
+    def get_context_window_size(self):
+        return 128000
+
+
+def simulate(model, agents=3, steps=5, backstory_words=600, context_words=6000, use_middleware=True):
+    """
+    Replays the call pattern of a sequential crew whose agents work from one large shared
+    document (reporters on the wire, writer and editor on the research), each taking several
+    steps, against the fake provider. Returns (seconds, billed tokens, stats).
+    """
+    provider = FakeCachingProvider(model)
+    stats = PrefixCacheStats()
+    llm = PrefixCachingLLM(provider, stats) if use_middleware else provider
+    context = ' '.join(f'fact{index % 997}' for index in range(context_words))
+    start = time.perf_counter()
+    for agent in range(agents):
+        system = f"You are agent {agent}. " + ' '.join(f'backstory{index}' for index in range(backstory_words))
+        task = (f"\nCurrent Task: Write part {agent} of the document.\n\nThis is the expected criteria for your final answer: "
+                f"a chapter\n\n{CONTEXT_MARKER}\n{context}{BEGIN_MARKER} This is VERY important to you.\n\nThought:")
+        conversation = [{'role': 'system', 'content': system}, {'role': 'user', 'content': task}]
+        for step in range(steps):
+            llm.call(conversation)
+            conversation = conversation + [{'role': 'assistant', 'content': f'Thought: step {step}'},
+                                           {'role': 'user', 'content': f'Observation: result {step}'}]
+    return time.perf_counter() - start, dict(provider.billed), stats.report()
+
+
+if __name__ == '__main__':
+    # python prefix_cache.py  -- offline check against the stand-in provider
+    for model in ('gemini/gemini-2.5-flash', 'anthropic/claude-sonnet-4', 'gpt-4o'):
+        for use_middleware in (False, True):
+            seconds, billed, stats = simulate(model, use_middleware=use_middleware)
+            label = 'with prefix caching' if use_middleware else 'without'
+            print(f"{model:<26} {label:<20} {seconds:6.2f} s  prompt {billed['prompt_tokens']:>7}  cached {billed['cached_tokens']:>7}"
+                  + (f"  hit rate {stats['hit_rate']:.0%}, reported {stats['saved_tokens_reported']}" if use_middleware else ''))
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from llm_layer import LLMMiddleware
+
+# --- LLM RESPONSE CACHE ---
+# Sits below every agent (build_llm wraps each model in a CachedLLM) and answers repeated
+# prompts from disk:
+#
+#   exact       key = sha256(model, temperature, max_tokens, stop words, normalized messages)
+#   similar     for single-turn prompts (no assistant or tool turns yet): the closest earlier
+#               prompt of the same model, temperature and system prompt, if its estimated cosine
+#               similarity reaches the threshold. Prompts are embedded locally as 128-bit
+#               SimHashes of hashed word uni- and bigrams; no embedding API is called.
+#               Off for every crew: crewai's prompts are mostly boilerplate, so prompts for
+#               different books, topics or genres score above any usable threshold (Ruth vs.
+#               Revelation ~0.98) and one request would be answered with another's sections.
+#
+# Entries expire after the TTL of the crew that created them. The store is one SQLite file under
+# runs/, kept under a byte budget by evicting the least recently used entries.
+
+RESPONSE_CACHE_FILE = os.path.join('runs', 'llm_cache.sqlite')
+DEFAULT_BUDGET_BYTES = 256 * 1024 ** 2
+EVICTION_TARGET = 0.9
+EVICT_EVERY = 64
+HOUR = 3600
+CREW_TTLS = {
+    'bible_study': 30 * 24 * HOUR,  # the historical background of a book does not change
+    'book': 7 * 24 * HOUR,
+    'music': 7 * 24 * HOUR,
+    'flyer': 24 * HOUR,
+    'newspaper': 1 * HOUR,  # the news does
+}
+DEFAULT_TTL = 24 * HOUR
+# Crews whose single-turn prompts may be answered by a similar earlier prompt (crew -> threshold).
+# Only for crews whose prompts carry no request parameters; none of the current crews qualify.
+SIMILARITY_THRESHOLDS = {}
+SIMHASH_BITS = 128
+
+WORD = re.compile(r'\w+')
+
+
+def normalize_messages(messages):
+    if isinstance(messages, str):
+        messages = [{'role': 'user', 'content': messages}]
+    return [{'role': message.get('role', 'user'), 'content': ' '.join(str(message.get('content', '')).split())}
+            for message in messages]
+
+
+def exact_key(model, temperature, messages, max_tokens=None, stop=None):
+    # A capped or differently stopped completion is a different answer to the same prompt
+    stop = [stop] if isinstance(stop, str) else sorted(stop or [])
+    payload = json.dumps([model, temperature, max_tokens, stop, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def simhash(text):
+    """
+    Locality-sensitive 128-bit fingerprint: the sign pattern of a hashed bag of word uni- and
+    bigrams projected onto 128 pseudo-random hyperplanes.
+    """
+    words = WORD.findall(text.casefold())
+    counts = [0] * SIMHASH_BITS
+    for feature in words + [f'{a} {b}' for a, b in zip(words, words[1:])]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=16).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            counts[bit] += 1 if digest >> bit & 1 else -1
+    return sum(1 << bit for bit, count in enumerate(counts) if count > 0)
+
+
+def estimated_cosine(fingerprint_a, fingerprint_b):
+    return math.cos(math.pi * (fingerprint_a ^ fingerprint_b).bit_count() / SIMHASH_BITS)
+
+
+def similarity_partition(model, temperature, messages):
+    """
+    The similarity lookup only compares prompts for the same model, temperature and system
+    prompt. Returns (partition, prompt text), or (None, None) for multi-turn conversations.
+    """
+    if any(message['role'] not in ('system', 'user') for message in messages):
+        return None, None
+    system = ' '.join(message['content'] for message in messages if message['role'] == 'system')
+    prompt = ' '.join(message['content'] for message in messages if message['role'] == 'user')
+    partition = hashlib.sha1(json.dumps([model, temperature, system], ensure_ascii=False).encode('utf-8')).hexdigest()
+    return partition, prompt
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with per-entry expiry, LRU eviction and an in-memory
+    fingerprint index for similarity lookups.
+    """
+    def __init__(self, path=RESPONSE_CACHE_FILE, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.path = path
+        self.budget_bytes = budget_bytes
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY, partition TEXT, fingerprint TEXT, crew TEXT,
+            response BLOB, size INTEGER, latency REAL, expires REAL, accessed REAL)""")
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_partition ON entries (partition)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._writes = 0
+        self._index = {}  # partition -> {key: fingerprint}
+        now = time.time()
+        for key, partition, fingerprint in self._db.execute(
+                'SELECT key, partition, fingerprint FROM entries WHERE partition IS NOT NULL AND expires > ?', (now,)):
+            self._index.setdefault(partition, {})[key] = int(fingerprint, 16)
+        self.stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'saved_seconds': 0.0}
+
+    def _hit(self, key, kind):
+        row = self._db.execute('SELECT response, latency, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        self.stats[kind] += 1
+        self.stats['saved_seconds'] += row[1] or 0.0
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def get(self, model, temperature, messages, threshold=None, max_tokens=None, stop=None):
+        """
+        Returns (response, 'exact' | 'similar') or (None, None).
+        """
+        messages = normalize_messages(messages)
+        partition, prompt = similarity_partition(model, temperature, messages) if threshold else (None, None)
+        with self._lock:
+            response = self._hit(exact_key(model, temperature, messages, max_tokens, stop), 'exact_hits')
+            if response is not None:
+                return response, 'exact'
+            candidates = self._index.get(partition) if partition else None
+        # The fingerprint is computed outside the lock; other threads keep hitting meanwhile
+        fingerprint = simhash(prompt) if candidates else None
+        with self._lock:
+            if candidates:
+                key, score = max(((key, estimated_cosine(fingerprint, other)) for key, other in list(candidates.items())),
+                                 key=lambda pair: pair[1], default=(None, 0.0))
+                if key and score >= threshold:
+                    response = self._hit(key, 'similar_hits')
+                    if response is not None:
+                        return response, 'similar'
+                    candidates.pop(key, None)  # expired
+            self.stats['misses'] += 1
+        return None, None
+
+    def put(self, model, temperature, messages, response, ttl=DEFAULT_TTL, crew=None, latency=0.0, similar=False,
+            max_tokens=None, stop=None):
+        """
+        Stores a response; with similar=True a single-turn prompt also joins the similarity index.
+        """
+        messages = normalize_messages(messages)
+        key = exact_key(model, temperature, messages, max_tokens, stop)
+        # Fingerprinting costs ~40 ms per 1,000 words, so only crews that look up by similarity pay it
+        partition, prompt = similarity_partition(model, temperature, messages) if similar else (None, None)
+        fingerprint = simhash(prompt) if partition else None
+        blob = zlib.compress(response.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, partition, f'{fingerprint:032x}' if partition else None, crew, blob, len(blob), latency, now + ttl, now)
+            )
+            if partition:
+                self._index.setdefault(partition, {})[key] = fingerprint
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """
+        Drops expired entries, then the least recently used ones until under the budget.
+        """
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE expires <= ?', (time.time(),))
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total > self.budget_bytes:
+                target = self.budget_bytes * EVICTION_TARGET
+                doomed = []
+                for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed'):
+                    if total <= target:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._db.executemany('DELETE FROM entries WHERE key = ?', doomed)
+            live = {key for key, in self._db.execute('SELECT key FROM entries WHERE partition IS NOT NULL')}
+            for candidates in self._index.values():
+                for key in [key for key in candidates if key not in live]:
+                    del candidates[key]
+
+
+class CachedLLM(LLMMiddleware):
+    """
+    Answers from the response cache when it can, otherwise calls the model and stores the answer.
+    Calls that pass native tools are never cached.
+    """
+    def __init__(self, inner, cache, crew=None):
+        super().__init__(inner)
+        self.cache = cache
+        self.crew = crew
+        self.ttl = CREW_TTLS.get(crew, DEFAULT_TTL)
+        self.threshold = SIMILARITY_THRESHOLDS.get(crew)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if tools:
+            return super().call(messages, tools, callbacks, available_functions, **kwargs)
+        temperature = getattr(self.inner, 'temperature', None)
+        max_tokens, stop = self.setting('max_tokens', kwargs), self.setting('stop', kwargs)
+        response, _ = self.cache.get(self.model, temperature, messages, self.threshold, max_tokens, stop)
+        if response is not None:
+            return response
+        start = time.perf_counter()
+        response = super().call(messages, tools, callbacks, available_functions, **kwargs)
+        if isinstance(response, str) and response.strip():
+            self.cache.put(self.model, temperature, messages, response, self.ttl, self.crew, time.perf_counter() - start,
+                           similar=bool(self.threshold), max_tokens=max_tokens, stop=stop)
+        return response
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_response_cache():
+    """
+    The process-wide cache; LLM_CACHE_BUDGET_MB sets its size.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            budget_mb = os.environ.get('LLM_CACHE_BUDGET_MB')
+            _default_cache = ResponseCache(budget_bytes=int(budget_mb) * 1024 ** 2 if budget_mb else DEFAULT_BUDGET_BYTES)
+        return _default_cache
@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CREW SERVICE LOAD TEST ---
+# Drives N concurrent clients against crew_service. Each client submits a job, follows its event
+# stream until "done" and submits the next one. With --spawn the service is started here with
+# the stub model (CREW_SERVICE_STUB_LLM=1), so no API keys or network are needed:
+#
+#   python service_loadtest.py --spawn --clients 16 --jobs 4 --workers 8
+#   python service_loadtest.py --url http://replica-lb:8000 --clients 50 --crew newspaper
+#
+# Reported: completed jobs per second, rejected submissions (503), and percentiles of submit
+# latency, time to first task output and time to done.
+
+SAMPLE_PARAMS = {
+    'bible_study': {'book': 'Ruth'},
+    'book': {'topic': 'Grace', 'description': 'A short devotional book about grace.'},
+    'music': {'genre': 'Gospel', 'text': 'Psalm 23', 'topic': 'Trust in hard times'},
+    'flyer': {'topic': 'Local climate action', 'text_element': 'Vote for a Greener Tomorrow'},
+    'newspaper': {'scope': 'National', 'location': 'Germany', 'topics': ['Top Story', 'Sports']},
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)
+
+
+def follow_events(url, on_event):
+    """
+    Reads a Server-Sent Events stream until its "done" event.
+    """
+    with urllib.request.urlopen(url, timeout=600) as response:
+        kind = None
+        for raw in response:
+            line = raw.decode('utf-8').rstrip('\n')
+            if line.startswith('event: '):
+                kind = line[len('event: '):]
+            elif line.startswith('data: ') and kind:
+                on_event(kind, json.loads(line[len('data: '):]))
+                if kind == 'done':
+                    return
+
+
+def run_client(base_url, crew, jobs, results, lock):
+    for _ in range(jobs):
+        record = {'status': None}
+        start = time.perf_counter()
+        try:
+            job = post_json(f'{base_url}/jobs', {'crew': crew, 'params': SAMPLE_PARAMS[crew]})
+        except urllib.error.HTTPError as e:
+            record['status'] = 'rejected' if e.code == 503 else f'http {e.code}'
+            with lock:
+                results.append(record)
+            time.sleep(0.5)
+            continue
+        record['submit_s'] = time.perf_counter() - start
+
+        def on_event(kind, data):
+            if kind == 'task' and 'first_output_s' not in record:
+                record['first_output_s'] = time.perf_counter() - start
+            elif kind == 'done':
+                record['status'] = data['status']
+
+        follow_events(f"{base_url}{job['events_url']}", on_event)
+        record['done_s'] = time.perf_counter() - start
+        with lock:
+            results.append(record)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_service(port, workers, latency):
+    env = dict(os.environ, CREW_SERVICE_STUB_LLM='1', CREW_SERVICE_STUB_LATENCY=str(latency),
+               CREW_SERVICE_WORKERS=str(workers), LLM_CACHE='0')
+    for variable in ('OPENAI_API_KEY', 'SERPER_API_KEY', 'GEMINI_API_KEY'):
+        env.setdefault(variable, 'stub')
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'crew_service:app', '--port', str(port), '--log-level', 'warning'],
+                               env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/healthz', timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The service did not start.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the crew service.")
+    parser.add_argument('--url', default=None, help="Base URL of a running service")
+    parser.add_argument('--spawn', action='store_true', help="Start a local service with the stub model")
+    parser.add_argument('--crew', choices=list(SAMPLE_PARAMS), default='book')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--jobs', type=int, default=3, help="Jobs per client")
+    parser.add_argument('--workers', type=int, default=4, help="Worker threads of a spawned service")
+    parser.add_argument('--stub-latency', type=float, default=0.05, help="Seconds per stub LLM call")
+    args = parser.parse_args()
+    if not args.url and not args.spawn:
+        parser.error("pass --url or --spawn")
+
+    process = None
+    base_url = args.url
+    if args.spawn:
+        port = free_port()
+        process = spawn_service(port, args.workers, args.stub_latency)
+        base_url = f'http://127.0.0.1:{port}'
+    try:
+        results, lock = [], threading.Lock()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            for _ in range(args.clients):
+                pool.submit(run_client, base_url.rstrip('/'), args.crew, args.jobs, results, lock)
+        elapsed = time.perf_counter() - start
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    finished = [record for record in results if 'done_s' in record]
+    print(f"{args.clients} clients x {args.jobs} '{args.crew}' jobs in {elapsed:.2f} s: "
+          f"{len(finished) / elapsed:.2f} jobs/s, {sum(record['status'] == 'rejected' for record in results)} rejected, "
+          f"{sum(record['status'] not in ('done', 'rejected') for record in results)} not done")
+    for metric in ('submit_s', 'first_output_s', 'done_s'):
+        values = [record[metric] for record in finished if metric in record]
+        if values:
+            print(f"  {metric:<15} p50 {percentile(values, 0.5):7.3f}  p90 {percentile(values, 0.9):7.3f}  "
+                  f"p99 {percentile(values, 0.99):7.3f}  max {max(values):7.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
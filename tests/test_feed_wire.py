@@ -0,0 +1,87 @@
+import os
+import shutil
+import urllib.error
+import urllib.request
+
+import pytest
+
+from feed_wire import MAX_ITEMS_PER_FEED, FeedCache, FeedServer, fetch_feed, fetch_feeds, write_sample_feeds
+
+
+@pytest.fixture
+def feeds(tmp_path):
+    names = write_sample_feeds(tmp_path, feeds=4, items=40)
+    with FeedServer(tmp_path) as server:
+        yield tmp_path, server, [server.url(name) for name in names]
+
+
+def test_feeds_are_merged_in_order_without_repeats(feeds):
+    directory, server, urls = feeds
+    # A mirror of the first feed carries the same stories under the same links
+    shutil.copy(directory / 'feed0.rss.xml', directory / 'mirror.rss.xml')
+    urls = urls + [server.url('mirror.rss.xml')]
+
+    items, statuses = fetch_feeds(urls, FeedCache(str(directory / 'cache.json')))
+
+    assert set(statuses.values()) == {'fetched'}
+    assert len(items) == 4 * MAX_ITEMS_PER_FEED
+    assert len({item['url'] for item in items}) == len(items)
+    assert [item['url'] for item in items[:2]] == ['https://example.org/0/0', 'https://example.org/0/1']
+    assert items[MAX_ITEMS_PER_FEED]['url'] == 'https://example.org/1/0'
+
+
+def test_unchanged_feeds_are_answered_with_304(feeds):
+    directory, server, urls = feeds
+    cache = FeedCache(str(directory / 'cache.json'))
+    first, _ = fetch_feeds(urls, cache)
+
+    # The server sends no body for a matching ETag
+    request = urllib.request.Request(urls[0], headers={'If-None-Match': cache.get(urls[0])['etag']})
+    with pytest.raises(urllib.error.HTTPError) as response:
+        urllib.request.urlopen(request)
+    assert response.value.code == 304
+    assert response.value.read() == b''
+
+    # The cache persists, so a new process reuses the validators and the stored items
+    items, statuses = fetch_feeds(urls, FeedCache(str(directory / 'cache.json')))
+    assert set(statuses.values()) == {'not_modified'}
+    assert items == first
+
+
+def test_last_modified_alone_is_used_as_a_validator(feeds):
+    directory, server, urls = feeds
+    cache = FeedCache(str(directory / 'cache.json'))
+    fetch_feed(urls[0], cache)
+    cache.get(urls[0])['etag'] = None
+
+    items, status = fetch_feed(urls[0], cache)
+
+    assert status == 'not_modified'
+    assert len(items) == MAX_ITEMS_PER_FEED
+
+
+def test_only_changed_feeds_are_fetched_again(feeds):
+    directory, server, urls = feeds
+    cache = FeedCache(str(directory / 'cache.json'))
+    fetch_feeds(urls, cache)
+    path = directory / 'feed1.atom.xml'
+    path.write_text(path.read_text(encoding='utf-8').replace('Story 0 from', 'Update: story 0 from'), encoding='utf-8')
+    os.utime(path, (os.stat(path).st_atime + 10, os.stat(path).st_mtime + 10))
+
+    items, statuses = fetch_feeds(urls, cache)
+
+    assert statuses == {url: 'fetched' if url == urls[1] else 'not_modified' for url in urls}
+    assert items[MAX_ITEMS_PER_FEED]['headline'].startswith('Update: story 0 from')
+
+
+def test_failed_feeds_fall_back_to_cached_items(feeds):
+    directory, server, urls = feeds
+    cache = FeedCache(str(directory / 'cache.json'))
+    fetch_feeds(urls, cache)
+    os.remove(directory / 'feed2.rss.xml')
+
+    items, statuses = fetch_feeds(urls + [server.url('missing.xml')], cache)
+
+    assert statuses[urls[2]] == 'stale'
+    assert statuses[server.url('missing.xml')] == 'failed'
+    assert len(items) == 4 * MAX_ITEMS_PER_FEED
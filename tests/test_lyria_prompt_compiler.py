@@ -0,0 +1,54 @@
+from lyria_prompt_compiler import compile_lyria_prompt, parse_song_sections
+
+
+SONG = """Morning Light
+
+(Verse 1)
+I woke before the sunrise
+The kettle singing low
+
+(Chorus)
+Morning light, carry me home
+Morning light, I'm not alone
+
+(Verse 2)
+The city hums its hymn now
+The streets begin to glow
+
+(Chorus)
+
+(Bridge)
+Hold on, hold on
+
+(Chorus)
+"""
+
+CHORUS = "Morning light, carry me home\nMorning light, I'm not alone"
+
+
+def test_bare_repeat_marker_repeats_the_first_chorus():
+    sections = parse_song_sections(SONG)
+
+    assert [label for label, _ in sections] == ['Verse 1', 'Chorus', 'Verse 2', 'Chorus', 'Bridge', 'Chorus']
+    assert [lyrics for label, lyrics in sections if label == 'Chorus'] == [CHORUS] * 3
+
+
+def test_repeat_marker_matches_an_earlier_section_of_the_same_kind():
+    sections = parse_song_sections("[Refrain]\nSing it out\n\n[Verse]\nA quiet street\n\n[Chorus]\n")
+
+    assert sections[-1] == ('Chorus', 'Sing it out')
+
+
+def test_bare_marker_with_nothing_to_repeat_is_dropped():
+    sections = parse_song_sections("(Intro)\n\n(Verse 1)\nA quiet street\n")
+
+    assert sections == [('Verse 1', 'A quiet street')]
+
+
+def test_compiled_prompt_sings_the_repeated_chorus():
+    arrangement = {'genre': 'folk', 'tempo': '', 'mood': 'warm', 'instrumentation': ['acoustic guitar']}
+
+    prompt = compile_lyria_prompt('folk', parse_song_sections(SONG), arrangement)
+
+    assert prompt.count('[Chorus]') == 3
+    assert prompt.count("Morning light, carry me home") == 3
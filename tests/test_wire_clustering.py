@@ -0,0 +1,49 @@
+from wire_clustering import cluster_items
+
+
+def item(headline, summary, url=''):
+    return {'headline': headline, 'summary': summary, 'url': url, 'source': '', 'location': ''}
+
+
+ECB_REUTERS = item("ECB holds interest rates steady, signals cuts possible in June",
+                   "The European Central Bank kept its key deposit rate at 4% on Thursday but President Christine Lagarde "
+                   "said a cut in June was possible if inflation keeps easing.")
+ECB_AFP = item("European Central Bank leaves rates unchanged, Lagarde hints at June cut",
+               "The ECB left borrowing costs at a record high of 4% on Thursday, while Christine Lagarde said "
+               "policymakers could lower rates in June as inflation eases.")
+FED = item("Federal Reserve holds interest rates steady as inflation cools",
+           "The US Federal Reserve kept its benchmark rate unchanged on Wednesday, with Chair Jerome Powell saying "
+           "inflation was easing but cuts were not yet certain.")
+BAYERN = item("Bayern Munich beat Dortmund 3-1 in Der Klassiker",
+              "Harry Kane scored twice as Bayern Munich defeated Borussia Dortmund 3-1 on Saturday to move top of the Bundesliga.")
+BAYERN_REWRITE = item("Kane double helps Bayern past Dortmund",
+                      "Bayern Munich went top of the Bundesliga after a 3-1 win over Borussia Dortmund on Saturday, "
+                      "with Harry Kane scoring two goals.")
+LEVERKUSEN = item("Leverkusen beat Stuttgart 2-0 to stay top of the Bundesliga",
+                  "Bayer Leverkusen defeated VfB Stuttgart 2-0 on Saturday to keep their lead at the top of the Bundesliga table.")
+
+
+def headlines(clusters):
+    return sorted(sorted(entry['headline'] for entry in cluster['items']) for cluster in clusters)
+
+
+def test_agency_rewrites_of_one_story_are_merged():
+    clusters = cluster_items([ECB_REUTERS, ECB_AFP])
+    assert len(clusters) == 1
+    assert clusters[0]['headline'] in (ECB_REUTERS['headline'], ECB_AFP['headline'])
+
+
+def test_distinct_stories_on_one_subject_stay_apart():
+    clusters = cluster_items([ECB_REUTERS, ECB_AFP, FED, BAYERN, BAYERN_REWRITE, LEVERKUSEN])
+    assert headlines(clusters) == headlines([
+        {'items': [ECB_REUTERS, ECB_AFP]}, {'items': [FED]},
+        {'items': [BAYERN, BAYERN_REWRITE]}, {'items': [LEVERKUSEN]},
+    ])
+
+
+def test_rewrite_matching_only_a_later_member_joins_its_cluster():
+    # The third version shares most of its words with the second one, little with the first
+    shortened = item("Lagarde hints at June cut as ECB leaves rates unchanged",
+                     "The ECB left borrowing costs at a record high of 4% on Thursday; policymakers could lower rates in June.")
+    clusters = cluster_items([ECB_REUTERS, FED, ECB_AFP, shortened])
+    assert headlines(clusters) == headlines([{'items': [ECB_REUTERS, ECB_AFP, shortened]}, {'items': [FED]}])
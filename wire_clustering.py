@@ -0,0 +1,291 @@
+import random
+import re
+import unicodedata
+import zlib
+from urllib.parse import urlparse
+
+# --- WIRE DEDUPLICATION & CLUSTERING ---
+# Local preprocessing between the wire fetch and the reporters, with no LLM calls:
+#   1. parse the wire service's list into items (headline, url, source, summary)
+#   2. cluster near-duplicate items: MinHash signatures over word shingles find candidate pairs
+#      (LSH banding), the exact Jaccard similarity of their shingles decides
+#   3. route every cluster to the section whose keywords match it best
+# Each reporter then only reads its own slice of the wire, once per story.
+
+NUM_PERMUTATIONS = 64
+BANDS = 32  # 32 bands of 2 rows: pairs above ~0.2 Jaccard similarity become candidates
+# Candidates are merged if the Jaccard similarity of their content words reaches this. Agency
+# rewrites of one story score ~0.3-0.5 (different wording, same names and numbers); distinct
+# stories on one subject (ECB vs. Fed rate decisions, two Bundesliga results) ~0.2.
+SIMILARITY_THRESHOLD = 0.3
+SHINGLE_SIZE = 1  # content words; rewrites of one story share words far more often than word pairs
+STOPWORDS = frozenset('a an the and or of in on at to for from by with as is are was were be has have had it its '
+                      'this that after before over into amid der die das und in im mit von zu für le la les et des du'.split())
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+# Keywords per newspaper section; "Top Story" takes the biggest stories and anything unmatched
+SECTION_KEYWORDS = {
+    "Business & Stock Market": ['business', 'market', 'stock', 'shares', 'dax', 'economy', 'inflation', 'bank', 'company',
+                                'profit', 'revenue', 'trade', 'tariff', 'investor', 'euro', 'dollar', 'ecb', 'interest rate', 'wirtschaft', 'börse'],
+    "Sports": ['sport', 'football', 'soccer', 'bundesliga', 'match', 'league', 'cup', 'champion', 'coach', 'goal',
+               'olympic', 'tennis', 'formula 1', 'tournament', 'player', 'fussball', 'fußball'],
+    "Technology": ['tech', 'ai', 'artificial intelligence', 'software', 'chip', 'startup', 'app', 'cyber', 'data',
+                   'google', 'apple', 'microsoft', 'openai', 'smartphone', 'internet', 'robot', 'digital'],
+    "Fashion & Trends": ['fashion', 'style', 'trend', 'designer', 'runway', 'collection', 'brand', 'beauty',
+                         'fashion week', 'luxury', 'influencer', 'mode'],
+}
+TOP_STORY = "Top Story"
+TOP_STORY_CLUSTERS = 3
+
+# Names a city goes by on the wire, for splitting one shared fetch into local editions
+CITY_ALIASES = {
+    "Berlin": ['berlin', 'berliner'],
+    "Hamburg": ['hamburg', 'hamburger', 'hsv', 'st pauli'],
+    "Munich": ['munich', 'munchen', 'muenchen', 'munchner', 'bayern munich', 'fc bayern'],
+    "Cologne": ['cologne', 'koln', 'koeln', 'kolner', '1 fc koln'],
+    "Frankfurt": ['frankfurt', 'frankfurter', 'eintracht'],
+}
+# A location label naming the country marks a national story, whatever city its text mentions
+COUNTRY_ALIASES = {
+    "Germany": ['germany', 'deutschland', 'bundesweit', 'nationwide', 'national'],
+    "Austria": ['osterreich'],
+    "France": ['frankreich'],
+    "United Kingdom": ['uk', 'britain', 'great britain', 'grossbritannien'],
+    "United States": ['usa', 'u s', 'us', 'america', 'united states of america'],
+}
+
+URL = re.compile(r'https?://[^\s)\]>"]+')
+ITEM_START = re.compile(r'^\s*(?:\d+[.)]|[-*•])\s+')
+LABEL = re.compile(r'^\s*(?:\d+[.)]|[-*•])?\s*\**\s*(headline|title|source|url|link|summary|location|city)\s*\**\s*:\s*\**\s*', re.IGNORECASE)
+
+
+# --- PARSING ---
+
+def _clean(text):
+    return re.sub(r'[*_`#]+', '', text).strip(' -–:\t')
+
+
+def _item_from_block(lines):
+    item = {'headline': '', 'url': '', 'source': '', 'summary': '', 'location': ''}
+    free_text = []
+    for line in lines:
+        url = URL.search(line)
+        if url and not item['url']:
+            item['url'] = url.group(0).rstrip('.,')
+        label = LABEL.match(line)
+        if label:
+            field = label.group(1).lower()
+            value = _clean(URL.sub('', line[label.end():])) if field not in ('url', 'link') else ''
+            if field in ('headline', 'title'):
+                item['headline'] = value
+            elif field == 'summary':
+                item['summary'] = value
+            elif field == 'source' and value:
+                item['source'] = value
+            elif field in ('location', 'city'):
+                item['location'] = value
+        else:
+            text = _clean(URL.sub('', ITEM_START.sub('', line))).strip('()[] ')
+            if text:
+                free_text.append(text)
+
+    # Unlabelled items: "1. **Headline** - summary (url)"
+    if not item['headline'] and free_text:
+        first = free_text.pop(0)
+        headline, _, rest = first.partition(' - ') if ' - ' in first else (first, '', '')
+        item['headline'] = headline.strip()
+        if rest:
+            free_text.insert(0, rest)
+    if not item['summary'] and free_text:
+        item['summary'] = ' '.join(free_text)
+    if not item['source'] and item['url']:
+        item['source'] = urlparse(item['url']).netloc.removeprefix('www.')
+    # Intros like "Here are today's stories:" have neither a link nor a summary
+    return item if item['headline'] and (item['url'] or item['summary']) else None
+
+
+def parse_wire_items(text):
+    """
+    Parses the wire service's output into a list of item dicts with the keys
+    headline, url, source, summary and location (empty unless the wire labels it). Items are separated by blank lines or list markers.
+    """
+    blocks, current = [], []
+    for line in text.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append(current)
+                current = []
+            continue
+        # A list marker or a "Headline:" field starts a new item, a "Source:"/"Summary:" field does not
+        label = LABEL.match(line)
+        starts_item = label.group(1).lower() in ('headline', 'title') if label else bool(ITEM_START.match(line))
+        if starts_item and current:
+            blocks.append(current)
+            current = []
+        current.append(line)
+    if current:
+        blocks.append(current)
+    return [item for item in (_item_from_block(block) for block in blocks) if item]
+
+
+# --- MINHASH CLUSTERING ---
+
+def normalize_text(text):
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return re.sub(r'[^\w\s]', ' ', text).split()
+
+
+def shingles(item):
+    words = [word for word in normalize_text(f"{item['headline']} {item['summary']}") if word not in STOPWORDS]
+    if len(words) <= SHINGLE_SIZE:
+        grams = words
+    else:
+        grams = [' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams} or {0}
+
+
+def minhash(shingle_set):
+    return tuple(min((a * x + b) % _PRIME for x in shingle_set) for a, b in _PERMUTATIONS)
+
+
+def jaccard(shingles_a, shingles_b):
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+def similarity(signature_a, signature_b):
+    """
+    Estimated Jaccard similarity of two MinHash signatures.
+    """
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / len(signature_a)
+
+
+def cluster_fingerprint(signatures):
+    """
+    A stable id for a cluster: the element-wise minimum of its members' signatures, hashed.
+    """
+    combined = tuple(min(values) for values in zip(*signatures))
+    return f"{zlib.crc32(repr(combined).encode('utf-8')):08x}", combined
+
+
+def cluster_items(items):
+    """
+    Groups near-duplicate items. Returns a list of clusters, largest first, each a dict with
+    'id', 'signature', 'headline' (of the most detailed item) and 'items'.
+    """
+    shingle_sets = [shingles(item) for item in items]
+    signatures = [minhash(shingle_set) for shingle_set in shingle_sets]
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERMUTATIONS // BANDS
+    for band in range(BANDS):
+        buckets = {}
+        for index, signature in enumerate(signatures):
+            buckets.setdefault(signature[band * rows:(band + 1) * rows], []).append(index)
+        # Every pair in a bucket is a candidate; rewrites of a story need not resemble its first item
+        for members in buckets.values():
+            for position, first in enumerate(members):
+                for second in members[position + 1:]:
+                    if find(first) != find(second) and jaccard(shingle_sets[first], shingle_sets[second]) >= SIMILARITY_THRESHOLD:
+                        parent[find(second)] = find(first)
+
+    groups = {}
+    for index in range(len(items)):
+        groups.setdefault(find(index), []).append(index)
+
+    clusters = []
+    for members in groups.values():
+        cluster_id, signature = cluster_fingerprint([signatures[i] for i in members])
+        cluster_items_ = [items[i] for i in members]
+        lead = max(cluster_items_, key=lambda item: len(item['summary']))
+        clusters.append({'id': cluster_id, 'signature': signature, 'headline': lead['headline'], 'items': cluster_items_})
+    clusters.sort(key=lambda cluster: len(cluster['items']), reverse=True)
+    return clusters
+
+
+# --- ROUTING ---
+
+def names_country(location, country):
+    text = f" {' '.join(normalize_text(location))} "
+    aliases = COUNTRY_ALIASES.get(country, []) + [' '.join(normalize_text(country))]
+    return any(f' {alias} ' in text for alias in aliases)
+
+
+def item_city(item, cities, country=None):
+    """
+    The city an item belongs to: its labelled location if that names a city; None if the label
+    names `country` (a national story); otherwise the first city mentioned in its headline or
+    summary, otherwise None.
+    """
+    def mentioned(text):
+        text = f" {' '.join(normalize_text(text))} "
+        for city in cities:
+            aliases = CITY_ALIASES.get(city) or [' '.join(normalize_text(city))]
+            if any(f' {alias} ' in text for alias in aliases):
+                return city
+        return None
+    location = item.get('location', '')
+    city = mentioned(location)
+    if city or (country and location and names_country(location, country)):
+        return city
+    return mentioned(f"{item['headline']} {item['summary']}")
+
+
+def partition_by_city(items, cities, country=None):
+    """
+    Splits wire items into {city: [items]} plus a None key for everything not tied to a city.
+    Items labelled with `country` as their location stay national.
+    """
+    partitions = {city: [] for city in cities}
+    partitions[None] = []
+    for item in items:
+        partitions[item_city(item, cities, country)].append(item)
+    return partitions
+
+
+def section_keywords(topic):
+    return SECTION_KEYWORDS.get(topic) or [word for word in normalize_text(topic) if len(word) > 3]
+
+
+def section_score(cluster, topic):
+    text = ' ' + ' '.join(normalize_text(' '.join(f"{item['headline']} {item['summary']}" for item in cluster['items']))) + ' '
+    return sum(text.count(f' {keyword} ') for keyword in (' '.join(normalize_text(k)) for k in section_keywords(topic)))
+
+
+def route_clusters(clusters, topics):
+    """
+    Assigns clusters to the selected sections. Returns {topic: [clusters]}.
+    Top Story gets the biggest clusters plus every cluster no other section claims.
+    """
+    slices = {topic: [] for topic in topics}
+    beats = [topic for topic in topics if topic != TOP_STORY]
+    for rank, cluster in enumerate(clusters):
+        scores = {topic: section_score(cluster, topic) for topic in beats}
+        best = max(scores, key=scores.get) if scores else None
+        if best and scores[best] > 0:
+            slices[best].append(cluster)
+            if TOP_STORY in slices and rank < TOP_STORY_CLUSTERS:
+                slices[TOP_STORY].append(cluster)
+        elif TOP_STORY in slices:
+            slices[TOP_STORY].append(cluster)
+    return slices
+
+
+def format_slice(clusters):
+    """
+    Renders a reporter's slice as compact Markdown: one entry per story with all its sources.
+    """
+    entries = []
+    for number, cluster in enumerate(clusters, start=1):
+        lead = max(cluster['items'], key=lambda item: len(item['summary']))
+        sources = ', '.join(f"{item['source'] or 'source'} ({item['url']})" if item['url'] else item['source'] for item in cluster['items'])
+        entries.append(f"{number}. **{cluster['headline']}**\n   {lead['summary']}\n   Sources: {sources}")
+    return '\n'.join(entries)